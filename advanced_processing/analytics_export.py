@@ -0,0 +1,328 @@
+# Standard library imports
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+
+# Third-party imports
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# Local imports
+from schema_v2 import is_v2, to_float, to_int
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("unixtime", pa.int64()),
+    ("talkgroup_id", pa.int64()),
+    ("talkgroup_name", pa.string()),
+    ("radio_id", pa.int64()),
+    ("duration", pa.float64()),
+    ("filename", pa.string()),
+    ("transcription", pa.string()),
+])
+# Files are laid out as <output>/date=YYYY-MM-DD/part-<first id>-<last id>.<ext>
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+# Leading underscore: pyarrow's dataset discovery skips it
+STATE_NAME = "_export_state.json"
+PART_PATTERN = re.compile(r"part-(\d+)-(\d+)\.")
+
+
+def partition_day(unixtime):
+    """
+    Local calendar day of a unixtime, matching the date column process_recordings.py stores.
+
+    Args:
+        unixtime (int): Seconds since the epoch.
+
+    Returns:
+        str: YYYY-MM-DD.
+    """
+    return time.strftime("%Y-%m-%d", time.localtime(unixtime))
+
+
+def read_state(output_directory):
+    """
+    Reads the export high-water mark.
+
+    Args:
+        output_directory (str): The export directory.
+
+    Returns:
+        dict: {"last_id": last exported rowid, "max_unixtime": newest unixtime exported}.
+    """
+    try:
+        with open(os.path.join(output_directory, STATE_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_id": 0, "max_unixtime": None}
+
+
+def write_state(output_directory, state):
+    path = os.path.join(output_directory, STATE_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def remove_unrecorded_parts(output_directory, last_id):
+    """
+    Deletes part files written after the last recorded high-water mark (left by an interrupted
+    export), so re-exporting those rows does not duplicate them.
+
+    Args:
+        output_directory (str): The export directory.
+        last_id (int): The recorded high-water mark.
+
+    Returns:
+        None
+    """
+    for directory, _, files in os.walk(output_directory):
+        for filename in files:
+            match = PART_PATTERN.match(filename)
+            if match and int(match.group(1)) > last_id:
+                logger.info(f"Removing unrecorded part {filename}")
+                os.remove(os.path.join(directory, filename))
+
+
+def rows_to_table(rows):
+    """
+    Converts recordings rows to a typed Arrow table ("Unknown ID" radios become nulls).
+
+    Args:
+        rows (list): (id, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, transcription) tuples.
+
+    Returns:
+        pyarrow.Table: The rows with SCHEMA.
+    """
+    columns = list(zip(*rows))
+    return pa.table({
+        "id": pa.array(columns[0], pa.int64()),
+        "unixtime": pa.array([to_int(v) for v in columns[1]], pa.int64()),
+        "talkgroup_id": pa.array([to_int(v) for v in columns[2]], pa.int64()),
+        "talkgroup_name": pa.array(columns[3], pa.string()),
+        "radio_id": pa.array([to_int(v) for v in columns[4]], pa.int64()),
+        "duration": pa.array([to_float(v) for v in columns[5]], pa.float64()),
+        "filename": pa.array(columns[6], pa.string()),
+        "transcription": pa.array(columns[7], pa.string()),
+    }, schema=SCHEMA)
+
+
+def write_part(output_directory, day, table, file_format):
+    """
+    Writes one immutable part file into a day's partition (via a temporary name, so readers never see
+    a partial file).
+
+    Args:
+        output_directory (str): The export directory.
+        day (str): YYYY-MM-DD partition.
+        table (pyarrow.Table): Rows for that day, in id order.
+        file_format (str): "parquet" or "arrow".
+
+    Returns:
+        str: Path of the written file.
+    """
+    directory = os.path.join(output_directory, f"date={day}")
+    os.makedirs(directory, exist_ok=True)
+    ids = table["id"]
+    filename = f"part-{ids[0].as_py():012d}-{ids[-1].as_py():012d}{EXTENSIONS[file_format]}"
+    temp_path = os.path.join(directory, "." + filename)
+    if file_format == "parquet":
+        pq.write_table(table, temp_path, compression="zstd")
+    else:
+        feather.write_feather(table, temp_path, compression="zstd")
+    os.replace(temp_path, os.path.join(directory, filename))
+    return os.path.join(directory, filename)
+
+
+def export(database_path, output_directory, batch_size=50000, file_format="parquet"):
+    """
+    Appends recordings added since the last export to date-partitioned Parquet (or Arrow IPC) files.
+    The high-water mark is the rowid (the view's id on v2 databases) rather than unixtime alone, so
+    recordings processed late, with older timestamps, are still picked up. The database is opened
+    read-only, and each batch becomes new part files; nothing already exported is rewritten.
+
+    Args:
+        database_path (str): Path to the recordings database.
+        output_directory (str): Where the partitioned files go.
+        batch_size (int): Rows read and written per batch.
+        file_format (str): "parquet" or "arrow".
+
+    Returns:
+        int: The number of rows exported.
+    """
+    if file_format not in EXTENSIONS:
+        raise ValueError(f"Unknown format: {file_format}")
+    os.makedirs(output_directory, exist_ok=True)
+    state = read_state(output_directory)
+    remove_unrecorded_parts(output_directory, state["last_id"])
+
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True, timeout=30)
+    try:
+        id_column = "id" if is_v2(conn) else "rowid"
+        exported = 0
+        while True:
+            rows = conn.execute(
+                f"""
+                SELECT {id_column}, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, transcription
+                FROM recordings WHERE {id_column} > ? ORDER BY {id_column} LIMIT ?
+                """,
+                (state["last_id"], batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            table = rows_to_table(rows)
+            days = pa.array([partition_day(t) if t is not None else "unknown" for t in table["unixtime"].to_pylist()])
+            for day in pc.unique(days).to_pylist():
+                write_part(output_directory, day, table.filter(pc.equal(days, day)), file_format)
+            newest = pc.max(table["unixtime"]).as_py()
+            state = {
+                "last_id": rows[-1][0],
+                "max_unixtime": max(filter(None, [state["max_unixtime"], newest]), default=None),
+            }
+            write_state(output_directory, state)
+            exported += len(rows)
+            logger.info(f"Exported {exported} recordings (up to id {state['last_id']})")
+    finally:
+        conn.close()
+    return exported
+
+
+def load(output_directory, start=None, end=None, columns=None, file_format="parquet"):
+    """
+    Reads exported recordings, pruning day partitions and row groups outside [start, end].
+
+    Args:
+        output_directory (str): The export directory.
+        start (int, optional): Earliest unixtime (inclusive).
+        end (int, optional): Latest unixtime (inclusive).
+        columns (list, optional): Columns to read (default: all).
+        file_format (str): "parquet" or "arrow".
+
+    Returns:
+        pyarrow.Table: The matching rows.
+    """
+    if not os.path.isdir(output_directory):
+        return SCHEMA.empty_table()
+    dataset = ds.dataset(output_directory, schema=SCHEMA.append(pa.field("date", pa.string())),
+                         format="parquet" if file_format == "parquet" else "arrow", partitioning=PARTITIONING)
+    expression = None
+    conditions = []
+    if start is not None:
+        # Days are compared as strings; a day a DST shift straddles is still included
+        conditions += [ds.field("date") >= partition_day(start), ds.field("unixtime") >= start]
+    if end is not None:
+        conditions += [ds.field("date") <= partition_day(end), ds.field("unixtime") <= end]
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns or SCHEMA.names, filter=expression)
+
+
+def airtime_by_talkgroup_hour(table):
+    """
+    Calls and seconds of airtime per talkgroup per hour.
+
+    Args:
+        table (pyarrow.Table): Rows from load().
+
+    Returns:
+        pyarrow.Table: hour (unixtime at the start of the hour), talkgroup_id, calls, airtime, by hour then airtime.
+    """
+    hours = pc.multiply(pc.divide(table["unixtime"], 3600), 3600)
+    grouped = (table.append_column("hour", hours)
+               .group_by(["hour", "talkgroup_id"])
+               .aggregate([("id", "count"), ("duration", "sum")]))
+    return (grouped.rename_columns(["hour", "talkgroup_id", "calls", "airtime"])
+            .sort_by([("hour", "ascending"), ("airtime", "descending")]))
+
+
+def busiest_radios(table, top=10):
+    """
+    Radios with the most calls (ties broken by airtime).
+
+    Args:
+        table (pyarrow.Table): Rows from load().
+        top (int): Number of radios to return.
+
+    Returns:
+        pyarrow.Table: radio_id, calls, airtime.
+    """
+    known = table.filter(pc.is_valid(table["radio_id"]))
+    grouped = known.group_by("radio_id").aggregate([("id", "count"), ("duration", "sum")])
+    grouped = grouped.rename_columns(["radio_id", "calls", "airtime"])
+    return grouped.sort_by([("calls", "descending"), ("airtime", "descending")]).slice(0, top)
+
+
+def traffic_around(table, unixtime, window_seconds=1800, bucket_seconds=60):
+    """
+    Call volume per talkgroup in fixed buckets around an incident.
+
+    Args:
+        table (pyarrow.Table): Rows from load() (ideally loaded with start/end around the incident).
+        unixtime (int): Time of the incident.
+        window_seconds (int): Seconds before and after the incident to include.
+        bucket_seconds (int): Bucket width.
+
+    Returns:
+        pyarrow.Table: bucket (unixtime at its start), talkgroup_id, calls, airtime.
+    """
+    start = unixtime - window_seconds
+    window = table.filter(pc.and_(pc.greater_equal(table["unixtime"], start),
+                                  pc.less_equal(table["unixtime"], unixtime + window_seconds)))
+    offsets = pc.subtract(window["unixtime"], start)
+    buckets = pc.add(pc.multiply(pc.divide(offsets, bucket_seconds), bucket_seconds), start)
+    grouped = (window.append_column("bucket", buckets)
+               .group_by(["bucket", "talkgroup_id"])
+               .aggregate([("id", "count"), ("duration", "sum")]))
+    return (grouped.rename_columns(["bucket", "talkgroup_id", "calls", "airtime"])
+            .sort_by([("bucket", "ascending"), ("talkgroup_id", "ascending")]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export recordings to Parquet/Arrow and run analytics on the export")
+    parser.add_argument("--output", type=str, default=os.environ.get("ANALYTICS_DIRECTORY"),
+                        help="Export directory (default: ANALYTICS_DIRECTORY)")
+    parser.add_argument("--format", type=str, choices=sorted(EXTENSIONS), default="parquet", help="File format")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_command = commands.add_parser("export", help="Append new recordings to the export")
+    export_command.add_argument("database", type=str, nargs="?", default=os.environ.get("DATABASE_PATH"),
+                                help="Path to recordings.db (default: DATABASE_PATH)")
+    export_command.add_argument("--batch-size", type=int, default=50000, help="Rows per batch")
+    report = commands.add_parser("report", help="Print an aggregate report")
+    report.add_argument("report", choices=["airtime", "radios", "incident"])
+    report.add_argument("--start", type=int, help="Earliest unixtime")
+    report.add_argument("--end", type=int, help="Latest unixtime")
+    report.add_argument("--at", type=int, help="Incident unixtime (incident report)")
+    report.add_argument("--window", type=int, default=1800, help="Seconds around the incident")
+    report.add_argument("--top", type=int, default=10, help="Number of radios")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("no --output given and ANALYTICS_DIRECTORY is not set")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.command == "export":
+        if not args.database:
+            parser.error("no database given and DATABASE_PATH is not set")
+        print(f"Exported {export(args.database, args.output, args.batch_size, args.format)} recordings")
+    else:
+        if args.report == "incident":
+            if args.at is None:
+                parser.error("the incident report needs --at")
+            data = load(args.output, args.at - args.window, args.at + args.window, file_format=args.format)
+            result = traffic_around(data, args.at, args.window)
+        else:
+            data = load(args.output, args.start, args.end, file_format=args.format)
+            result = airtime_by_talkgroup_hour(data) if args.report == "airtime" else busiest_radios(data, args.top)
+        for entry in result.to_pylist():
+            print(json.dumps(entry))
@@ -1,4 +1,5 @@
 # Standard library imports
+import argparse
 import os
 import time
 import sqlite3
@@ -6,14 +7,25 @@ import xml.etree.ElementTree as ET
 import re
 import logging
 import json
+import sys
 
 # Third-party imports
+import numpy as np
 from pydub import AudioSegment
 from functools import lru_cache
 import openai
-import requests
 import shutil
 
+# Local imports (shared modules live in local_faster_whisper/)
+from schema_v2 import is_v2
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_faster_whisper"))
+from fingerprint import FingerprintIndex, fingerprint
+from recording_leases import LeaseManager
+from transcript_feed import FeedPublisher, transcript_event
+from transcript_store import open_store
+from transcription_backends import BackendError, router_from_environment
+from utils import recording_directory
+
 # Configurations
 RECORDINGS_DIR = os.environ.get("RECORDINGS_DIR", "/home/YOUR_USER/SDRTrunk/recordings")
 XML_PATH = os.environ.get("XML_PATH", "/home/YOUR_USER/SDRTrunk/playlist/default.xml")
@@ -22,7 +34,31 @@ TEN_SIGN_FILE = os.environ.get("TEN_SIGN_FILE", "/home/YOUR_USER/SDRTrunk/Some_C
 CALLSIGNS_PATH = os.environ.get("CALLSIGNS_PATH", "/home/YOUR_USER/SDRTrunk/callsigns.db")
 NCSHP_TEN_SIGN_FILE = os.environ.get("NCSHP_TEN_SIGN_FILE", "/home/YOUR_USER/SDRTrunk/NCSHP_TENCODE.txt")
 SIGNALS_FILE = os.environ.get("SIGNALS_FILE", "/home/YOUR_USER/SDRTrunk/NCSHP_SIGNALS.txt")
+# Several hosts can drain one shared RECORDINGS_DIR: with RECORDING_LEASES=1 each host claims batches
+# of CLAIM_BATCH_SIZE recordings first (claim files in RECORDINGS_DIR/.claims), and claims of a host
+# that stops heartbeating for LEASE_SECONDS are taken over (see local_faster_whisper/recording_leases.py)
+RECORDING_LEASES = os.environ.get("RECORDING_LEASES", "0") == "1"
+LEASE_SECONDS = float(os.environ.get("LEASE_SECONDS", "60"))
+CLAIM_BATCH_SIZE = int(os.environ.get("CLAIM_BATCH_SIZE", "20"))
+# Talkgroups that use the NCSHP ten codes and signals
+NCSHP_TALKGROUPS = ["52198", "52199", "52201"]
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "YOUR_KEY")
+# Near-duplicates (simulcast, patched talkgroups) recorded within this many seconds
+# of each other reuse the first transcription and are linked in recording_links
+DEDUPE_ENABLED = os.environ.get("DEDUPE_ENABLED", "1") == "1"
+DEDUPE_WINDOW_SECONDS = float(os.environ.get("DEDUPE_WINDOW_SECONDS", "10"))
+DEDUPE_MIN_MATCHES = 20
+# Directory layout under RECORDINGS_DIR, e.g. "{talkgroup}/{year}/{month}/{day}" to shard busy
+# talkgroups by date (move existing recordings with local_faster_whisper/migrate_layout.py)
+RECORDING_LAYOUT = os.environ.get("RECORDING_LAYOUT", "{talkgroup}")
+# "sidecar" writes a .txt next to each recording; "segmented" appends to per-day JSONL files
+# in TRANSCRIPT_STORE_DIR (regenerate .txt files with local_faster_whisper/transcript_store.py export)
+TRANSCRIPT_STORE = os.environ.get("TRANSCRIPT_STORE", "sidecar")
+TRANSCRIPT_STORE_DIR = os.environ.get("TRANSCRIPT_STORE_DIR", os.path.join(RECORDINGS_DIR, "transcripts"))
+# Rowids remembered in --watch mode for linking near-duplicates (the oldest are forgotten first)
+WATCH_ROWID_CACHE = 10000
+# Socket of the live transcript feed (local_faster_whisper/transcript_feed.py); empty disables publishing
+TRANSCRIPT_FEED_SOCKET = os.environ.get("TRANSCRIPT_FEED_SOCKET", "/tmp/sdrtrunk-transcriber-feed.sock")
 
 # You could also just grab these from your SDRTrunk XML file
 # if you already have accumulated a list of radio IDs there.
@@ -45,6 +81,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+STORE = open_store(TRANSCRIPT_STORE, TRANSCRIPT_STORE_DIR)
+FEED = FeedPublisher(TRANSCRIPT_FEED_SOCKET) if TRANSCRIPT_FEED_SOCKET else None
+FINGERPRINTS = FingerprintIndex(DEDUPE_WINDOW_SECONDS, DEDUPE_MIN_MATCHES)
+# filename -> (original filename, match score), consumed when the row is inserted
+DUPLICATE_OF = {}
+
 
 def get_formatted_radio_id(radio_id):
     """
@@ -305,42 +347,47 @@ def pyapi_transcribe_audio(file_path):
     return transcript.text
 
 
-def curl_transcribe_audio(file_path):
+@lru_cache(maxsize=None)
+def phrase_hints(talkgroup_id):
     """
-    Transcribes audio from a file using OpenAI's API.
+    Phrase hints for the Google transcription backend: the ten codes used on the talkgroup (and
+    signals on NCSHP talkgroups) plus known callsigns.
 
     Args:
-        file_path (str): The path to the audio file to be transcribed.
+        talkgroup_id (str): The talkgroup of the recording being transcribed.
 
     Returns:
-        str: The transcription of the audio file in JSON format.
+        tuple: The phrases.
     """
-    # Define the endpoint and your API key
-    url = "https://api.openai.com/v1/audio/transcriptions"
-    api_key = OPENAI_API_KEY
+    if talkgroup_id in NCSHP_TALKGROUPS:
+        hints = list(load_ten_codes(NCSHP_TEN_SIGN_FILE)) + list(load_signals(SIGNALS_FILE))
+    else:
+        hints = list(load_ten_codes(TEN_SIGN_FILE))
+    return tuple(hints + list(load_callsigns()))
 
-    # Setup headers
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-    }
 
-    # Open the file and setup files and data to be sent
-    with open(file_path, "rb") as file:
-        files = {
-            "file": file,
-        }
-        data = {
-            "model": "whisper-1",
-            "response_format": "json",
-            "temperature": "0",
-            "language": "en",
-        }
+# OpenAI by default, or the running local_faster_whisper/daemon.py when TRANSCRIBE_SOCKET is set;
+# TRANSCRIPTION_BACKENDS routes between several (see local_faster_whisper/transcription_backends.py)
+ROUTER = router_from_environment(phrase_hints=phrase_hints)
 
-        # Make the POST request
-        response = requests.post(url, headers=headers, files=files, data=data)
 
-    # Print the response or handle as needed
-    return str(response.json())
+def transcribe_audio(file_path, talkgroup_id=None):
+    """
+    Transcribes audio with the configured transcription backends: OpenAI's API, or the shared
+    transcription daemon when TRANSCRIBE_SOCKET is set, unless TRANSCRIPTION_BACKENDS lists others
+    to route between.
+
+    Args:
+        file_path (str): The path to the audio file to be transcribed.
+        talkgroup_id (str): Talkgroup of the recording; jobs for HEDGE_TALKGROUPS are hedged.
+
+    Returns:
+        str: The transcribed text.
+
+    Raises:
+        BackendError: If every backend failed.
+    """
+    return ROUTER.transcribe(file_path, talkgroup_id)
 
 
 def extract_radio_id(filename):
@@ -387,6 +434,17 @@ def connect_to_database():
     )
     """
     )
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS recording_links (
+        recording_rowid INTEGER,
+        duplicate_of_rowid INTEGER,
+        filename TEXT,
+        duplicate_of TEXT,
+        score INTEGER
+    )
+    """
+    )
     return conn, cur
 
 
@@ -411,6 +469,7 @@ def process_file(file):
             - transcription (str): The raw transcription of the audio file.
             - updated_transcription_json (str): The formatted transcription of the audio file in JSON format.
             - talkgroup_name (str): The name of the talkgroup associated with the recording.
+        None if the file was skipped or could not be transcribed.
     """
     logger.info(f"Processing file: {file}")
     if not file.endswith(".mp3"):
@@ -434,14 +493,24 @@ def process_file(file):
     ) = extract_file_details(file, full_path)
 
     # Conditionally load ten codes based on talkgroup_id
-    if talkgroup_id in ["52198", "52199", "52201"]:
+    if talkgroup_id in NCSHP_TALKGROUPS:
         ten_codes = load_ten_codes(NCSHP_TEN_SIGN_FILE)
         signals = load_signals(SIGNALS_FILE)
     else:
         ten_codes = load_ten_codes(TEN_SIGN_FILE)
         signals = None
 
-    transcription = curl_transcribe_audio(new_path)
+    text = find_duplicate_transcription(file, new_path) if DEDUPE_ENABLED else None
+    if text is None:
+        try:
+            text = transcribe_audio(new_path, talkgroup_id)
+        except BackendError as e:
+            # No transcript is stored, so the next run's find_and_move_mp3_without_txt retries it
+            logger.error(f"Error while transcribing {file}: {str(e)}")
+            return None
+        if DEDUPE_ENABLED:
+            FINGERPRINTS.set_value(file, text)
+    transcription = str({"text": text})
     logger.info(f"Transcribed text for {file}: {transcription}")
 
     updated_transcription_json = format_transcription(
@@ -452,6 +521,12 @@ def process_file(file):
 
     talkgroup_name = get_talkgroup_name(XML_PATH, talkgroup_id)
 
+    if FEED is not None:
+        FEED.publish(transcript_event(
+            new_path, text, {"talkgroup_name": talkgroup_name, "details": json.loads(updated_transcription_json)},
+            source="process_recordings",
+        ))
+
     return (
         date,
         time_str,
@@ -467,6 +542,51 @@ def process_file(file):
     )
 
 
+def fingerprint_file(full_path):
+    """
+    Computes the audio fingerprint of an mp3 file.
+
+    Args:
+        full_path (str): The full path of the audio file.
+
+    Returns:
+        list: (hash, frame) pairs as returned by fingerprint.fingerprint.
+    """
+    audio = AudioSegment.from_mp3(full_path).set_channels(1)
+    full_scale = float(1 << (8 * audio.sample_width - 1))
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32) / full_scale
+    return fingerprint(samples, audio.frame_rate)
+
+
+def find_duplicate_transcription(file, full_path):
+    """
+    Looks for a near-duplicate of the recording among those processed within DEDUPE_WINDOW_SECONDS
+    (by file modification time). A match is remembered in DUPLICATE_OF so the rows can be linked
+    once inserted; otherwise the recording is indexed for later matches.
+
+    Args:
+        file (str): The name of the audio file.
+        full_path (str): The full path of the audio file.
+
+    Returns:
+        str or None: The transcribed text of the matching recording, or None if there is no match.
+    """
+    try:
+        prints = fingerprint_file(full_path)
+    except Exception as e:
+        logger.error(f"Error while fingerprinting {file}: {str(e)}")
+        return None
+    timestamp = os.path.getmtime(full_path)
+    match = FINGERPRINTS.match(prints, timestamp)
+    text = FINGERPRINTS.value(match.key) if match else None
+    if text is None:
+        FINGERPRINTS.add(file, prints, timestamp)
+        return None
+    logger.info(f"{file} is a near-duplicate of {match.key} (score {match.score}), reusing its transcription")
+    DUPLICATE_OF[file] = (match.key, match.score)
+    return text
+
+
 def format_transcription(transcription, ten_codes, radio_id, signals=None):
     """
     Formats the given transcription with the provided ten codes, radio ID, and signals data.
@@ -538,7 +658,7 @@ def extract_file_details(file, full_path):
 
 def move_file_based_on_talkgroup(full_path: str, file: str, talkgroup_id: str) -> str:
     """
-    Moves a file to a directory based on its talkgroup ID.
+    Moves a file to a directory based on its talkgroup ID (and date, depending on RECORDING_LAYOUT).
 
     Args:
         full_path (str): The full path of the file to be moved.
@@ -548,9 +668,8 @@ def move_file_based_on_talkgroup(full_path: str, file: str, talkgroup_id: str) -
     Returns:
         str: The new path of the moved file.
     """
-    new_dir = os.path.join(RECORDINGS_DIR, talkgroup_id)
-    if not os.path.exists(new_dir):
-        os.mkdir(new_dir)
+    new_dir = recording_directory(RECORDINGS_DIR, file, talkgroup_id, RECORDING_LAYOUT)
+    os.makedirs(new_dir, exist_ok=True)
     new_path = os.path.join(new_dir, file)
     os.rename(full_path, new_path)
     return new_path
@@ -558,24 +677,21 @@ def move_file_based_on_talkgroup(full_path: str, file: str, talkgroup_id: str) -
 
 def write_transcription_to_file(new_path, updated_transcription_json):
     """
-    Writes the updated transcription JSON to a text file with the same name as the input audio file, but with a .txt extension.
+    Writes the updated transcription JSON to the transcript store: a text file with the same name as the
+    input audio file but a .txt extension, or the segmented store when TRANSCRIPT_STORE is "segmented".
 
     Args:
         new_path (str): The path to the input audio file.
-        updated_transcription_json (str): The updated transcription JSON to be written to the text file.
-
-    Raises:
-        Exception: If there is an error while writing to the text file.
+        updated_transcription_json (str): The updated transcription JSON to be written.
 
     Returns:
         None
     """
     try:
-        logger.info(f"Starting to write to text file for {new_path}")
-        with open(new_path.replace(".mp3", ".txt"), "w") as text_file:
-            text_file.write(updated_transcription_json)
+        logger.info(f"Starting to write transcription for {new_path}")
+        STORE.write(new_path, updated_transcription_json)
     except Exception as e:
-        logger.error(f"Error while writing to text file: {str(e)}")
+        logger.error(f"Error while writing transcription: {str(e)}")
 
 
 def insert_into_database(cur, data):
@@ -588,7 +704,7 @@ def insert_into_database(cur, data):
             (date, time, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, filepath, transcription, v2transcription)
 
     Returns:
-        None
+        int or None: The rowid of the inserted row, or None if the insert failed.
     """
     try:
         logger.info(
@@ -601,27 +717,62 @@ def insert_into_database(cur, data):
             """,
             data,
         )
+        if is_v2(cur.connection):
+            # Inserts through the v2 compatibility view do not set lastrowid
+            return cur.execute("SELECT max(id) FROM recordings_v2 WHERE filepath = ?", (data[8],)).fetchone()[0]
+        return cur.lastrowid
     except Exception as e:
         logger.error(f"Error while inserting into database: {str(e)}")
+        return None
 
 
-def find_and_move_mp3_without_txt():
+def link_duplicate(cur, file, rowids):
     """
-    Find MP3 files in subdirectories of RECORDINGS_DIR that do not have an associated TXT file,
+    Records in recording_links that a recording reused the transcription of a near-duplicate.
+
+    Args:
+        cur: SQLite cursor object.
+        file (str): The name of the (possibly duplicate) audio file.
+        rowids (dict): Rowids of the recordings inserted so far, keyed by filename.
+
+    Returns:
+        None
+    """
+    if file not in DUPLICATE_OF:
+        return
+    original, score = DUPLICATE_OF.pop(file)
+    try:
+        cur.execute(
+            """
+            INSERT INTO recording_links (recording_rowid, duplicate_of_rowid, filename, duplicate_of, score)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (rowids.get(file), rowids.get(original), file, original, score),
+        )
+    except Exception as e:
+        logger.error(f"Error while linking {file} to {original}: {str(e)}")
+
+
+def find_and_move_mp3_without_txt(leases=None):
+    """
+    Find MP3 files in subdirectories of RECORDINGS_DIR that do not have a stored transcription,
     and move them back to the root directory for processing.
+
+    Args:
+        leases (LeaseManager): With several hosts, skips recordings another host is working on.
     """
     for subdir, _, files in os.walk(RECORDINGS_DIR):
         if subdir == RECORDINGS_DIR:  # Skip the root directory
             continue
 
         mp3_files = [f for f in files if f.endswith('.mp3')]
-        txt_files = [f.replace('.txt', '') for f in files if f.endswith('.txt')]
 
         moved_files = []
 
         for mp3 in mp3_files:
-            mp3_base = mp3.replace('.mp3', '')
-            if mp3_base not in txt_files:
+            if leases is not None and leases.is_claimed(mp3):
+                continue
+            if not STORE.contains(os.path.join(subdir, mp3)):
                 logger.info(f"Moving {mp3} to root directory")
                 src_path = os.path.join(subdir, mp3)
                 dest_path = os.path.join(RECORDINGS_DIR, mp3)
@@ -629,6 +780,40 @@ def find_and_move_mp3_without_txt():
                 moved_files.append(mp3)
 
 
+def build_leases():
+    return LeaseManager(RECORDINGS_DIR, lease_seconds=LEASE_SECONDS) if RECORDING_LEASES else None
+
+
+def recording_batches(leases):
+    """
+    Yields the recordings to process: all of them in one batch, or with leases, batches this host
+    has claimed until no unclaimed recordings are left.
+
+    Args:
+        leases (LeaseManager): This host's claims, or None when running alone.
+
+    Yields:
+        list: File names in RECORDINGS_DIR.
+    """
+    # Timestamped names sort in recording order, which keeps near-duplicates together
+    if leases is None:
+        yield sorted(os.listdir(RECORDINGS_DIR))
+        return
+    while True:
+        recordings = sorted(f for f in os.listdir(RECORDINGS_DIR) if f.endswith(".mp3"))
+        batch = leases.claim_batch(recordings, CLAIM_BATCH_SIZE)
+        if not batch:
+            return
+        # Another host may have finished some between the listing and the claim
+        present = []
+        for file in batch:
+            if os.path.exists(os.path.join(RECORDINGS_DIR, file)):
+                present.append(file)
+            else:
+                leases.release(file)
+        yield present
+
+
 def main():
     """
     Process all recordings in the specified directory and insert the data into a database.
@@ -636,15 +821,65 @@ def main():
     Returns:
         None
     """
-    find_and_move_mp3_without_txt()
+    leases = build_leases()
+    if leases is not None:
+        leases.start()
+    try:
+        find_and_move_mp3_without_txt(leases)
+        conn, cur = connect_to_database()
+        rowids = {}
+        for batch in recording_batches(leases):
+            for file in batch:
+                data = process_file(file)
+                if data:
+                    rowids[file] = insert_into_database(cur, data)
+                    link_duplicate(cur, file, rowids)
+                    # The transcript is already stored; a later failure must not roll this row back
+                    conn.commit()
+                if leases is not None:
+                    leases.release(file)
+        conn.close()
+    finally:
+        if leases is not None:
+            leases.stop()
+
+
+def watch():
+    """
+    Keeps running and processes each recording as soon as SDRTrunk finishes writing it,
+    committing one row at a time.
+
+    Returns:
+        None
+    """
+    from recording_watcher import RecordingWatcher
+
+    leases = build_leases()
+    find_and_move_mp3_without_txt(leases)
     conn, cur = connect_to_database()
-    for file in os.listdir(RECORDINGS_DIR):
+    rowids = {}
+
+    def handle(file):
         data = process_file(file)
         if data:
-            insert_into_database(cur, data)
-    conn.commit()
-    conn.close()
+            rowids[file] = insert_into_database(cur, data)
+            link_duplicate(cur, file, rowids)
+            conn.commit()
+            # Only recent recordings can still be matched as duplicates
+            while len(rowids) > WATCH_ROWID_CACHE:
+                rowids.pop(next(iter(rowids)))
+
+    try:
+        RecordingWatcher(RECORDINGS_DIR, handle, leases=leases).run_forever()
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Transcribe, annotate and store SDRTrunk recordings")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process each recording as soon as it is written")
+    if parser.parse_args().watch:
+        watch()
+    else:
+        main()
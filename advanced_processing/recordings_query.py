@@ -0,0 +1,282 @@
+# Standard library imports
+import argparse
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local imports
+from schema_v2 import is_v2
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    "date", "time", "unixtime", "talkgroup_id", "talkgroup_name", "radio_id", "duration",
+    "filename", "filepath", "transcription", "v2transcription",
+]
+MAX_PAGE_SIZE = 500
+
+# Each index ends in unixtime (and implicitly the rowid), so a filtered page is one
+# index range scan in key order plus a lookup of just the rows on the page.
+INDEXES_V1 = [
+    "CREATE INDEX IF NOT EXISTS idx_recordings_unixtime ON recordings (unixtime)",
+    "CREATE INDEX IF NOT EXISTS idx_recordings_talkgroup_unixtime ON recordings (talkgroup_id, unixtime)",
+    "CREATE INDEX IF NOT EXISTS idx_recordings_radio_unixtime ON recordings (radio_id, unixtime)",
+]
+# The v2 schema already indexes unixtime and (talkgroup_id, unixtime)
+INDEXES_V2 = [
+    "CREATE INDEX IF NOT EXISTS idx_recordings_v2_radio_unixtime ON recordings_v2 (radio_id, unixtime)",
+]
+
+
+def ensure_indexes(database_path):
+    """
+    Creates the indexes the timeline queries rely on (needs write access, run once).
+
+    Args:
+        database_path (str): Path to the recordings database.
+
+    Returns:
+        None
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        for statement in INDEXES_V2 if is_v2(conn) else INDEXES_V1:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def encode_cursor(unixtime, row_id):
+    return f"{unixtime}:{row_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Parses a cursor returned as "next" by a previous page.
+
+    Args:
+        cursor (str): The cursor string.
+
+    Returns:
+        tuple: (unixtime, id) of the last row of the previous page.
+    """
+    unixtime, row_id = cursor.split(":")
+    return int(unixtime), int(row_id)
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of read-only SQLite connections shared by request threads.
+    """
+
+    def __init__(self, database_path, size=4):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA query_only = ON")
+            self._connections.put(conn)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._connections.get().close()
+
+
+class TTLCache:
+    """
+    Small LRU cache whose entries expire after ttl_seconds, for the hot first pages dashboards poll.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RecordingsQuery:
+    """
+    Read-only timeline queries over the recordings table (or the v2 compatibility view), paged by
+    (unixtime, id) keysets instead of OFFSET so every page costs the same however deep it is.
+    """
+
+    def __init__(self, database_path, pool_size=4, cache_ttl=5.0):
+        self.pool = ConnectionPool(database_path, pool_size)
+        self.cache = TTLCache(ttl_seconds=cache_ttl)
+        with self.pool.connection() as conn:
+            # Migrated databases expose the old rowid as the view's id column
+            self.id_column = "id" if is_v2(conn) else "rowid"
+
+    def page(self, talkgroup_id=None, radio_id=None, start=None, end=None, cursor=None, limit=50, order="desc"):
+        """
+        Returns one page of recordings, newest first by default.
+
+        Args:
+            talkgroup_id (int, optional): Only recordings of this talkgroup.
+            radio_id (int, optional): Only recordings from this radio.
+            start (int, optional): Earliest unixtime (inclusive).
+            end (int, optional): Latest unixtime (inclusive).
+            cursor (str, optional): The "next" value of the previous page.
+            limit (int): Page size, at most MAX_PAGE_SIZE.
+            order (str): "desc" (newest first) or "asc".
+
+        Returns:
+            dict: {"recordings": [row dicts including "id"], "next": cursor for the next page or None}.
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError(f"order must be asc or desc, not {order}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        key = (talkgroup_id, radio_id, start, end, cursor, limit, order)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        conditions = []
+        params = []
+        for column, value in (("talkgroup_id", talkgroup_id), ("radio_id", radio_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(int(value))
+        if start is not None:
+            conditions.append("unixtime >= ?")
+            params.append(int(start))
+        if end is not None:
+            conditions.append("unixtime <= ?")
+            params.append(int(end))
+        if cursor:
+            conditions.append(f"(unixtime, {self.id_column}) {'<' if order == 'desc' else '>'} (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = order.upper()
+        sql = (
+            f"SELECT {self.id_column} AS id, {', '.join(COLUMNS)} FROM recordings {where} "
+            f"ORDER BY unixtime {direction}, {self.id_column} {direction} LIMIT ?"
+        )
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+
+        recordings = [dict(zip(["id"] + COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = recordings[-1]
+            next_cursor = encode_cursor(last["unixtime"], last["id"])
+        result = {"recordings": recordings, "next": next_cursor}
+        self.cache.put(key, result)
+        return result
+
+    def close(self):
+        self.pool.close()
+
+
+class RecordingsRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /recordings?talkgroup=&radio=&start=&end=&cursor=&limit=&order= returns one page as JSON.
+    """
+
+    query = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/recordings":
+            self.send_error(404)
+            return
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            result = self.query.page(
+                talkgroup_id=params.get("talkgroup"),
+                radio_id=params.get("radio"),
+                start=params.get("start"),
+                end=params.get("end"),
+                cursor=params.get("cursor"),
+                limit=params.get("limit", 50),
+                order=params.get("order", "desc"),
+            )
+        except (ValueError, TypeError) as e:
+            self.send_error(400, str(e))
+            return
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Query request: {format % args}")
+
+
+def start_query_server(query, port, host="127.0.0.1"):
+    """
+    Serves the query API on a background thread.
+
+    Args:
+        query (RecordingsQuery): The query layer to serve.
+        port (int): Port to listen on (0 picks a free one).
+        host (str): Address to bind.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    handler = type("BoundRecordingsRequestHandler", (RecordingsRequestHandler,), {"query": query})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="recordings-query", daemon=True).start()
+    logger.info(f"Recordings query API at http://{host}:{server.server_address[1]}/recordings")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only timeline API over the recordings database")
+    parser.add_argument("database", type=str, nargs="?", default=os.environ.get("DATABASE_PATH"),
+                        help="Path to recordings.db (default: DATABASE_PATH)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--pool-size", type=int, default=4, help="Read-only connections")
+    parser.add_argument("--cache-ttl", type=float, default=5.0, help="Seconds to cache each page")
+    parser.add_argument("--create-indexes", action="store_true", help="Create the timeline indexes first")
+    args = parser.parse_args()
+    if not args.database:
+        parser.error("no database given and DATABASE_PATH is not set")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.create_indexes:
+        ensure_indexes(args.database)
+    api = RecordingsQuery(args.database, args.pool_size, args.cache_ttl)
+    server = start_query_server(api, args.port, args.host)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        api.close()
@@ -0,0 +1,279 @@
+# Standard library imports
+import argparse
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+def after_last(expression, separator):
+    """
+    SQL for the part of a string expression after the last separator (all of it if there is none):
+    rtrim strips every trailing character that is not the separator.
+
+    Args:
+        expression (str): SQL expression.
+        separator (str): Single separator character.
+
+    Returns:
+        str: SQL expression.
+    """
+    return f"substr({expression}, length(rtrim({expression}, replace({expression}, '{separator}', ''))) + 1)"
+
+
+# recordings_v2 keeps the old table's rowids as its id, so recording_links and
+# anything else holding rowids stays valid. date/time/talkgroup_name are no
+# longer stored: the compatibility view derives them (SQLite does not allow
+# 'localtime' in generated columns), and filename is a virtual column taken
+# from the last path component (after '#' for archived bundle members).
+SCHEMA_V2 = """
+CREATE TABLE IF NOT EXISTS talkgroups (
+    talkgroup_id INTEGER PRIMARY KEY,
+    talkgroup_name TEXT
+) STRICT;
+
+CREATE TABLE IF NOT EXISTS recordings_v2 (
+    id INTEGER PRIMARY KEY,
+    unixtime INTEGER NOT NULL,
+    talkgroup_id INTEGER NOT NULL REFERENCES talkgroups (talkgroup_id),
+    radio_id INTEGER,
+    duration REAL,
+    filepath TEXT NOT NULL,
+    transcription TEXT,
+    v2transcription TEXT,
+    filename TEXT GENERATED ALWAYS AS ({filename}) VIRTUAL
+) STRICT;
+
+CREATE INDEX IF NOT EXISTS idx_recordings_v2_unixtime ON recordings_v2 (unixtime);
+CREATE INDEX IF NOT EXISTS idx_recordings_v2_talkgroup_unixtime ON recordings_v2 (talkgroup_id, unixtime);
+CREATE INDEX IF NOT EXISTS idx_recordings_v2_filepath ON recordings_v2 (filepath);
+""".replace("{filename}", after_last(after_last("filepath", "/"), "#"))
+
+# The old table's name becomes a view with the old columns, and triggers route
+# writes to the v2 tables, so existing queries and process_recordings.py keep working.
+COMPATIBILITY_VIEW = [
+    """
+CREATE VIEW recordings AS
+SELECT
+    r.id AS id,
+    strftime('%Y%m%d', r.unixtime, 'unixepoch', 'localtime') AS date,
+    strftime('%H:%M', r.unixtime, 'unixepoch', 'localtime') AS time,
+    r.unixtime AS unixtime,
+    r.talkgroup_id AS talkgroup_id,
+    t.talkgroup_name AS talkgroup_name,
+    r.radio_id AS radio_id,
+    r.duration AS duration,
+    r.filename AS filename,
+    r.filepath AS filepath,
+    r.transcription AS transcription,
+    r.v2transcription AS v2transcription
+FROM recordings_v2 r
+LEFT JOIN talkgroups t ON t.talkgroup_id = r.talkgroup_id;
+""",
+    """
+CREATE TRIGGER recordings_insert INSTEAD OF INSERT ON recordings
+BEGIN
+    INSERT INTO talkgroups (talkgroup_id, talkgroup_name)
+    VALUES (CAST(NEW.talkgroup_id AS INTEGER), NEW.talkgroup_name)
+    ON CONFLICT (talkgroup_id) DO UPDATE SET talkgroup_name = coalesce(excluded.talkgroup_name, talkgroup_name);
+    INSERT INTO recordings_v2 (id, unixtime, talkgroup_id, radio_id, duration, filepath, transcription, v2transcription)
+    VALUES (
+        NEW.id,
+        CAST(NEW.unixtime AS INTEGER),
+        CAST(NEW.talkgroup_id AS INTEGER),
+        CASE WHEN CAST(NEW.radio_id AS TEXT) GLOB '[0-9]*' THEN CAST(NEW.radio_id AS INTEGER) END,
+        CAST(NEW.duration AS REAL),
+        NEW.filepath,
+        NEW.transcription,
+        NEW.v2transcription
+    );
+END;
+""",
+    """
+CREATE TRIGGER recordings_update INSTEAD OF UPDATE ON recordings
+BEGIN
+    UPDATE recordings_v2 SET
+        unixtime = CAST(NEW.unixtime AS INTEGER),
+        talkgroup_id = CAST(NEW.talkgroup_id AS INTEGER),
+        radio_id = CASE WHEN CAST(NEW.radio_id AS TEXT) GLOB '[0-9]*' THEN CAST(NEW.radio_id AS INTEGER) END,
+        duration = CAST(NEW.duration AS REAL),
+        filepath = NEW.filepath,
+        transcription = NEW.transcription,
+        v2transcription = NEW.v2transcription
+    WHERE id = OLD.id;
+END;
+""",
+    """
+CREATE TRIGGER recordings_delete INSTEAD OF DELETE ON recordings
+BEGIN
+    DELETE FROM recordings_v2 WHERE id = OLD.id;
+END;
+""",
+]
+
+
+def is_v2(conn):
+    """
+    Returns True if the database has been migrated (recordings is the compatibility view).
+
+    Args:
+        conn (sqlite3.Connection): Connection to the recordings database.
+
+    Returns:
+        bool: Whether the v2 schema is in place.
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'recordings'").fetchone()
+    return row is not None and row[0] == "view"
+
+
+def to_int(value):
+    """
+    Converts a value to int, returning None for values such as "Unknown ID".
+
+    Args:
+        value: The value to convert.
+
+    Returns:
+        int or None: The converted value.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_float(value):
+    """
+    Converts a value to float, returning None if it is not numeric.
+
+    Args:
+        value: The value to convert.
+
+    Returns:
+        float or None: The converted value.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def copy_batch(conn, last_id, batch_size):
+    """
+    Copies the next batch of rows after last_id from the old recordings table into the v2 tables.
+    The caller owns the transaction.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the recordings database.
+        last_id (int): The last rowid already copied.
+        batch_size (int): Maximum number of rows to copy.
+
+    Returns:
+        tuple: The number of rows copied and the last rowid read (last_id if there were none).
+    """
+    rows = conn.execute(
+        """
+        SELECT rowid, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, filepath,
+               transcription, v2transcription
+        FROM recordings WHERE rowid > ? ORDER BY rowid LIMIT ?
+        """,
+        (last_id, batch_size),
+    ).fetchall()
+    talkgroups = {}
+    recordings = []
+    for rowid, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, filepath, transcription, v2 in rows:
+        talkgroup_id = to_int(talkgroup_id)
+        if talkgroup_id is None or to_int(unixtime) is None:
+            logger.warning(f"Skipping row {rowid} ({filename}): missing talkgroup or time")
+            continue
+        if talkgroup_name or talkgroup_id not in talkgroups:
+            talkgroups[talkgroup_id] = talkgroup_name
+        # filename is derived from filepath in v2; rows that only stored a name keep it as the path
+        recordings.append((rowid, to_int(unixtime), talkgroup_id, to_int(radio_id), to_float(duration),
+                           filepath or filename, transcription, v2))
+    conn.executemany(
+        """
+        INSERT INTO talkgroups (talkgroup_id, talkgroup_name) VALUES (?, ?)
+        ON CONFLICT (talkgroup_id) DO UPDATE SET talkgroup_name = coalesce(excluded.talkgroup_name, talkgroup_name)
+        """,
+        talkgroups.items(),
+    )
+    conn.executemany(
+        """
+        INSERT INTO recordings_v2 (id, unixtime, talkgroup_id, radio_id, duration, filepath, transcription, v2transcription)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        recordings,
+    )
+    return len(recordings), rows[-1][0] if rows else last_id
+
+
+def migrate(conn, batch_size=5000, drop_old=False):
+    """
+    Copies the recordings table into the v2 schema in rowid order, one batch per transaction, then
+    replaces it with the compatibility view. Rows added while copying are picked up in the final
+    transaction, so process_recordings.py can keep running. The old table is kept as recordings_v1
+    unless drop_old is set. An interrupted migration resumes after the last copied rowid.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the recordings database.
+        batch_size (int): Rows copied per transaction.
+        drop_old (bool): Drop the old table once the view is in place.
+
+    Returns:
+        int: The number of rows copied.
+    """
+    if is_v2(conn):
+        logger.info("Database already uses the v2 schema")
+        return 0
+    conn.executescript(SCHEMA_V2)
+    last_id = conn.execute("SELECT coalesce(max(id), 0) FROM recordings_v2").fetchone()[0]
+    copied = 0
+    while True:
+        with conn:
+            count, next_id = copy_batch(conn, last_id, batch_size)
+        if next_id == last_id:
+            break
+        copied += count
+        last_id = next_id
+        logger.info(f"Copied {copied} recordings (up to rowid {last_id})")
+
+    # Swap in the view atomically, after copying anything inserted meanwhile
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        while True:
+            count, next_id = copy_batch(conn, last_id, batch_size)
+            if next_id == last_id:
+                break
+            copied += count
+            last_id = next_id
+        conn.execute("ALTER TABLE recordings RENAME TO recordings_v1")
+        for statement in COMPATIBILITY_VIEW:
+            conn.execute(statement)
+        if drop_old:
+            conn.execute("DROP TABLE recordings_v1")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    logger.info(f"Migration complete: {copied} recordings copied")
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the recordings database to the compact v2 schema")
+    parser.add_argument("database", type=str, nargs="?", default=os.environ.get("DATABASE_PATH"),
+                        help="Path to recordings.db (default: DATABASE_PATH)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows copied per transaction")
+    parser.add_argument("--drop-old", action="store_true", help="Drop the old table (kept as recordings_v1 otherwise)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+    if not args.database:
+        parser.error("no database given and DATABASE_PATH is not set")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    connection = sqlite3.connect(args.database)
+    print(f"Copied {migrate(connection, args.batch_size, args.drop_old)} recordings")
+    if args.vacuum:
+        connection.execute("VACUUM")
+    connection.close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts in advanced_processing/ are run directly, not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+from analytics_export import (
+    EXTENSIONS, SCHEMA, airtime_by_talkgroup_hour, busiest_radios, export, load, partition_day, read_state, traffic_around,
+)
+from schema_v2 import migrate
+
+COLUMNS = "date, time, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, filepath, transcription, v2transcription"
+# 2023-10-01 12:00 UTC, so the first hour stays on one local day in any timezone
+START = 1696161600
+
+def insert(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS recordings ({COLUMNS})")
+    conn.executemany(f"INSERT INTO recordings ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [("", "", unixtime, str(talkgroup), "Fire", radio, str(duration), f"call{unixtime}.mp3",
+                       f"/recordings/call{unixtime}.mp3", "{}", "{}") for unixtime, talkgroup, radio, duration in rows])
+    conn.commit()
+    conn.close()
+
+@pytest.mark.parametrize("file_format", sorted(EXTENSIONS))
+def test_incremental_export_appends_new_rows(tmp_path, file_format):
+    database, output = str(tmp_path / "recordings.db"), str(tmp_path / "export")
+    insert(database, [(START, 41001, "1610001", 4.0), (START + 30, 41002, "Unknown ID", 2.5),
+                      (START + 86400, 41001, "1610002", 6.0)])
+    assert export(database, output, batch_size=2, file_format=file_format) == 3
+    assert export(database, output, file_format=file_format) == 0
+    # Late arrival with an older timestamp is still exported
+    insert(database, [(START + 60, 41001, "1610001", 3.0)])
+    assert export(database, output, file_format=file_format) == 1
+    assert read_state(output) == {"last_id": 4, "max_unixtime": START + 86400}
+    assert sorted(os.listdir(output)) == ["_export_state.json", f"date={partition_day(START)}",
+                                          f"date={partition_day(START + 86400)}"]
+
+    table = load(output, file_format=file_format)
+    assert sorted(table["id"].to_pylist()) == [1, 2, 3, 4]
+    assert sorted(load(output, START + 10, START + 3600, file_format=file_format)["id"].to_pylist()) == [2, 4]
+    radios = dict(zip(table["id"].to_pylist(), table["radio_id"].to_pylist()))
+    assert radios[1] == 1610001 and radios[2] is None
+
+def test_export_reads_v2_and_drops_unrecorded_parts(tmp_path):
+    database, output = str(tmp_path / "recordings.db"), str(tmp_path / "export")
+    insert(database, [(START + i, 41001, "1610001", 1.0) for i in range(5)])
+    conn = sqlite3.connect(database)
+    migrate(conn)
+    conn.close()
+    assert export(database, output, batch_size=2) == 5
+    # A part written after the last recorded high-water mark (interrupted run) is discarded
+    stray = os.path.join(output, f"date={partition_day(START)}", "part-000000000099-000000000100.parquet")
+    open(stray, "wb").close()
+    assert export(database, output) == 0
+    assert not os.path.exists(stray)
+    assert load(output).num_rows == 5
+
+def test_reports():
+    rows = [(1, START, 41001, 1610001, 10.0), (2, START + 100, 41001, 1610002, 5.0),
+            (3, START + 200, 41002, 1610001, 20.0), (4, START + 3700, 41001, 1610001, 1.0),
+            (5, START + 3800, 41002, None, 2.0)]
+    table = pa.table({
+        "id": [r[0] for r in rows], "unixtime": [r[1] for r in rows], "talkgroup_id": [r[2] for r in rows],
+        "talkgroup_name": ["Fire"] * 5, "radio_id": [r[3] for r in rows], "duration": [r[4] for r in rows],
+        "filename": [""] * 5, "transcription": [""] * 5,
+    }, schema=SCHEMA)
+    hour = START - START % 3600
+    assert airtime_by_talkgroup_hour(table).to_pylist() == [
+        {"hour": hour, "talkgroup_id": 41002, "calls": 1, "airtime": 20.0},
+        {"hour": hour, "talkgroup_id": 41001, "calls": 2, "airtime": 15.0},
+        {"hour": hour + 3600, "talkgroup_id": 41002, "calls": 1, "airtime": 2.0},
+        {"hour": hour + 3600, "talkgroup_id": 41001, "calls": 1, "airtime": 1.0},
+    ]
+    assert busiest_radios(table, top=1).to_pylist() == [{"radio_id": 1610001, "calls": 3, "airtime": 31.0}]
+    assert traffic_around(table, START + 150, window_seconds=100, bucket_seconds=100).to_pylist() == [
+        {"bucket": START + 50, "talkgroup_id": 41001, "calls": 1, "airtime": 5.0},
+        {"bucket": START + 150, "talkgroup_id": 41002, "calls": 1, "airtime": 20.0},
+    ]
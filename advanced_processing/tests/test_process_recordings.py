@@ -0,0 +1,37 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+
+class FakeRouter:
+    def transcribe(self, path, talkgroup_id=None):
+        return "Engine 4 responding"
+
+
+@pytest.fixture
+def script(tmp_path, monkeypatch):
+    # Imported here so its logging.basicConfig finds pytest's handlers and does not create script_log.log
+    import process_recordings
+
+    monkeypatch.setattr(process_recordings, "RECORDINGS_DIR", str(tmp_path))
+    monkeypatch.setattr(process_recordings, "ROUTER", FakeRouter())
+    monkeypatch.setattr(process_recordings, "FEED", MagicMock())
+    monkeypatch.setattr(process_recordings, "DEDUPE_ENABLED", False)
+    monkeypatch.setattr(process_recordings, "get_file_duration", lambda path: "12.0")
+    monkeypatch.setattr(process_recordings, "load_ten_codes", lambda path: {})
+    monkeypatch.setattr(process_recordings, "load_callsigns", lambda: {})
+    monkeypatch.setattr(process_recordings, "get_talkgroup_name", lambda xml_path, talkgroup_id: "Fire Dispatch")
+    return process_recordings
+
+
+def test_feed_events_carry_the_plain_transcript(script, tmp_path):
+    name = "20231001_173024Fire__TO_41001_FROM_1610092.mp3"
+    (tmp_path / name).write_bytes(b"call audio")
+    data = script.process_file(name)
+
+    event = script.FEED.publish.call_args[0][0]
+    assert event["path"] == str(tmp_path / "41001" / name)
+    assert event["text"] == "Engine 4 responding"
+    assert event["talkgroup_name"] == "Fire Dispatch"
+    # The database row keeps the stored form
+    assert data[9] == str({"text": "Engine 4 responding"})
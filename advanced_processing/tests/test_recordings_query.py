@@ -0,0 +1,91 @@
+import json
+import sqlite3
+import urllib.request
+
+import pytest
+from recordings_query import RecordingsQuery, ensure_indexes, start_query_server
+from schema_v2 import migrate
+
+SCHEMA = """
+CREATE TABLE recordings (date TEXT, time TEXT, unixtime INTEGER, talkgroup_id INTEGER, talkgroup_name TEXT,
+                         radio_id INTEGER, duration TEXT, filename TEXT, filepath TEXT, transcription TEXT,
+                         v2transcription TEXT)
+"""
+COLUMNS = "date, time, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, filepath, transcription, v2transcription"
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "recordings.db")
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    # Three calls per second, so pages split rows sharing a unixtime
+    conn.executemany(f"INSERT INTO recordings ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [("20231001", "17:30", 1696000000 + i // 3, str(41000 + i % 2), "Fire", str(1610000 + i % 5),
+                       "3.0", f"call{i}.mp3", f"/recordings/call{i}.mp3", "{}", "{}") for i in range(40)])
+    conn.commit()
+    conn.close()
+    return path
+
+def walk(query, **filters):
+    ids, cursor = [], None
+    while True:
+        page = query.page(cursor=cursor, limit=7, **filters)
+        ids += [r["id"] for r in page["recordings"]]
+        cursor = page["next"]
+        if cursor is None:
+            return ids
+
+@pytest.mark.parametrize("v2", [False, True])
+def test_keyset_pages_cover_every_row_once(database, v2):
+    if v2:
+        conn = sqlite3.connect(database)
+        migrate(conn)
+        conn.close()
+    ensure_indexes(database)
+    query = RecordingsQuery(database, pool_size=2, cache_ttl=0)
+    assert walk(query) == list(range(40, 0, -1))
+    assert walk(query, talkgroup_id=41001, order="asc") == list(range(2, 41, 2))
+    assert walk(query, radio_id=1610003, start=1696000002, end=1696000010) == [29, 24, 19, 14, 9]
+    query.close()
+
+def test_filtered_pages_use_the_indexes(database):
+    ensure_indexes(database)
+    conn = sqlite3.connect(database)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT rowid FROM recordings WHERE talkgroup_id = 41001 "
+                        "AND (unixtime, rowid) < (?, ?) ORDER BY unixtime DESC, rowid DESC LIMIT 8",
+                        (1696000005, 16)).fetchall()
+    conn.close()
+    assert "COVERING INDEX idx_recordings_talkgroup_unixtime" in plan[0][3]
+    assert "TEMP B-TREE" not in str(plan)
+
+def test_connections_are_read_only_and_pages_are_cached(database):
+    query = RecordingsQuery(database, pool_size=1, cache_ttl=60)
+    first = query.page(limit=5)
+    with query.pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM recordings")
+    writer = sqlite3.connect(database)
+    writer.execute("DELETE FROM recordings")
+    writer.commit()
+    writer.close()
+    assert query.page(limit=5) is first
+    assert query.page(limit=4)["recordings"] == []
+    query.close()
+
+def test_http_server(database):
+    query = RecordingsQuery(database, cache_ttl=0)
+    server = start_query_server(query, 0)
+    base = f"http://127.0.0.1:{server.server_address[1]}/recordings"
+    try:
+        with urllib.request.urlopen(f"{base}?talkgroup=41000&limit=3") as response:
+            page = json.load(response)
+        assert [r["filename"] for r in page["recordings"]] == ["call38.mp3", "call36.mp3", "call34.mp3"]
+        with urllib.request.urlopen(f"{base}?talkgroup=41000&limit=3&cursor={page['next']}") as response:
+            assert json.load(response)["recordings"][0]["filename"] == "call32.mp3"
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base}?order=sideways")
+        assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        query.close()
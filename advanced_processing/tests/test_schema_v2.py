@@ -0,0 +1,60 @@
+import sqlite3
+import time
+
+import pytest
+from schema_v2 import SCHEMA_V2, copy_batch, is_v2, migrate
+
+COLUMNS = "date, time, unixtime, talkgroup_id, talkgroup_name, radio_id, duration, filename, filepath, transcription, v2transcription"
+START = int(time.mktime(time.strptime("20231001 17:30", "%Y%m%d %H:%M")))
+
+def row(i, talkgroup_id="41003", radio_id="1610092", filepath=None):
+    name = f"20231001_1730{i:02d}Name__TO_{talkgroup_id}_FROM_{radio_id}.mp3"
+    return ("20231001", "17:30", START + i, talkgroup_id, "Fire Dispatch" if i % 2 else None, radio_id,
+            "12.5", name, filepath or f"/recordings/{talkgroup_id}/{name}", "{'text': 'Engine 4'}", "{}")
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "recordings.db"))
+    conn.execute(f"CREATE TABLE recordings ({COLUMNS})")
+    conn.executemany(f"INSERT INTO recordings ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     [row(i) for i in range(7)] + [row(7, radio_id="Unknown ID")])
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_migration_keeps_old_queries_working(conn):
+    before = conn.execute(f"SELECT rowid, {COLUMNS} FROM recordings ORDER BY rowid").fetchall()
+    assert migrate(conn, batch_size=3) == 8
+    assert is_v2(conn)
+    after = conn.execute(f"SELECT id, {COLUMNS} FROM recordings ORDER BY id").fetchall()
+    assert [r[:4] + r[8:10] for r in after] == [(r[0], r[1], r[2], r[3]) + r[8:10] for r in before]
+    assert {r[5] for r in after} == {"Fire Dispatch"}
+    assert after[0][7] == 12.5 and after[7][6] is None
+    assert conn.execute("SELECT count(*) FROM talkgroups").fetchone()[0] == 1
+
+def test_view_accepts_inserts_and_updates(conn):
+    migrate(conn, drop_old=True)
+    conn.execute(f"INSERT INTO recordings ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 row(20, talkgroup_id="52198", filepath="/archive/52198-20231001.zip#call.mp3"))
+    assert conn.execute("SELECT filename, radio_id FROM recordings WHERE talkgroup_id = 52198").fetchone() == \
+        ("call.mp3", 1610092)
+    conn.execute("UPDATE recordings SET filepath = ? WHERE id = 1", ("/elsewhere/moved.mp3",))
+    assert conn.execute("SELECT filename FROM recordings WHERE id = 1").fetchone() == ("moved.mp3",)
+    with pytest.raises(sqlite3.IntegrityError):
+        # STRICT rejects values of the wrong type
+        conn.execute("INSERT INTO recordings_v2 (unixtime, talkgroup_id, filepath) VALUES ('soon', 1, 'x')")
+
+def test_range_scan_uses_index(conn):
+    migrate(conn)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM recordings WHERE talkgroup_id = 41003 "
+                        "AND unixtime BETWEEN ? AND ?", (START, START + 5)).fetchall()
+    assert "idx_recordings_v2_talkgroup_unixtime" in plan[0][3]
+
+def test_migration_resumes_and_is_idempotent(conn):
+    # Interrupted after the first batch
+    conn.executescript(SCHEMA_V2)
+    with conn:
+        copy_batch(conn, 0, 3)
+    assert migrate(conn) == 5
+    assert conn.execute("SELECT count(*) FROM recordings").fetchone()[0] == 8
+    assert migrate(conn) == 0
@@ -0,0 +1,271 @@
+import argparse
+import json
+import random
+import re
+import time
+from collections import Counter
+
+# Condition kinds looked up in the compiled tables; a rule matches when every kind it uses matches
+KEYWORDS, TEN_CODES, TALKGROUPS, RADIOS = range(4)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_hours(spec):
+    """
+    Parses a time-of-day window such as "22-6" (10pm to 6am) into the hours it covers.
+
+    Args:
+        spec (str): "start-end" in hours, end exclusive; windows may wrap past midnight.
+
+    Returns:
+        set: Hours of the day (0-23).
+    """
+    start, end = (int(part) % 24 for part in spec.split("-"))
+    if start < end:
+        return set(range(start, end))
+    return set(range(start, 24)) | set(range(0, end))
+
+
+def ten_code_phrases(code):
+    """
+    Token sequences a ten code can appear as in a transcript: "10-50" is read as "10-50" or "1050",
+    the same forms process_recordings.py recognises.
+
+    Args:
+        code (str): The ten code, e.g. "10-50".
+
+    Returns:
+        set: Token tuples.
+    """
+    return {tuple(tokenize(code)), tuple(tokenize(code.replace("10-", "10")))}
+
+
+def contains_phrase(tokens, phrase):
+    n = len(phrase)
+    return any(tuple(tokens[i:i + n]) == phrase for i in range(len(tokens) - n + 1))
+
+
+class AlertRule:
+    """
+    One subscription rule. Each list is "any of"; the rule matches when every condition it sets matches.
+    """
+
+    def __init__(self, keywords=(), ten_codes=(), talkgroups=(), radios=(), hours=None):
+        self.keywords = [tuple(tokenize(keyword)) for keyword in keywords if tokenize(keyword)]
+        self.ten_codes = [ten_code_phrases(code) for code in ten_codes]
+        self.talkgroups = {int(talkgroup) for talkgroup in talkgroups}
+        self.radios = {int(radio) for radio in radios}
+        self.hours = parse_hours(hours) if hours else None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("keywords", ()), data.get("ten_codes", ()), data.get("talkgroups", ()),
+                   data.get("radios", ()), data.get("hours"))
+
+    def matches(self, transcription, talkgroup_id=None, radio_id=None, unixtime=None):
+        """
+        Evaluates this rule on its own (the reference the compiled engine must agree with).
+        """
+        tokens = tokenize(transcription)
+        if self.keywords and not any(contains_phrase(tokens, phrase) for phrase in self.keywords):
+            return False
+        if self.ten_codes and not any(contains_phrase(tokens, phrase) for forms in self.ten_codes for phrase in forms):
+            return False
+        if self.talkgroups and to_int(talkgroup_id) not in self.talkgroups:
+            return False
+        if self.radios and to_int(radio_id) not in self.radios:
+            return False
+        if self.hours is not None and time.localtime(unixtime).tm_hour not in self.hours:
+            return False
+        return True
+
+
+class Subscriber:
+    def __init__(self, name, email, rules):
+        self.name = name
+        self.email = email
+        self.rules = rules
+
+    @classmethod
+    def from_dict(cls, data):
+        # Without an address the notifier would fall back to EMAIL_RECEIVER and send this subscriber's
+        # alerts to the default inbox
+        if not data.get("email"):
+            raise ValueError(f"Subscriber {data.get('name')!r} has no email address")
+        return cls(data["name"], data["email"], [AlertRule.from_dict(rule) for rule in data.get("rules", [])])
+
+
+class RuleEngine:
+    """
+    All subscribers' rules compiled into shared lookup tables: one dictionary of keyword and ten-code
+    phrases probed with every token n-gram of the transcript, and dictionaries from talkgroup and radio
+    to the rules that use them. Each hit counts one satisfied condition kind for its rule, and a rule
+    matches when all of its kinds are counted and the time of day is inside its window (checked only for
+    those candidates), so the cost of match() depends on the transcript length and the number of hits,
+    not on how many rules there are.
+    """
+
+    def __init__(self, subscribers):
+        self.subscribers = subscribers
+        self.rule_subscriber = []
+        self.required = []
+        self.phrases = {}
+        self.talkgroups = {}
+        self.radios = {}
+        self.rule_hours = []
+        self.always = []
+        for index, subscriber in enumerate(subscribers):
+            for rule in subscriber.rules:
+                self._compile(len(self.rule_subscriber), rule)
+                self.rule_subscriber.append(index)
+        self.max_phrase = max((len(phrase) for phrase in self.phrases), default=0)
+
+    def _compile(self, rule_id, rule):
+        kinds = 0
+        for kind, phrases in ((KEYWORDS, rule.keywords), (TEN_CODES, [p for forms in rule.ten_codes for p in forms])):
+            if phrases:
+                kinds += 1
+                for phrase in phrases:
+                    self.phrases.setdefault(phrase, set()).add((rule_id, kind))
+        for kind, values, table in ((TALKGROUPS, rule.talkgroups, self.talkgroups), (RADIOS, rule.radios, self.radios)):
+            if values:
+                kinds += 1
+                for value in values:
+                    table.setdefault(value, []).append((rule_id, kind))
+        self.rule_hours.append(rule.hours)
+        if kinds == 0:
+            self.always.append(rule_id)
+        self.required.append(kinds)
+
+    def match(self, transcription, talkgroup_id=None, radio_id=None, unixtime=None):
+        """
+        Finds the subscribers with at least one matching rule.
+
+        Args:
+            transcription (str): The transcript text.
+            talkgroup_id (int or str, optional): Talkgroup of the recording.
+            radio_id (int or str, optional): Transmitting radio ("Unknown ID" never matches).
+            unixtime (int, optional): Time of the recording (default: now).
+
+        Returns:
+            list: Matching Subscriber objects, in the order they were defined.
+        """
+        satisfied = set()
+        tokens = tokenize(transcription)
+        for n in range(1, self.max_phrase + 1):
+            for i in range(len(tokens) - n + 1):
+                hits = self.phrases.get(tuple(tokens[i:i + n]))
+                if hits:
+                    satisfied.update(hits)
+        satisfied.update(self.talkgroups.get(to_int(talkgroup_id), ()))
+        satisfied.update(self.radios.get(to_int(radio_id), ()))
+
+        counts = Counter(rule_id for rule_id, _ in satisfied)
+        candidates = [rule_id for rule_id, count in counts.items() if count == self.required[rule_id]] + self.always
+        hour = time.localtime(unixtime).tm_hour
+        matched = {self.rule_subscriber[rule_id] for rule_id in candidates
+                   if self.rule_hours[rule_id] is None or hour in self.rule_hours[rule_id]}
+        return [self.subscribers[index] for index in sorted(matched)]
+
+    def match_naive(self, transcription, talkgroup_id=None, radio_id=None, unixtime=None):
+        """
+        Evaluates every rule one by one; only used for comparison.
+        """
+        return [subscriber for subscriber in self.subscribers
+                if any(rule.matches(transcription, talkgroup_id, radio_id, unixtime) for rule in subscriber.rules)]
+
+
+def load_rules(path):
+    """
+    Loads subscribers and their rules from a JSON file:
+    {"subscribers": [{"name": ..., "email": ..., "rules": [{"keywords": [...], "ten_codes": [...],
+    "talkgroups": [...], "radios": [...], "hours": "22-6"}]}]}
+
+    Args:
+        path (str): Path to the rules file.
+
+    Returns:
+        RuleEngine: The compiled rules.
+
+    Raises:
+        ValueError: If a subscriber has no email address.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return RuleEngine([Subscriber.from_dict(subscriber) for subscriber in data["subscribers"]])
+
+
+WORDS = ("engine medic ladder structure fire smoke showing mayday rescue water vehicle accident injuries "
+         "respond station clear scene command tanker brush alarm commercial residential units staging").split()
+# Unit and street names make up most of a real vocabulary
+VOCABULARY = WORDS + [f"unit{i}" for i in range(1000)] + [f"street{i}" for i in range(1000)]
+
+
+def random_rule(rng, vocabulary=VOCABULARY):
+    rule = {}
+    if rng.random() < 0.7:
+        rule["keywords"] = [" ".join(rng.sample(vocabulary, rng.choice((1, 2)))) for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.2:
+        rule["ten_codes"] = [f"10-{rng.randint(1, 99)}"]
+    if "keywords" not in rule or rng.random() < 0.3:
+        rule["talkgroups"] = rng.sample(range(40000, 45000), rng.randint(1, 3))
+    if rng.random() < 0.1:
+        rule["radios"] = [rng.randint(1610000, 1620000)]
+    if rng.random() < 0.2:
+        rule["hours"] = f"{rng.randint(0, 23)}-{rng.randint(0, 23)}"
+    return rule
+
+
+def benchmark(rule_counts=(100, 1000, 10000), transcripts=500, seed=1):
+    """
+    Times the compiled engine against rule-by-rule evaluation on random rules and transcripts.
+    """
+    rng = random.Random(seed)
+    calls = [(" ".join(rng.choice(VOCABULARY + [f"10-{rng.randint(1, 99)}"]) for _ in range(rng.randint(5, 40))),
+              rng.randint(40000, 44999), rng.randint(1610000, 1619999), time.time() + rng.randint(0, 86400))
+             for _ in range(transcripts)]
+    print(f"{'rules':>8} {'compiled us/call':>17} {'naive us/call':>14} {'matches/call':>13}")
+    for count in rule_counts:
+        subscribers = [Subscriber.from_dict({"name": f"s{i}", "email": f"s{i}@example.com", "rules": [random_rule(rng)]})
+                       for i in range(count)]
+        engine = RuleEngine(subscribers)
+        started = time.perf_counter()
+        matches = sum(len(engine.match(*call)) for call in calls)
+        compiled = (time.perf_counter() - started) / transcripts * 1e6
+        started = time.perf_counter()
+        naive_calls = calls[:max(1, transcripts * 100 // count)]
+        for call in naive_calls:
+            engine.match_naive(*call)
+        naive = (time.perf_counter() - started) / len(naive_calls) * 1e6
+        print(f"{count:>8} {compiled:>17.1f} {naive:>14.1f} {matches / transcripts:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match transcripts against subscriber alert rules")
+    parser.add_argument("--rules", type=str, help="Rules JSON file")
+    parser.add_argument("--transcript", type=str, help="Transcript text to match")
+    parser.add_argument("--talkgroup", type=str, help="Talkgroup ID")
+    parser.add_argument("--radio", type=str, help="Radio ID")
+    parser.add_argument("--benchmark", type=int, nargs="*", metavar="RULES",
+                        help="Benchmark with these rule counts (default: 100 1000 10000)")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        benchmark(args.benchmark or (100, 1000, 10000))
+    elif args.rules and args.transcript is not None:
+        for match in load_rules(args.rules).match(args.transcript, args.talkgroup, args.radio):
+            print(f"{match.name} <{match.email}>")
+    else:
+        parser.error("give --rules and --transcript, or --benchmark")
@@ -1,40 +1,32 @@
+import argparse
 import os
-from pydub import AudioSegment
-import azure.cognitiveservices.speech as speechsdk
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_faster_whisper"))
+from transcription_backends import AzureBackend
 
 
 def transcribe_mp3_to_text(mp3_path, azure_subscription_key, azure_region):
-    # Convert MP3 to WAV
-    audio = AudioSegment.from_mp3(mp3_path)
-    wav_path = os.path.splitext(mp3_path)[0] + ".wav"
-    audio.export(wav_path, format="wav")
-
-    # Setup Azure Speech SDK
-    speech_config = speechsdk.SpeechConfig(
-        subscription=azure_subscription_key, region=azure_region
-    )
-    audio_input = speechsdk.AudioConfig(filename=wav_path)
-    speech_recognizer = speechsdk.SpeechRecognizer(
-        speech_config=speech_config, audio_config=audio_input
-    )
+    # For many files, create one AzureBackend and share it (see main)
+    return AzureBackend(azure_subscription_key, azure_region).transcribe(mp3_path)
 
-    # Transcribe
-    result = speech_recognizer.recognize_once()
 
-    # Clean up temporary WAV file
-    os.remove(wav_path)
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe recordings with Azure Speech")
+    parser.add_argument("files", nargs="+", help="Recordings to transcribe")
+    parser.add_argument("--concurrency", type=int, default=4, help="Recognizers to run at once")
+    args = parser.parse_args()
 
-    if result.reason == speechsdk.ResultReason.RecognizedSpeech:
-        return result.text
-    elif result.reason == speechsdk.ResultReason.NoMatch:
-        return "No speech could be recognized"
-    elif result.reason == speechsdk.ResultReason.Canceled:
-        cancellation_details = result.cancellation_details
-        return f"Speech Recognition canceled: {cancellation_details.reason}. {cancellation_details.error_details}"
+    backend = AzureBackend(
+        os.environ.get("AZURE_SUBSCRIPTION_KEY", "YOUR_AZURE_SUBSCRIPTION_KEY"),
+        os.environ.get("AZURE_REGION", "YOUR_AZURE_REGION"),
+        concurrency=args.concurrency,
+    )
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for path, transcription in zip(args.files, pool.map(backend.transcribe, args.files)):
+            print(f"{path}: {transcription}")
 
 
-# Usage
-subscription_key = os.environ.get("AZURE_SUBSCRIPTION_KEY", "YOUR_AZURE_SUBSCRIPTION_KEY")
-region = os.environ.get("AZURE_REGION", "YOUR_AZURE_REGION")
-transcription = transcribe_mp3_to_text("path_to_your_file.mp3", subscription_key, region)
-print(transcription)
+if __name__ == "__main__":
+    main()
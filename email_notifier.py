@@ -0,0 +1,161 @@
+import logging
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+# Replies meaning "try again later" (rate limits, greylisting, temporary failures)
+TRANSIENT_CODES = (421, 450, 451, 452, 454)
+
+
+class SMTPConnection:
+    """
+    One authenticated SMTP connection, opened on first use and reopened when the server drops it.
+    """
+
+    def __init__(self, host, port, username, password, use_ssl=True, timeout=30, max_attempts=4, backoff_seconds=5.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.server = None
+
+    def connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        # Kept only once logged in, so a failed login is retried on the next send
+        try:
+            if self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        logger.info(f"Connected to SMTP server {self.host}:{self.port}")
+
+    def send(self, msg):
+        """
+        Sends a message, reconnecting after a dropped connection and backing off on transient replies.
+
+        Args:
+            msg (EmailMessage): The message to send.
+
+        Returns:
+            None
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if self.server is None:
+                    self.connect()
+                self.server.send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+                logger.warning(f"SMTP connection lost ({e}), reconnecting")
+                self.close()
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code not in TRANSIENT_CODES:
+                    raise
+                logger.warning(f"SMTP server deferred the message ({e.smtp_code}), retrying")
+                self.close()
+            if attempt < self.max_attempts:
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+        raise smtplib.SMTPException(f"Giving up after {self.max_attempts} attempts")
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.server = None
+
+
+class DigestNotifier:
+    """
+    Queues transcriptions and sends them from a background thread as one digest per recipient and talkgroup,
+    covering up to window_seconds after the first pending transcription (or max_items transcriptions), over
+    a single SMTP connection. notify() never blocks on the mail server.
+    """
+
+    def __init__(self, connection, sender, recipient, window_seconds=60.0, max_items=50):
+        self.connection = connection
+        self.sender = sender
+        self.recipient = recipient
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.queue = queue.Queue()
+        self.pending = {}
+        self.sent = 0
+        self._thread = None
+
+    def notify(self, talkgroup_id, filename, transcription, recipient=None):
+        self.queue.put((recipient or self.recipient, talkgroup_id, filename, transcription, time.monotonic()))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="email-digests", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Sends every pending digest, then stops the worker and closes the connection.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the worker.
+
+        Returns:
+            None
+        """
+        self.queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.connection.close()
+
+    def _run(self):
+        while True:
+            deadlines = [items[0][4] + self.window_seconds for items in self.pending.values()]
+            wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                item = False
+            if item is None:
+                self._flush(force=True)
+                return
+            if item:
+                self.pending.setdefault(item[:2], []).append(item)
+            self._flush()
+
+    def _flush(self, force=False):
+        now = time.monotonic()
+        for key in list(self.pending):
+            items = self.pending[key]
+            if force or len(items) >= self.max_items or now >= items[0][4] + self.window_seconds:
+                del self.pending[key]
+                self._send_digest(*key, items)
+
+    def _send_digest(self, recipient, talkgroup_id, items):
+        msg = EmailMessage()
+        if len(items) == 1:
+            msg["Subject"] = f"Transcription for {talkgroup_id}"
+            msg.set_content(items[0][3])
+        else:
+            msg["Subject"] = f"Transcriptions for {talkgroup_id} ({len(items)} calls)"
+            msg.set_content("\n\n".join(f"{filename}\n{transcription}" for _, _, filename, transcription, _ in items))
+        msg["From"] = self.sender
+        msg["To"] = recipient
+        try:
+            self.connection.send(msg)
+            self.sent += 1
+            logger.info(f"Emailed {len(items)} transcriptions for {talkgroup_id} to {recipient}")
+        except Exception as e:
+            logger.error(f"Error sending email for {talkgroup_id}: {str(e)}")
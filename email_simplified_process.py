@@ -1,9 +1,16 @@
+import argparse
 import openai
 import logging
-import requests
 import os
-import smtplib
-from email.message import EmailMessage
+import re
+import sys
+import time
+
+from alert_rules import load_rules
+from email_notifier import DigestNotifier, SMTPConnection
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_faster_whisper"))
+from transcription_backends import BackendError, router_from_environment
 
 
 logging.basicConfig(
@@ -18,28 +25,28 @@ logger = logging.getLogger()
 # Configurations
 RECORDINGS_DIR = os.environ.get("RECORDINGS_DIR", "/home/YOUR_USER/SDRTrunk/recordings")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "YOUR_KEY_HERE")
-
-
-def send_email(subject, content):
+# OpenAI unless TRANSCRIPTION_BACKENDS / TRANSCRIBE_SOCKET say otherwise (see transcription_backends.py)
+ROUTER = router_from_environment()
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))
+SMTP_SSL = os.environ.get("SMTP_SSL", "true").lower() == "true"
+# Transcriptions for a talkgroup within this many seconds go out as one digest (0 = one email each)
+EMAIL_DIGEST_SECONDS = float(os.environ.get("EMAIL_DIGEST_SECONDS", "60"))
+# Subscribers and their alert rules (see alert_rules.py); without it every transcript goes to EMAIL_RECEIVER
+ALERT_RULES_FILE = os.environ.get("ALERT_RULES_FILE", "")
+
+
+def build_notifier():
     sender_email = os.environ.get("EMAIL_SENDER", "your_sender_email@example.com")
-    receiver_email = os.environ.get("EMAIL_RECEIVER", "user@user.net")
-    password = os.environ.get("EMAIL_PASSWORD", "your_email_password")
-
-    # Create a message
-    msg = EmailMessage()
-    msg.set_content(content)
-    msg["Subject"] = subject
-    msg["From"] = sender_email
-    msg["To"] = receiver_email
-
-    # Send the email
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender_email, password)
-            server.send_message(msg)
-            logger.info(f"Email sent to {receiver_email} successfully!")
-    except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
+    connection = SMTPConnection(
+        SMTP_HOST, SMTP_PORT, sender_email, os.environ.get("EMAIL_PASSWORD", "your_email_password"), use_ssl=SMTP_SSL
+    )
+    return DigestNotifier(
+        connection,
+        sender_email,
+        os.environ.get("EMAIL_RECEIVER", "user@user.net"),
+        window_seconds=EMAIL_DIGEST_SECONDS,
+    )
 
 
 def pyapi_transcribe_audio(file_path):
@@ -49,36 +56,7 @@ def pyapi_transcribe_audio(file_path):
     return transcript.text
 
 
-def curl_transcribe_audio(file_path):
-    # Define the endpoint and your API key
-    url = "https://api.openai.com/v1/audio/transcriptions"
-    api_key = OPENAI_API_KEY
-
-    # Setup headers
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-    }
-
-    # Open the file and setup files and data to be sent
-    with open(file_path, "rb") as file:
-        files = {
-            "file": file,
-        }
-        data = {
-            "model": "whisper-1",
-            "response_format": "json",
-            "temperature": "0",
-            "language": "en",
-        }
-
-        # Make the POST request
-        response = requests.post(url, headers=headers, files=files, data=data)
-
-    # Print the response or handle as needed
-    return str(response.json())
-
-
-def process_file(file):
+def process_file(file, notifier, rules=None):
     logger.info(f"Processing file: {file}")
     if not file.endswith(".mp3"):
         return
@@ -94,7 +72,12 @@ def process_file(file):
     os.rename(full_path, new_path)
 
     # Transcribe the audio
-    transcription = curl_transcribe_audio(new_path)
+    try:
+        text = ROUTER.transcribe(new_path, talkgroup_id)
+    except BackendError as e:
+        logger.error(f"Error while transcribing {file}: {str(e)}")
+        return
+    transcription = str({"text": text})
     logger.info(f"Transcribed text for {file}: {transcription}")
 
     # Write transcription to a text file
@@ -105,14 +88,40 @@ def process_file(file):
     except Exception as e:
         logger.error(f"Error while writing to text file: {str(e)}")
 
-    # Send the transcription via email
-    send_email(f"Transcription for {talkgroup_id}", transcription)
-
+    # Queue the transcription for the next email digest of everyone it concerns
+    if rules is None:
+        notifier.notify(talkgroup_id, file, transcription)
+        return
+    radio_match = re.search(r"FROM_(\d+)", file)
+    radio_id = radio_match.group(1) if radio_match else None
+    try:
+        unixtime = time.mktime(time.strptime(file[:15], "%Y%m%d_%H%M%S"))
+    except ValueError:
+        unixtime = None
+    # Rules match the plain text; quotes from the stored repr would stick to the first and last words
+    for subscriber in rules.match(text, talkgroup_id, radio_id, unixtime):
+        notifier.notify(talkgroup_id, file, transcription, subscriber.email)
+
+
+def main(watch=False):
+    rules = load_rules(ALERT_RULES_FILE) if ALERT_RULES_FILE else None
+    notifier = build_notifier()
+    notifier.start()
+    try:
+        if watch:
+            from recording_watcher import RecordingWatcher
 
-def main():
-    for file in os.listdir(RECORDINGS_DIR):
-        process_file(file)
+            RecordingWatcher(RECORDINGS_DIR, lambda file: process_file(file, notifier, rules)).run_forever()
+        else:
+            for file in os.listdir(RECORDINGS_DIR):
+                process_file(file, notifier, rules)
+    finally:
+        # Sends whatever is still waiting for its digest window
+        notifier.stop()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Transcribe SDRTrunk recordings and email the transcriptions")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and transcribe each recording as soon as it is written")
+    main(parser.parse_args().watch)
@@ -1,37 +1,41 @@
+import argparse
 import os
-from google.cloud import speech_v1p1beta1 as speech
-from google.cloud.speech_v1p1beta1 import types
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_faster_whisper"))
+from transcription_backends import GoogleBackend, phrase_hints_from_file
+from utils import extract_talkgroup_id
 
-def transcribe_audio_with_hints(gcs_uri, key_file, hints):
-    """Transcribes the audio file stored in Google Cloud Storage using phrase hints."""
-    client = speech.SpeechClient.from_service_account_json(key_file)
 
-    audio = types.RecognitionAudio(uri=gcs_uri)
-    config = types.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=16000,
-        language_code="en-US",
-        speech_contexts=[speech.SpeechContext(phrases=hints)],
-    )
+def transcribe_audio_with_hints(audio_path, key_file, hints):
+    """Transcribes a local recording with Google Cloud Speech-to-Text using phrase hints."""
+    # For many files, create one GoogleBackend and share it (see main)
+    return GoogleBackend(key_file, lambda talkgroup_id: hints, channels=1).transcribe(audio_path)
+
 
-    response = client.recognize(config=config, audio=audio)
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe recordings with Google Cloud Speech-to-Text")
+    parser.add_argument("files", nargs="+", help="Recordings to transcribe")
+    parser.add_argument("--hints", default=os.environ.get("GOOGLE_PHRASE_HINTS"),
+                        help='JSON phrase hints: {"default": [...], "<talkgroup>": [...]}')
+    parser.add_argument("--concurrency", type=int, default=8, help="Streams to run at once")
+    args = parser.parse_args()
+
+    backend = GoogleBackend(
+        os.environ.get("GOOGLE_CLOUD_CREDENTIALS", "path_to_your_google_cloud_credentials.json"),
+        phrase_hints_from_file(args.hints) if args.hints else None,
+        concurrency=args.concurrency,
+    )
 
-    # Combine the transcription results.
-    transcription = ""
-    for result in response.results:
-        transcription += result.alternatives[0].transcript
+    def transcribe(path):
+        # Phrase hints follow the talkgroup in the SDRTrunk file name
+        return backend.transcribe(path, extract_talkgroup_id(os.path.basename(path)))
 
-    return transcription
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for path, transcription in zip(args.files, pool.map(transcribe, args.files)):
+            print(f"{path}: {transcription}")
 
 
-# Usage example:
-key_file_path = os.environ.get("GOOGLE_CLOUD_CREDENTIALS", "path_to_your_google_cloud_credentials.json")
-audio_file_path = (
-    "gs://your_bucket_name/your_audio_file.wav"  # Google Cloud Storage URI
-)
-phrase_hints = ["specific term1", "domain-specific term2", "another hint"]
-transcription = transcribe_audio_with_hints(
-    audio_file_path, key_file_path, phrase_hints
-)
-print(transcription)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# pyre-strict
+import argparse
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import struct
+import time
+import zipfile
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from transcript_store import sidecar_path
+from utils import extract_talkgroup_id, index_recording_paths, parse_recording_timestamp
+
+INDEX_SUFFIX: str = ".idx.json"
+LOCK_NAME: str = ".archive.lock"
+# Fixed part of a zip local file header; the name and extra field follow it
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+_index_cache: Dict[str, Tuple[float, Dict[str, Dict[str, int]]]] = {}
+
+
+def bundle_reference(bundle_path: str, member: str) -> str:
+    return f"{bundle_path}#{member}"
+
+
+def split_reference(reference: str) -> Tuple[str, Optional[str]]:
+    """
+    Split "bundle.zip#member" into its parts; plain paths have no member.
+    """
+    bundle, separator, member = reference.rpartition("#")
+    if separator and bundle.endswith(".zip"):
+        return bundle, member
+    return reference, None
+
+
+def _fsync(path: str) -> None:
+    """
+    Flush a file, or a directory's entries, to disk.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def load_index(bundle_path: str) -> Dict[str, Dict[str, int]]:
+    """
+    The bundle's sidecar index, cached until the index file changes.
+    """
+    index_path = bundle_path + INDEX_SUFFIX
+    modified = os.path.getmtime(index_path)
+    cached = _index_cache.get(index_path)
+    if cached is None or cached[0] != modified:
+        with open(index_path, encoding="utf-8") as f:
+            cached = (modified, json.load(f)["members"])
+        _index_cache[index_path] = cached
+    return cached[1]
+
+
+def read_member(bundle_path: str, member: str) -> bytes:
+    """
+    Read one member by seeking straight to its data via the sidecar index,
+    without reading the zip's central directory or any other member.
+    """
+    entry = load_index(bundle_path).get(member)
+    if entry is None:
+        raise KeyError(f"{member} not in {bundle_path}")
+    with open(bundle_path, "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["size"])
+    if entry["method"] == zipfile.ZIP_DEFLATED:
+        data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(data)
+    if zlib.crc32(data) != entry["crc"]:
+        raise ValueError(f"CRC mismatch for {member} in {bundle_path}")
+    return data
+
+
+def read_recording(filepath: str) -> bytes:
+    """
+    Contents of a recording given its DB filepath, archived or not.
+    """
+    bundle, member = split_reference(filepath)
+    if member is None:
+        with open(filepath, "rb") as f:
+            return f.read()
+    return read_member(bundle, member)
+
+
+def _member_offsets(bundle_path: str) -> Dict[str, Dict[str, int]]:
+    """
+    Build the index entries for every member of a bundle from its local
+    headers (the data starts after the variable-length name and extra field).
+    """
+    members: Dict[str, Dict[str, int]] = {}
+    with zipfile.ZipFile(bundle_path) as bundle, open(bundle_path, "rb") as raw:
+        for info in bundle.infolist():
+            raw.seek(info.header_offset)
+            header = LOCAL_HEADER.unpack(raw.read(LOCAL_HEADER.size))
+            name_length, extra_length = header[9], header[10]
+            members[info.filename] = {
+                "offset": info.header_offset + LOCAL_HEADER.size + name_length + extra_length,
+                "size": info.compress_size,
+                "file_size": info.file_size,
+                "method": info.compress_type,
+                "crc": info.CRC,
+            }
+    return members
+
+
+class Archiver:
+    """
+    Rolls recordings older than older_than_days into one zip bundle per
+    talkgroup and day under archive_root, each with a sidecar index of
+    member offsets. Audio is stored as-is (MP3 does not compress further);
+    .txt sidecars are deflated. DB filepaths are rewritten to
+    "bundle#member" references and the loose files are removed only after
+    the bundle, its index and the DB update are all durable, so an
+    interrupted run is simply repeated.
+    """
+    def __init__(self, root: str, archive_root: Optional[str] = None, older_than_days: float = 30.0,
+                 database: Optional[str] = None) -> None:
+        self.root = os.path.abspath(root)
+        self.archive_root = os.path.abspath(archive_root or os.path.join(self.root, "archive"))
+        self.cutoff = time.time() - older_than_days * 86400
+        self.conn: Optional[sqlite3.Connection] = None
+        if database:
+            self.conn = sqlite3.connect(database, timeout=30)
+            index_recording_paths(self.conn)
+
+    def candidates(self) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Old recordings below root, grouped by (talkgroup, YYYYMMDD).
+        """
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for directory, subdirectories, files in os.walk(self.root):
+            if directory == self.root:
+                # Loose files in the root are still waiting for transcription
+                subdirectories[:] = [d for d in subdirectories if os.path.join(directory, d) != self.archive_root]
+                continue
+            for filename in files:
+                stamp = parse_recording_timestamp(filename)
+                if not filename.endswith(".mp3") or stamp is None or time.mktime(stamp) >= self.cutoff:
+                    continue
+                key = (extract_talkgroup_id(filename), time.strftime("%Y%m%d", stamp))
+                groups.setdefault(key, []).append(os.path.join(directory, filename))
+        return groups
+
+    def bundle_path(self, talkgroup_id: str, day: str) -> str:
+        return os.path.join(self.archive_root, talkgroup_id, f"{talkgroup_id}-{day}.zip")
+
+    def run(self) -> int:
+        """
+        Archive every eligible recording. Returns the number archived.
+        """
+        os.makedirs(self.archive_root, exist_ok=True)
+        with open(os.path.join(self.archive_root, LOCK_NAME), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError(f"Another archive job is running in {self.archive_root}")
+            archived = 0
+            for (talkgroup_id, day), paths in sorted(self.candidates().items()):
+                archived += self.archive_group(self.bundle_path(talkgroup_id, day), sorted(paths))
+        logging.info(f"Archived {archived} recordings into {self.archive_root}")
+        return archived
+
+    def archive_group(self, bundle_path: str, paths: List[str]) -> int:
+        bundle_directory = os.path.dirname(bundle_path)
+        created = not os.path.isdir(bundle_directory)
+        os.makedirs(bundle_directory, exist_ok=True)
+        with zipfile.ZipFile(bundle_path, "a") as bundle:
+            # Members already written by an earlier (possibly interrupted) run
+            existing = set(bundle.namelist())
+            for path in paths:
+                name = os.path.basename(path)
+                if name not in existing:
+                    bundle.write(path, name, compress_type=zipfile.ZIP_STORED)
+                sidecar = sidecar_path(path)
+                if os.path.exists(sidecar) and os.path.basename(sidecar) not in existing:
+                    bundle.write(sidecar, os.path.basename(sidecar), compress_type=zipfile.ZIP_DEFLATED)
+        self._write_index(bundle_path)
+        # The bundle, its index and their directory entries must be on disk before the database
+        # points into the bundle and the loose files go
+        _fsync(bundle_path)
+        _fsync(bundle_directory)
+        if created:
+            _fsync(os.path.dirname(bundle_directory))
+
+        if self.conn is not None:
+            with self.conn:
+                self.conn.executemany("UPDATE recordings SET filepath = ? WHERE filepath = ?",
+                                      [(bundle_reference(bundle_path, os.path.basename(path)), path)
+                                       for path in paths])
+        for path in paths:
+            for loose in (path, sidecar_path(path)):
+                if os.path.exists(loose):
+                    os.remove(loose)
+        logging.info(f"Archived {len(paths)} recordings into {bundle_path}")
+        return len(paths)
+
+    def _write_index(self, bundle_path: str) -> None:
+        index: Dict[str, Any] = {"bundle": os.path.basename(bundle_path), "members": _member_offsets(bundle_path)}
+        temp_path = bundle_path + INDEX_SUFFIX + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, bundle_path + INDEX_SUFFIX)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old recordings into indexed per-talkgroup, per-day bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive = commands.add_parser("archive", help="Bundle recordings older than --days")
+    archive.add_argument("root", type=str, help="Recordings root directory")
+    archive.add_argument("--archive-directory", type=str, default=Config.ARCHIVE_DIRECTORY or None,
+                         help="Where bundles go (default: <root>/archive)")
+    archive.add_argument("--days", type=float, default=Config.ARCHIVE_AFTER_DAYS,
+                         help="Archive recordings older than this many days")
+    archive.add_argument("--database", type=str, help="recordings.db whose filepath column should be rewritten")
+    extract = commands.add_parser("extract", help="Extract one recording from a bundle")
+    extract.add_argument("reference", type=str, help="bundle.zip#member, as stored in the database")
+    extract.add_argument("--output", type=str, help="Output file (default: the member name)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "archive":
+        archiver = Archiver(args.root, args.archive_directory, args.days, args.database)
+        try:
+            print(f"Archived {archiver.run()} recordings")
+        finally:
+            archiver.close()
+    else:
+        bundle_file, member_name = split_reference(args.reference)
+        if member_name is None:
+            parser.error("reference must look like bundle.zip#member")
+        with open(args.output or member_name, "wb") as out:
+            out.write(read_member(bundle_file, member_name))
@@ -0,0 +1,188 @@
+# pyre-strict
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from config import Config
+from model_registry import ModelRegistry, ModelSpec
+from scheduler import percentile
+from transcriber import Transcriber
+
+# Named parameter presets, applied on top of the Config-derived options
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "default": {},
+    "balanced": {"beam_size": 5, "best_of": 5, "patience": 1.0},
+    "fast": {"beam_size": 1, "best_of": 1, "patience": 1.0, "temperature": 0.0},
+    "no_vad": {"vad_filter": False},
+}
+
+
+def normalize_words(text: str) -> List[str]:
+    """
+    Lower-cases text and strips punctuation (keeping ten-code hyphens) before
+    splitting into words.
+    """
+    return re.sub(r"[^\w\s-]", " ", text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> Tuple[int, int]:
+    """
+    Word-level Levenshtein distance between reference and hypothesis,
+    returned with the number of reference words.
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            substitution = previous[j - 1] + (ref_word != hyp_word)
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, substitution)
+        previous = current
+    return previous[-1], len(ref)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    errors, words = word_errors(reference, hypothesis)
+    return errors / words if words else float(errors > 0)
+
+
+def load_dataset(recordings_dir: str, reference_suffix: str) -> List[Tuple[str, str]]:
+    """
+    Pairs every mp3 in recordings_dir with its reference transcript
+    (<name><reference_suffix>). Recordings without a reference are skipped.
+    """
+    dataset = []
+    for filename in sorted(os.listdir(recordings_dir)):
+        if not filename.endswith(".mp3"):
+            continue
+        path = os.path.join(recordings_dir, filename)
+        reference_path = os.path.splitext(path)[0] + reference_suffix
+        if not os.path.exists(reference_path):
+            logging.warning(f"No reference transcript for {path}, skipping")
+            continue
+        with open(reference_path, encoding="utf-8") as f:
+            dataset.append((path, f.read().strip()))
+    return dataset
+
+
+def run_preset(preset: str, dataset: List[Tuple[str, str]], model_size: str,
+               device: str, compute_type: str, pack_size: int = 1) -> Dict[str, Any]:
+    """
+    Transcribe the dataset with one preset and return its measurements.
+    With pack_size > 1, recordings are transcribed in packed groups of that
+    size (see Transcriber.transcribe_batch) to measure calls saved and the
+    accuracy impact of packing.
+    Meant to run in a fresh process so peak RSS is per preset.
+    """
+    Config.DEVICE = device
+    Config.MODEL_PROFILES = {"benchmark": (model_size, compute_type)}
+    Config.DEFAULT_MODEL_PROFILE = "benchmark"
+    Config.TALKGROUP_MODELS = {}
+    Config.PRIORITY_MODELS = {}
+
+    registry = ModelRegistry()
+    started = time.monotonic()
+    registry.get(ModelSpec(model_size, compute_type))
+    load_seconds = time.monotonic() - started
+
+    transcriber = Transcriber(registry, PRESETS[preset])
+    latencies: List[float] = []
+    errors = 0
+    words = 0
+    calls = 0
+    for i in range(0, len(dataset), pack_size):
+        group = dataset[i:i + pack_size]
+        started = time.monotonic()
+        if len(group) == 1:
+            texts = [transcriber.transcribe_file(group[0][0])]
+        else:
+            texts = transcriber.transcribe_batch([path for path, _ in group])
+        # Every recording in a packed call completes when the call does
+        latencies.extend([time.monotonic() - started] * len(group))
+        calls += 1
+        for (_, reference), text in zip(group, texts):
+            file_errors, file_words = word_errors(reference, json.loads(text)["text"])
+            errors += file_errors
+            words += file_words
+
+    throughput = registry.throughput().get(ModelSpec(model_size, compute_type).name, {})
+    return {
+        "preset": preset if pack_size == 1 else f"{preset}+pack{pack_size}",
+        "files": len(dataset),
+        "calls": calls,
+        "model_load_seconds": load_seconds,
+        "audio_seconds": throughput.get("audio_seconds", 0.0),
+        "wall_seconds": sum(latencies),
+        "rtf": throughput.get("rtf", 0.0),
+        "p50_seconds": percentile(latencies, 0.50),
+        "p95_seconds": percentile(latencies, 0.95),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "wer": errors / words if words else 0.0,
+    }
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    columns = [("preset", "{}"), ("files", "{}"), ("calls", "{}"), ("rtf", "{:.2f}"), ("p50_seconds", "{:.2f}"),
+               ("p95_seconds", "{:.2f}"), ("peak_rss_mb", "{:.0f}"), ("wer", "{:.3f}")]
+    rows = [[name for name, _ in columns]]
+    rows += [[fmt.format(result[name]) for name, fmt in columns] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def run_benchmark(dataset: List[Tuple[str, str]], presets: List[str], model_size: str,
+                  device: str, compute_type: str, pack_size: int = 1) -> List[Dict[str, Any]]:
+    """
+    Run each preset in its own spawned process, one after another. With
+    pack_size > 1 every preset is also run packed, right after its
+    unpacked run, so the two can be compared.
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    runs = [(preset, size) for preset in presets for size in sorted({1, pack_size})]
+    for preset, size in runs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.append(pool.submit(run_preset, preset, dataset, model_size, device, compute_type, size).result())
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Transcriber presets for speed and accuracy")
+    parser.add_argument("recordings", type=str, help="Directory of mp3 recordings with reference transcripts")
+    parser.add_argument("--reference-suffix", type=str, default=".ref.txt",
+                        help="Reference transcript suffix next to each mp3 (default: .ref.txt)")
+    parser.add_argument("--presets", type=str, default=",".join(PRESETS),
+                        help=f"Comma-separated presets to run ({', '.join(PRESETS)})")
+    parser.add_argument("--model", type=str, default=Config.MODEL_SIZE, help="Model size, e.g. tiny or large-v3")
+    parser.add_argument("--device", type=str, default=Config.DEVICE, help="cuda or cpu")
+    parser.add_argument("--compute-type", type=str, default="default", help="e.g. float16 or int8")
+    parser.add_argument("--pack", type=int, default=1,
+                        help="Also run each preset packing this many recordings per call")
+    parser.add_argument("--json", type=str, help="Also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    selected = [name.strip() for name in args.presets.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in PRESETS]
+    if unknown:
+        parser.error(f"unknown presets: {', '.join(unknown)}")
+    recordings = load_dataset(args.recordings, args.reference_suffix)
+    if not recordings:
+        parser.error(f"no recordings with {args.reference_suffix} references in {args.recordings}")
+
+    benchmark_results = run_benchmark(recordings, selected, args.model, args.device, args.compute_type,
+                                      max(1, args.pack))
+    print(format_table(benchmark_results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as out:
+            json.dump(benchmark_results, out, indent=2)
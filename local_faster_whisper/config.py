@@ -1,5 +1,5 @@
 # pyre-strict
-from typing import Tuple
+from typing import Dict, Tuple
 
 class Config:
     """
@@ -23,14 +23,109 @@ class Config:
     CONDITION_ON_PREVIOUS_TEXT: bool = True
     PROMPT_RESET_ON_TEMPERATURE: float = 0.5
 
+    # Model routing. Profiles name a (model size, compute type) pair; talkgroups
+    # and priorities map to a profile, anything else uses DEFAULT_MODEL_PROFILE.
+    # e.g. MODEL_PROFILES["small"] = ("small", "int8_float16"); PRIORITY_MODELS = {2: "small"}
+    DEVICE: str = "cuda"
+    MODEL_PROFILES: Dict[str, Tuple[str, str]] = {"default": (MODEL_SIZE, "default")}
+    DEFAULT_MODEL_PROFILE: str = "default"
+    TALKGROUP_MODELS: Dict[str, str] = {}
+    PRIORITY_MODELS: Dict[int, str] = {}
+    MODEL_MEMORY_BUDGET_MB: int = 10000
+    MODEL_MEMORY_ESTIMATES_MB: Dict[str, int] = {
+        "tiny": 150, "base": 300, "small": 1000, "medium": 2500,
+        "large-v2": 4500, "large-v3": 4500,
+    }
+
     # File handling
     DURATION_THRESHOLD: float = 4.0
     DEBOUNCE_SECONDS: float = 1.0
 
+    # Speech-content gate (rejects carrier noise, tones and dead keys)
+    SPEECH_GATE_ENABLED: bool = True
+    MIN_SPEECH_FRACTION: float = 0.1
+    SPEECH_FRAME_MS: int = 30
+    SPEECH_BAND_HZ: Tuple[float, float] = (250.0, 3500.0)
+    SPEECH_MIN_LEVEL_DB: float = -50.0
+    SPEECH_MAX_FLATNESS: float = 0.35
+    SPEECH_MAX_TONALITY: float = 0.8
+    SPEECH_TONE_BINS: int = 6
+    REJECTION_LOG: str = "rejections.jsonl"
+
+    # Transcription scheduling: lower priority numbers are served first.
+    # Map talkgroup IDs (as in TO_<id>) to priorities, e.g. {"52198": 0}.
+    TRANSCRIPTION_WORKERS: int = 3
+    TALKGROUP_PRIORITIES: Dict[str, int] = {}
+    DEFAULT_PRIORITY: int = 1
+    PRIORITY_STEP_SECONDS: float = 300.0
+    AGING_RATE: float = 1.0
+    LATENCY_SAMPLE_SIZE: int = 1000
+
+    # Clip packing: under backlog, transcribe several short queued recordings of
+    # the same talkgroup (PACK_BY = "talkgroup") or priority ("priority") in one
+    # model call, separated by PACK_GAP_SECONDS of silence.
+    PACKING_ENABLED: bool = False
+    PACK_BY: str = "talkgroup"
+    PACK_MAX_CLIP_SECONDS: float = 15.0
+    PACK_MAX_CLIPS: int = 8
+    PACK_MAX_SECONDS: float = 90.0
+    PACK_GAP_SECONDS: float = 1.5
+
+    # Near-duplicate dedupe: a recording whose audio fingerprint matches one
+    # recorded within DEDUPE_WINDOW_SECONDS (simulcast on several sites or
+    # patched talkgroups) reuses that recording's transcription. Raise the
+    # window to also catch announcements and tone-outs repeated during the day.
+    DEDUPE_ENABLED: bool = True
+    DEDUPE_WINDOW_SECONDS: float = 10.0
+    DEDUPE_MIN_MATCHES: int = 20
+
+    # Where processed recordings go under the root directory. Busy talkgroups
+    # are better sharded by date, e.g. "{talkgroup}/{year}/{month}/{day}";
+    # move existing recordings with migrate_layout.py.
+    RECORDING_LAYOUT: str = "{talkgroup}"
+
+    # Cold-tier archival (archive.py): recordings older than ARCHIVE_AFTER_DAYS
+    # are bundled per talkgroup and day into ARCHIVE_DIRECTORY (default:
+    # <root directory>/archive).
+    ARCHIVE_AFTER_DAYS: float = 30.0
+    ARCHIVE_DIRECTORY: str = ""
+
+    # Transcript output: "sidecar" writes a .txt next to every recording;
+    # "segmented" appends to per-day JSONL files with an index (see
+    # transcript_store.py), in TRANSCRIPT_STORE_DIRECTORY (default:
+    # <root directory>/transcripts), plus .txt files if TRANSCRIPT_SIDECARS.
+    TRANSCRIPT_STORE: str = "sidecar"
+    TRANSCRIPT_STORE_DIRECTORY: str = ""
+    TRANSCRIPT_SIDECARS: bool = False
+
+    # Live transcript feed (transcript_feed.py): every saved transcript is sent
+    # to FEED_SOCKET ("" disables publishing), where a feed server streams it
+    # as Server-Sent Events (GET /events?talkgroup=...). FEED_PORT > 0 runs the
+    # server inside the watcher. Clients more than FEED_CLIENT_BUFFER events
+    # behind are disconnected.
+    FEED_SOCKET: str = "/tmp/sdrtrunk-transcriber-feed.sock"
+    FEED_HOST: str = "127.0.0.1"
+    FEED_PORT: int = 0
+    FEED_CLIENT_BUFFER: int = 100
+
+    # Several hosts sharing one root directory (e.g. over NFS): with
+    # LEASES_ENABLED each recording is claimed before it is probed (claim files
+    # in LEASE_DIRECTORY, default <root directory>/.claims; see
+    # recording_leases.py). Claims of a host that stops renewing them for
+    # LEASE_SECONDS are taken over; the root directory is rescanned that often
+    # to find them.
+    LEASES_ENABLED: bool = False
+    LEASE_DIRECTORY: str = ""
+    LEASE_SECONDS: float = 60.0
+
     # Default directories (overridable by env vars or CLI)
     ROOT_DIRECTORY: str = "/home/USER/SDRTrunk/recordings"
     TOO_SHORT_DIRECTORY: str = "/home/USER/SDRTrunk/tooShortOrError"
     
+    # Prometheus-style /metrics endpoint (0 disables it)
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9108
+
     # Logging
     LOG_FILE_PATH: str = "uultra.log"
     LOG_LEVEL: str = "INFO"
\ No newline at end of file
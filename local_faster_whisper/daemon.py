@@ -0,0 +1,121 @@
+# pyre-strict
+import argparse
+import json
+import logging
+import os
+import socketserver
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+
+from mutagen.mp3 import MP3
+
+import metrics
+from config import Config
+from daemon_client import DEFAULT_SOCKET_PATH
+from model_registry import default_spec
+from scheduler import PriorityScheduler, talkgroup_priority
+from transcriber import Transcriber
+
+
+class TranscriptionDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived transcription server that owns the models and the priority
+    queue, so every watcher and script on the host shares one copy of each
+    model. Clients send one JSON line per connection and get one JSON line
+    back (see daemon_client.TranscriptionClient).
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, transcriber: Optional[Transcriber] = None,
+                 workers: int = Config.TRANSCRIPTION_WORKERS) -> None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, DaemonRequestHandler)
+        os.chmod(socket_path, 0o660)
+        self.socket_path = socket_path
+        self.transcriber: Transcriber = transcriber or Transcriber()
+        self.queue = PriorityScheduler(max_workers=workers)
+
+    def transcribe(self, path: str, priority: Optional[int] = None) -> str:
+        """
+        Queue a file and block until its transcription text is available.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        try:
+            duration = MP3(path).info.length
+        except Exception:
+            duration = 0.0
+        if priority is None:
+            priority = talkgroup_priority(os.path.basename(path))
+        result: "Future[str]" = Future()
+        self.queue.submit(self._run, path, result, priority=priority, duration=duration)
+        return json.loads(result.result())["text"]
+
+    def _run(self, path: str, result: "Future[str]") -> None:
+        try:
+            result.set_result(self.transcriber.transcribe_file(path))
+        except Exception as e:
+            result.set_exception(e)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pending": self.queue.pending(),
+            "latency": self.queue.latency_percentiles(),
+            "models": self.transcriber.registry.loaded(),
+            "throughput": self.transcriber.throughput(),
+        }
+
+    def shutdown_daemon(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.queue.shutdown(wait=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server: TranscriptionDaemon = self.server  # pyre-ignore[9]
+        try:
+            request = json.loads(self.rfile.readline())
+            op = request.get("op")
+            if op == "transcribe":
+                reply: Dict[str, Any] = {"text": server.transcribe(request["path"], request.get("priority"))}
+            elif op == "status":
+                reply = server.status()
+            elif op == "ping":
+                reply = {"ok": True}
+            else:
+                reply = {"error": f"unknown op: {op}"}
+        except Exception as e:
+            logging.error(f"Daemon request failed: {str(e)}")
+            reply = {"error": str(e)}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared transcription daemon")
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET_PATH, help="Unix socket path to listen on")
+    parser.add_argument("--workers", type=int, default=Config.TRANSCRIPTION_WORKERS, help="Concurrent transcriptions")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Port for the /metrics endpoint (0 disables it)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL, logging.INFO),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filename=Config.LOG_FILE_PATH,
+        filemode='a'
+    )
+
+    server = TranscriptionDaemon(args.socket, workers=args.workers)
+    if args.metrics_port:
+        metrics.TRANSCRIPTION_QUEUE_DEPTH.set_function(lambda: float(server.queue.pending()))
+        metrics.start_metrics_server(args.metrics_port, Config.METRICS_HOST)
+    # Pay the default model's load time once, before accepting jobs
+    server.transcriber.registry.get(default_spec())
+    logging.info(f"Transcription daemon listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown_daemon()
@@ -0,0 +1,68 @@
+# pyre-strict
+"""
+Client for the transcription daemon. Standard library only: the API scripts
+import this module too, and they do not install faster_whisper.
+"""
+import json
+import os
+import socket
+from typing import Any, Dict, Optional
+
+DEFAULT_SOCKET_PATH: str = os.environ.get("TRANSCRIBE_SOCKET", "/tmp/sdrtrunk-transcriber.sock")
+
+
+class DaemonError(Exception):
+    """
+    Raised when the transcription daemon reports a failure.
+    """
+
+
+class TranscriptionClient:
+    """
+    Submits jobs to a running transcription daemon over its Unix socket.
+    Each request uses its own short-lived connection, so one client can be
+    shared between threads.
+    """
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: Optional[float] = None) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sends one JSON request and returns the decoded JSON reply.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise DaemonError("daemon closed the connection without replying")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise DaemonError(reply["error"])
+        return reply
+
+    def transcribe(self, path: str, priority: Optional[int] = None) -> str:
+        """
+        Transcribes the file at path (which must be readable by the daemon)
+        and returns the plain transcription text.
+        """
+        payload: Dict[str, Any] = {"op": "transcribe", "path": os.path.abspath(path)}
+        if priority is not None:
+            payload["priority"] = priority
+        return self.request(payload)["text"]
+
+    def status(self) -> Dict[str, Any]:
+        return self.request({"op": "status"})
+
+    def available(self) -> bool:
+        """
+        True if a daemon is listening on the socket.
+        """
+        try:
+            self.request({"op": "ping"})
+            return True
+        except (OSError, DaemonError, ValueError):
+            return False
@@ -0,0 +1,147 @@
+# pyre-strict
+import threading
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Spectrogram geometry at 8 kHz; other sample rates scale the window and hop
+# so every recording gets the same 15.6 Hz bins and 32 ms frames, and only
+# bins up to 4 kHz (all that radio voice carries) are used.
+FINGERPRINT_SAMPLE_RATE: int = 8000
+FFT_SIZE: int = 512
+HOP_SIZE: int = 256
+PEAK_RADIUS_BINS: int = 6
+PEAK_RADIUS_FRAMES: int = 4
+PEAK_MIN_DB: float = 10.0
+PEAKS_PER_SECOND: int = 30
+FAN_OUT: int = 5
+MAX_PAIR_FRAMES: int = 48
+
+# (hash, anchor frame) pairs for one recording
+Fingerprint = List[Tuple[int, int]]
+
+
+class FingerprintMatch(NamedTuple):
+    key: str
+    score: int
+
+
+def spectral_peaks(samples: np.ndarray, sample_rate: int) -> List[Tuple[int, int]]:
+    """
+    Return (frame, bin) constellation points: spectrogram cells that are the
+    maximum of their neighbourhood and stand PEAK_MIN_DB above the median level,
+    keeping only the strongest PEAKS_PER_SECOND per second so background noise
+    does not flood the hashes.
+    """
+    scale = sample_rate / FINGERPRINT_SAMPLE_RATE
+    fft_size, hop_size = int(FFT_SIZE * scale), int(HOP_SIZE * scale)
+    frame_count = 1 + (len(samples) - fft_size) // hop_size if len(samples) >= fft_size else 0
+    if frame_count == 0:
+        return []
+    indices = np.arange(fft_size)[None, :] + hop_size * np.arange(frame_count)[:, None]
+    windowed = samples[indices] * np.hanning(fft_size)
+    spectrum = np.abs(np.fft.rfft(windowed, axis=1))[:, :FFT_SIZE // 2 + 1] / scale
+    level = 20.0 * np.log10(spectrum + 1e-10)
+
+    # Sliding maximum over the neighbourhood, one axis at a time
+    neighbourhood = level
+    for axis, radius in ((0, PEAK_RADIUS_FRAMES), (1, PEAK_RADIUS_BINS)):
+        padded = np.pad(neighbourhood, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)],
+                        mode="constant", constant_values=-np.inf)
+        length = neighbourhood.shape[axis]
+        neighbourhood = np.max([np.take(padded, np.arange(offset, offset + length), axis=axis)
+                                for offset in range(2 * radius + 1)], axis=0)
+
+    peaks = (level == neighbourhood) & (level > np.median(level) + PEAK_MIN_DB)
+    frames, bins = np.nonzero(peaks)
+    frames_per_second = FINGERPRINT_SAMPLE_RATE // HOP_SIZE
+    kept: List[Tuple[int, int]] = []
+    for start in range(0, frame_count, frames_per_second):
+        block = (frames >= start) & (frames < start + frames_per_second)
+        strongest = np.argsort(level[frames[block], bins[block]])[::-1][:PEAKS_PER_SECOND]
+        kept.extend(zip(frames[block][strongest].tolist(), bins[block][strongest].tolist()))
+    return sorted(kept)
+
+
+def fingerprint(samples: np.ndarray, sample_rate: int) -> Fingerprint:
+    """
+    Hash pairs of nearby spectral peaks into (hash, anchor frame) pairs. Each
+    hash packs the anchor bin, the target bin and their frame distance, so it
+    survives level changes and codec noise but not different audio.
+    """
+    peaks = spectral_peaks(samples, sample_rate)
+    prints: Fingerprint = []
+    for i, (frame, freq) in enumerate(peaks):
+        targets = [(f, b) for f, b in peaks[i + 1:i + 1 + 4 * FAN_OUT] if 0 < f - frame <= MAX_PAIR_FRAMES]
+        for target_frame, target_freq in targets[:FAN_OUT]:
+            prints.append(((freq << 15) | (target_freq << 6) | (target_frame - frame), frame))
+    return prints
+
+
+class FingerprintIndex:
+    """
+    Time-windowed index of recent fingerprints. A recording matches an
+    indexed one when at least min_matches of its hashes line up at the same
+    frame offset (give or take a frame, for differing start times) and both
+    were recorded within window_seconds of each other. Each entry can carry a value (e.g. the transcription) for reuse.
+    """
+    def __init__(self, window_seconds: float, min_matches: int) -> None:
+        self.window_seconds = window_seconds
+        self.min_matches = min_matches
+        self._lock = threading.Lock()
+        self._hashes: Dict[int, List[Tuple[str, int]]] = {}
+        self._entries: Dict[str, Tuple[float, Fingerprint]] = {}
+        self._values: Dict[str, Any] = {}
+        self._latest: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: str, prints: Fingerprint, timestamp: float) -> None:
+        with self._lock:
+            self._expire(timestamp)
+            self._entries[key] = (timestamp, prints)
+            for hash_value, frame in prints:
+                self._hashes.setdefault(hash_value, []).append((key, frame))
+
+    def match(self, prints: Fingerprint, timestamp: float) -> Optional[FingerprintMatch]:
+        """
+        Return the best matching entry within the time window, if any.
+        """
+        with self._lock:
+            self._expire(timestamp)
+            offsets: Counter[Tuple[str, int]] = Counter()
+            for hash_value, frame in prints:
+                for key, indexed_frame in self._hashes.get(hash_value, ()):
+                    if abs(self._entries[key][0] - timestamp) <= self.window_seconds:
+                        offsets[(key, indexed_frame - frame)] += 1
+        if not offsets:
+            return None
+        # Neighbouring offsets are the same alignment split by frame rounding
+        score, key = max((count + offsets.get((key, offset + 1), 0), key)
+                         for (key, offset), count in offsets.items())
+        return FingerprintMatch(key, score) if score >= self.min_matches else None
+
+    def set_value(self, key: str, value: Any) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._values[key] = value
+
+    def value(self, key: str) -> Any:
+        with self._lock:
+            return self._values.get(key)
+
+    def _expire(self, timestamp: float) -> None:
+        # Recordings can arrive out of order, so expire against the newest seen
+        self._latest = max(self._latest, timestamp)
+        expired = [key for key, (seen, _) in self._entries.items() if seen < self._latest - self.window_seconds]
+        for key in expired:
+            _, prints = self._entries.pop(key)
+            self._values.pop(key, None)
+            for hash_value in {hash_value for hash_value, _ in prints}:
+                remaining = [item for item in self._hashes[hash_value] if item[0] != key]
+                if remaining:
+                    self._hashes[hash_value] = remaining
+                else:
+                    del self._hashes[hash_value]
@@ -1,4 +1,5 @@
 # pyre-strict
+import json
 import logging
 import os
 import sys
@@ -6,39 +7,92 @@ import threading
 import time
 
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 from mutagen.mp3 import MP3
 
+import metrics
 from config import Config
-from transcriber import Transcriber
-from utils import move_file, reencode_file
+from fingerprint import FingerprintIndex, fingerprint
+from recording_leases import LeaseManager
+from scheduler import PriorityScheduler, talkgroup_priority
+from speech_gate import SAMPLE_RATE, decode_samples, speech_fraction
+from transcriber import BaseTranscriber, RemoteTranscriber, Transcriber
+from transcript_feed import FeedPublisher
+from transcript_store import open_store
+from utils import extract_talkgroup_id, move_file, record_rejection, reencode_file
 
 class MP3Handler(FileSystemEventHandler):
     """
     Handles events for .mp3 files in a directory, checking their duration and
     transcribing them if they are long enough.
     """
-    def __init__(self, base_directory: str, too_short_directory: str) -> None:
+    def __init__(self, base_directory: str, too_short_directory: str,
+                 daemon_socket: Optional[str] = None) -> None:
         super().__init__()
         self.base_directory: str = os.path.abspath(base_directory)
         self.too_short_directory: str = os.path.abspath(too_short_directory)
         self.duration_threshold: float = Config.DURATION_THRESHOLD
-        self.transcriber = Transcriber()
+        store = open_store(Config.TRANSCRIPT_STORE,
+                           Config.TRANSCRIPT_STORE_DIRECTORY or os.path.join(self.base_directory, "transcripts"),
+                           Config.TRANSCRIPT_SIDECARS)
+        feed = FeedPublisher(Config.FEED_SOCKET) if Config.FEED_SOCKET else None
+        # With a daemon socket, models live in the shared daemon process
+        self.transcriber: BaseTranscriber = (RemoteTranscriber(daemon_socket, store, feed) if daemon_socket
+                                             else Transcriber(store=store, feed=feed))
         self.file_locks: Dict[str, threading.Lock] = {}
         self.file_times: Dict[str, float] = {}
+        self.intake_lock = threading.Lock()
         self.debounce_seconds: float = Config.DEBOUNCE_SECONDS
 
+        # Readiness tracking (seconds since started_at)
+        self.started_at: float = time.monotonic()
+        self.intake_started: Optional[float] = None
+        self.model_ready: Optional[float] = None
+        self.first_transcription: Optional[float] = None
+
         self.duration_pool = ThreadPoolExecutor(max_workers=15)
-        self.transcription_pool = ThreadPoolExecutor(max_workers=3)
+        self.transcription_queue = PriorityScheduler(max_workers=Config.TRANSCRIPTION_WORKERS,
+                                                     batch_func=self.transcribe_and_move_batch)
+
+        # Near-duplicate dedupe: recent fingerprints, and duplicates waiting
+        # on their original's transcription as (path, duration)
+        self.fingerprints = FingerprintIndex(Config.DEDUPE_WINDOW_SECONDS, Config.DEDUPE_MIN_MATCHES)
+        self.duplicates: Dict[str, List[Tuple[str, float]]] = {}
+        self.dedupe_lock = threading.Lock()
+
+        # Recordings are moved out of the root directory once handled, which releases their claims
+        self.leases: Optional[LeaseManager] = (
+            LeaseManager(self.base_directory, Config.LEASE_DIRECTORY or None, Config.LEASE_SECONDS, release_moved=True)
+            if Config.LEASES_ENABLED else None)
+        self.stopping = threading.Event()
 
         # Ensure output directories exist
         os.makedirs(self.too_short_directory, exist_ok=True)
 
         self.observer = Observer()
         self.observer.schedule(self, self.base_directory, recursive=True)
+        self._register_metrics()
+
+    def _register_metrics(self) -> None:
+        """
+        Point the scrape-time gauges at this handler's queues and stats.
+        """
+        metrics.TRANSCRIPTION_QUEUE_DEPTH.set_function(lambda: float(self.transcription_queue.pending()))
+        metrics.TRANSCRIPTION_LATENCY.set_function(lambda: [
+            ({"priority": str(priority), "quantile": quantile}, stats[name])
+            for priority, stats in self.transcription_queue.latency_percentiles().items()
+            for quantile, name in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99"))
+        ])
+        metrics.REAL_TIME_FACTOR.set_function(lambda: [
+            ({"model": model_name}, stats["rtf"]) for model_name, stats in self.transcriber.throughput().items()
+        ])
+        metrics.READINESS_SECONDS.set_function(lambda: [
+            ({"milestone": milestone}, seconds)
+            for milestone, seconds in self.readiness().items() if seconds is not None
+        ])
 
     def on_created(self, event: Any) -> None:
         """
@@ -47,21 +101,49 @@ class MP3Handler(FileSystemEventHandler):
         """
         if not event.is_directory and event.src_path.endswith('.mp3'):
             file_path = os.path.abspath(event.src_path)
-            current_time = time.time()
-            last_processed = self.file_times.get(file_path, 0)
-            if current_time - last_processed > self.debounce_seconds:
-                self.file_times[file_path] = current_time
+            if self.submit_probe(file_path):
                 logging.info(f"New MP3 file detected: {file_path}")
-                self.process_file(file_path)
+
+    def submit_probe(self, path: str) -> bool:
+        """
+        Hand a file to the probe pool unless it was already seen within the
+        debounce window (events and the startup rescan can overlap).
+        """
+        current_time = time.time()
+        with self.intake_lock:
+            if current_time - self.file_times.get(path, 0) <= self.debounce_seconds:
+                return False
+            self.file_times[path] = current_time
+        if self.leases is not None and not self.leases.claim(os.path.basename(path)):
+            # Another host (or this one, still working on it) has it
+            return False
+        metrics.FILES_DETECTED.inc()
+        metrics.PROBE_QUEUE_DEPTH.inc()
+        self.duration_pool.submit(self._probe, path)
+        return True
+
+    def _probe(self, path: str) -> None:
+        try:
+            self.process_file(path)
+        finally:
+            metrics.PROBE_QUEUE_DEPTH.dec()
 
     def start(self) -> None:
         """
         Start monitoring the directory for new mp3 files.
         Also process any existing .mp3 files that might be present.
+        Intake starts right away; the model loads in the background and
+        queued recordings wait for it.
         """
-        self.process_existing_files()
         self.observer.schedule(self, self.base_directory, recursive=False)
         self.observer.start()
+        self.intake_started = time.monotonic() - self.started_at
+        logging.info(f"Intake started {self.intake_started:.2f}s after startup")
+        self.transcriber.warm_up(self._on_model_ready)
+        if self.leases is not None:
+            self.leases.start()
+            threading.Thread(target=self._rescan, name="lease-rescan", daemon=True).start()
+        self.process_existing_files()
         try:
             self.observer.join()
         except KeyboardInterrupt:
@@ -71,10 +153,17 @@ class MP3Handler(FileSystemEventHandler):
         """
         Stop monitoring and shut down executor pools gracefully.
         """
+        self.stopping.set()
         self.observer.stop()
         self.observer.join()
         self.duration_pool.shutdown(wait=True)
-        self.transcription_pool.shutdown(wait=True)
+        self.transcription_queue.shutdown(wait=True)
+        if self.leases is not None:
+            self.leases.stop()
+        for priority, stats in self.transcription_queue.latency_percentiles().items():
+            logging.info(f"Priority {priority} latency: {stats}")
+        for model_name, stats in self.transcriber.throughput().items():
+            logging.info(f"Model {model_name} throughput: {stats}")
         logging.info("Monitoring stopped.")
         sys.exit(0)
 
@@ -87,7 +176,30 @@ class MP3Handler(FileSystemEventHandler):
                 if filename.endswith('.mp3'):
                     full_path = os.path.join(root, filename)
                     if os.path.dirname(full_path) == self.base_directory:
-                        self.process_file(full_path)
+                        self.submit_probe(full_path)
+
+    def _rescan(self) -> None:
+        """
+        Pick up recordings whose claims expired on a host that died.
+        """
+        while not self.stopping.wait(Config.LEASE_SECONDS):
+            self.process_existing_files()
+
+    def _on_model_ready(self) -> None:
+        self.model_ready = time.monotonic() - self.started_at
+        logging.info(f"Model ready {self.model_ready:.2f}s after startup "
+                     f"({self.transcription_queue.pending()} recordings queued)")
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Startup milestones in seconds since the handler was created
+        (None until reached).
+        """
+        return {
+            "intake_started": self.intake_started,
+            "model_ready": self.model_ready,
+            "first_transcription": self.first_transcription,
+        }
 
     def process_file(self, path: str) -> None:
         """
@@ -100,24 +212,128 @@ class MP3Handler(FileSystemEventHandler):
         if file_dir != self.base_directory:
             logging.debug(f"Ignoring file not in root directory: {path}")
             return
+        started = time.monotonic()
         try:
             duration = MP3(path).info.length
             logging.info(f"Processed {path}: Duration = {duration} seconds")
             if duration < self.duration_threshold:
-                dest_path = os.path.join(self.too_short_directory, os.path.basename(path))
-                move_file(path, dest_path)
-                logging.info(f"Moved {path} to {dest_path} due to short duration.")
+                self._reject(path, "too_short", f"duration={duration:.2f}")
             else:
-                self.transcription_pool.submit(self.transcribe_and_move, path)
+                self._admit(path, duration)
+            metrics.DECODE_SECONDS.observe(time.monotonic() - started)
         except Exception as e:
             logging.error(f"Failed to process {path}: {str(e)}")
             self._attempt_reencode(path)
 
+    def _admit(self, path: str, duration: float) -> None:
+        """
+        Decodes a long-enough recording once for the speech gate and the
+        duplicate check, and queues it for transcription if it passes both.
+        """
+        samples = decode_samples(path) if Config.SPEECH_GATE_ENABLED or Config.DEDUPE_ENABLED else None
+        if self._has_speech(path, samples) and not self._is_duplicate(path, samples):
+            self._enqueue(path, duration)
+
+    def _enqueue(self, path: str, duration: float) -> None:
+        """
+        Queue a recording for transcription, ordered by talkgroup priority
+        and duration.
+        """
+        priority = talkgroup_priority(os.path.basename(path))
+        pack_key: Optional[str] = None
+        if duration <= Config.PACK_MAX_CLIP_SECONDS:
+            if Config.PACK_BY == "priority":
+                pack_key = f"priority:{priority}"
+            else:
+                pack_key = f"talkgroup:{extract_talkgroup_id(os.path.basename(path))}"
+        self.transcription_queue.submit(self.transcribe_and_move, path, priority=priority, duration=duration,
+                                        pack_key=pack_key)
+
+    def _has_speech(self, path: str, samples: Any) -> bool:
+        """
+        Runs the speech-content gate. Recordings whose speech fraction is below
+        MIN_SPEECH_FRACTION are rejected and False is returned.
+        """
+        if not Config.SPEECH_GATE_ENABLED:
+            return True
+        fraction = speech_fraction(samples)
+        logging.debug(f"Speech fraction for {path}: {fraction:.3f}")
+        if fraction < Config.MIN_SPEECH_FRACTION:
+            self._reject(path, "no_speech", f"speech_fraction={fraction:.3f}")
+            return False
+        return True
+
+    def _is_duplicate(self, path: str, samples: Any) -> bool:
+        """
+        Checks the recording's fingerprint against recordings from the last
+        DEDUPE_WINDOW_SECONDS. A near-duplicate reuses the original's
+        transcription (now, or once the original is transcribed) and True is
+        returned; otherwise the recording is indexed and False is returned.
+        """
+        if not Config.DEDUPE_ENABLED:
+            return False
+        prints = fingerprint(samples, SAMPLE_RATE)
+        # File times survive moves and restarts, unlike arrival times
+        timestamp = os.path.getmtime(path)
+        with self.dedupe_lock:
+            match = self.fingerprints.match(prints, timestamp)
+            if match is None:
+                self.fingerprints.add(path, prints, timestamp)
+                return False
+            transcription_text = self.fingerprints.value(match.key)
+            if transcription_text is None:
+                self.duplicates.setdefault(match.key, []).append((path, len(samples) / SAMPLE_RATE))
+        logging.info(f"{path} is a near-duplicate of {match.key} (score {match.score})")
+        if transcription_text is not None:
+            self._save_duplicate(path, match.key, transcription_text)
+        return True
+
+    def _release_duplicates(self, path: str, transcription_text: Optional[str]) -> None:
+        """
+        Saves the duplicates waiting on path with its transcription, or queues
+        them for their own transcription if path failed (transcription_text
+        is None).
+        """
+        with self.dedupe_lock:
+            if transcription_text is not None:
+                self.fingerprints.set_value(path, transcription_text)
+            waiting = self.duplicates.pop(path, [])
+        for duplicate, duration in waiting:
+            if transcription_text is None:
+                self._enqueue(duplicate, duration)
+            else:
+                self._save_duplicate(duplicate, path, transcription_text)
+
+    def _save_duplicate(self, path: str, original: str, transcription_text: str) -> None:
+        try:
+            result = json.loads(transcription_text)
+            result["duplicate_of"] = os.path.basename(original)
+            self.transcriber.save_transcription(path, json.dumps(result))
+            metrics.DUPLICATES.inc()
+        except Exception as e:
+            metrics.FILES_FAILED.inc()
+            logging.error(f"Failed to save duplicate transcription for {path}: {str(e)}")
+
+    def _reject(self, path: str, reason: str, detail: str) -> None:
+        """
+        Moves a rejected recording to the too-short/error directory and
+        records the reason code in the rejection log.
+        """
+        dest_path = os.path.join(self.too_short_directory, os.path.basename(path))
+        move_file(path, dest_path)
+        self._record_rejection(path, reason, detail)
+        logging.info(f"Moved {path} to {dest_path} ({reason}: {detail}).")
+
+    def _record_rejection(self, path: str, reason: str, detail: Optional[str] = None) -> None:
+        record_rejection(self.too_short_directory, os.path.basename(path), reason, detail)
+        metrics.FILES_REJECTED.inc(reason=reason)
+
     def _attempt_reencode(self, path: str) -> None:
         """
         Attempt to re-encode the file if processing fails the first time,
         and retry transcription logic.
         """
+        metrics.REENCODES.inc()
         temp_path = self._get_temp_path(path)
         if reencode_file(path, temp_path) and os.path.exists(temp_path):
             # Check duration again
@@ -129,13 +345,14 @@ class MP3Handler(FileSystemEventHandler):
                     if os.path.exists(path):
                         os.remove(path)
                     os.rename(temp_path, final_path)
+                    self._record_rejection(path, "too_short", f"duration={duration:.2f}")
                     logging.info(f"Moved and renamed {temp_path} to {final_path} due to short duration.")
                 else:
                     final_path = os.path.join(self.base_directory, os.path.basename(path))
                     if os.path.exists(path):
                         os.remove(path)
                     os.rename(temp_path, final_path)
-                    self.transcription_pool.submit(self.transcribe_and_move, final_path)
+                    self._admit(final_path, duration)
             except Exception as re_err:
                 logging.error(f"Failed to re-process {path} after re-encoding: {str(re_err)}")
                 self._handle_reencode_fail(path, temp_path)
@@ -150,6 +367,7 @@ class MP3Handler(FileSystemEventHandler):
             os.remove(temp_path)
         original_dest_path = os.path.join(self.too_short_directory, os.path.basename(path))
         move_file(path, original_dest_path)
+        self._record_rejection(path, "decode_error")
         logging.info(f"Moved original {path} to {original_dest_path} after repeated failures.")
 
     def _get_temp_path(self, original_path: str) -> str:
@@ -169,12 +387,68 @@ class MP3Handler(FileSystemEventHandler):
         with lock:
             if not os.path.exists(path):
                 logging.error(f"File not found, skipping transcription: {path}")
+                self._release_duplicates(path, None)
                 return
             try:
                 transcription_text = self.transcriber.transcribe_file(path)
-                self.transcriber.save_transcription(path, transcription_text)
+                self._save(path, transcription_text)
             except Exception as e:
+                metrics.FILES_FAILED.inc()
                 logging.error(f"Failed to transcribe {path}: {str(e)}")
+                self._release_duplicates(path, None)
             finally:
                 # Clean up lock
-                self.file_locks.pop(path, None)
\ No newline at end of file
+                self.file_locks.pop(path, None)
+
+    def transcribe_and_move_batch(self, batch: List[Tuple[Any, ...]]) -> None:
+        """
+        Transcribes several packed recordings in one call (see
+        Transcriber.transcribe_batch). Falls back to one call per file if the
+        packed call fails. Holds every recording's file lock, as
+        transcribe_and_move does for one, while transcribing and saving.
+        """
+        requested = list(dict.fromkeys(args[0] for args in batch))
+        # Always taken in the same order, so overlapping batches cannot deadlock
+        locks = [(path, self.file_locks.setdefault(path, threading.Lock())) for path in sorted(requested)]
+        for _, lock in locks:
+            lock.acquire()
+        retry: List[str] = []
+        try:
+            paths = []
+            for path in requested:
+                if os.path.exists(path):
+                    paths.append(path)
+                else:
+                    logging.error(f"File not found, skipping transcription: {path}")
+                    self._release_duplicates(path, None)
+            if not paths:
+                return
+            try:
+                texts = self.transcriber.transcribe_batch(paths)
+            except Exception as e:
+                logging.error(f"Packed transcription of {len(paths)} files failed, retrying individually: {str(e)}")
+                retry = paths
+            else:
+                logging.info(f"Transcribed {len(paths)} recordings in one packed call")
+                for path, transcription_text in zip(paths, texts):
+                    try:
+                        self._save(path, transcription_text)
+                    except Exception as e:
+                        metrics.FILES_FAILED.inc()
+                        logging.error(f"Failed to save transcription for {path}: {str(e)}")
+                        self._release_duplicates(path, None)
+        finally:
+            for path, lock in locks:
+                self.file_locks.pop(path, None)
+                lock.release()
+        # transcribe_and_move takes each lock again
+        for path in retry:
+            self.transcribe_and_move(path)
+
+    def _save(self, path: str, transcription_text: str) -> None:
+        self.transcriber.save_transcription(path, transcription_text)
+        metrics.FILES_TRANSCRIBED.inc()
+        self._release_duplicates(path, transcription_text)
+        if self.first_transcription is None:
+            self.first_transcription = time.monotonic() - self.started_at
+            logging.info(f"First transcription completed {self.first_transcription:.2f}s after startup")
\ No newline at end of file
@@ -4,16 +4,19 @@ import os
 import signal
 import sys
 import argparse
+from typing import Optional
 
 from config import Config
 from handler import MP3Handler
+from metrics import start_metrics_server
+from transcript_feed import FeedServer, TranscriptFeed
 
 def signal_handler(sig: int, frame: object) -> None:
     logging.info('SIGINT or CTRL-C detected. Exiting gracefully.')
     sys.exit(0)
 
-def start_monitoring(base_directory: str, too_short_directory: str) -> None:
-    handler = MP3Handler(base_directory, too_short_directory)
+def start_monitoring(base_directory: str, too_short_directory: str, daemon_socket: Optional[str] = None) -> None:
+    handler = MP3Handler(base_directory, too_short_directory, daemon_socket)
     signal.signal(signal.SIGINT, signal_handler)
     handler.start()
 
@@ -21,12 +24,19 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="SDR Trunk Transcriber")
     parser.add_argument("--root-directory", type=str, help="Path to the root directory containing MP3 files")
     parser.add_argument("--too-short-directory", type=str, help="Path to the directory for short/error files")
+    parser.add_argument("--daemon-socket", type=str,
+                        help="Send transcriptions to a shared daemon (daemon.py) listening on this socket")
+    parser.add_argument("--metrics-port", type=int, default=Config.METRICS_PORT,
+                        help="Port for the /metrics endpoint (0 disables it)")
+    parser.add_argument("--feed-port", type=int, default=Config.FEED_PORT,
+                        help="Port for the live transcript feed (/events, 0 disables it)")
 
     args = parser.parse_args()
 
     # Determine directories with priority: CLI args > ENV VAR > Config default
     root_directory = args.root_directory or os.getenv("ROOT_DIRECTORY", Config.ROOT_DIRECTORY)
     too_short_directory = args.too_short_directory or os.getenv("TOO_SHORT_DIRECTORY", Config.TOO_SHORT_DIRECTORY)
+    daemon_socket = args.daemon_socket or os.getenv("TRANSCRIBE_SOCKET")
 
     logging.basicConfig(
         level=getattr(logging, Config.LOG_LEVEL, logging.INFO),
@@ -35,4 +45,10 @@ if __name__ == "__main__":
         filemode='a'
     )
 
-    start_monitoring(root_directory, too_short_directory)
\ No newline at end of file
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port, Config.METRICS_HOST)
+    if args.feed_port and Config.FEED_SOCKET:
+        FeedServer(TranscriptFeed(), Config.FEED_SOCKET, args.feed_port, Config.FEED_HOST,
+                   Config.FEED_CLIENT_BUFFER).start()
+
+    start_monitoring(root_directory, too_short_directory, daemon_socket)
\ No newline at end of file
@@ -0,0 +1,234 @@
+# pyre-strict
+import bisect
+import logging
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+LabelKey = Tuple[Tuple[str, str], ...]
+GaugeValue = Union[float, List[Tuple[Dict[str, str], float]]]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metric(ABC):
+    kind: str = "untyped"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help_text}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing count, optionally split by labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """
+    Point-in-time value. Either set explicitly or computed at scrape time by
+    a callback returning a float or a list of (labels, value) pairs.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._callback: Optional[Callable[[], GaugeValue]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], GaugeValue]) -> None:
+        self._callback = callback
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._callback is not None:
+            try:
+                result = self._callback()
+            except Exception as e:
+                logging.error(f"Metric callback for {self.name} failed: {str(e)}")
+                result = []
+            if isinstance(result, list):
+                values.update({_label_key(labels): value for labels, value in result})
+            else:
+                values[()] = float(result)
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """
+    Cumulative-bucket histogram of observed values, optionally split by labels.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (last slot is +Inf), sum
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        with self._lock:
+            series = {k: (list(c), t[0]) for k, (c, t) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together in the Prometheus text format.
+    """
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))  # pyre-ignore[7]
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(name, help_text))  # pyre-ignore[7]
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))  # pyre-ignore[7]
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+REGISTRY = MetricsRegistry()
+
+FILES_DETECTED = REGISTRY.counter("sdrtrunk_files_detected_total", "MP3 files handed to the probe stage")
+FILES_TRANSCRIBED = REGISTRY.counter("sdrtrunk_files_transcribed_total", "Recordings transcribed and saved")
+FILES_FAILED = REGISTRY.counter("sdrtrunk_files_failed_total", "Recordings whose transcription failed")
+FILES_REJECTED = REGISTRY.counter("sdrtrunk_files_rejected_total", "Recordings moved to the too-short/error directory")
+REENCODES = REGISTRY.counter("sdrtrunk_reencodes_total", "ffmpeg re-encode attempts")
+PROBE_QUEUE_DEPTH = REGISTRY.gauge("sdrtrunk_probe_queue_depth", "Files waiting for or in the probe stage")
+TRANSCRIPTION_QUEUE_DEPTH = REGISTRY.gauge("sdrtrunk_transcription_queue_depth", "Recordings waiting for transcription")
+TRANSCRIPTION_LATENCY = REGISTRY.gauge("sdrtrunk_transcription_latency_seconds",
+                                       "Queue-to-saved latency percentiles over recent jobs")
+DECODE_SECONDS = REGISTRY.histogram("sdrtrunk_decode_seconds", "Time to decode and probe a recording")
+TRANSCRIPTION_SECONDS = REGISTRY.histogram("sdrtrunk_transcription_seconds", "Wall time per transcription")
+AUDIO_SECONDS = REGISTRY.counter("sdrtrunk_audio_seconds_total", "Audio seconds transcribed")
+REAL_TIME_FACTOR = REGISTRY.gauge("sdrtrunk_real_time_factor", "Audio seconds transcribed per wall second")
+PACKED_CLIPS = REGISTRY.counter("sdrtrunk_packed_clips_total", "Recordings transcribed as part of a packed call")
+PACK_CALLS_SAVED = REGISTRY.counter("sdrtrunk_pack_calls_saved_total", "Model calls avoided by clip packing")
+DUPLICATES = REGISTRY.counter("sdrtrunk_duplicates_total", "Recordings that reused a near-duplicate's transcription")
+FEED_EVENTS = REGISTRY.counter("sdrtrunk_feed_events_total", "Transcripts published to the live feed")
+FEED_CLIENTS_DROPPED = REGISTRY.counter("sdrtrunk_feed_clients_dropped_total",
+                                        "Live feed clients disconnected for falling behind")
+LEASES_CLAIMED = REGISTRY.counter("sdrtrunk_leases_claimed_total", "Recordings claimed by this host")
+LEASES_RECLAIMED = REGISTRY.counter("sdrtrunk_leases_reclaimed_total",
+                                    "Expired claims of crashed or hung hosts taken over")
+MODEL_LOAD_SECONDS = REGISTRY.gauge("sdrtrunk_model_load_seconds", "Time taken to load each model")
+READINESS_SECONDS = REGISTRY.gauge("sdrtrunk_readiness_seconds", "Startup milestones in seconds since start")
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        logging.debug(f"Metrics request: {format % args}")
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve /metrics on a background thread and return the server.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logging.info(f"Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,187 @@
+# pyre-strict
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from config import Config
+from transcript_store import SegmentedStore, sidecar_path
+from utils import index_recording_paths, recording_directory
+
+JOURNAL_NAME: str = ".layout-migration.jsonl"
+
+Move = Tuple[str, str]
+
+
+class LayoutMigration:
+    """
+    Moves processed recordings (and their .txt sidecars) under root into
+    the given layout in batches, updating the recordings table and the
+    segmented transcript store as it goes.
+
+    Each batch is written to a journal before any file moves and marked
+    done once the database is updated, so an interrupted run picks up the
+    unfinished batch on the next start. Only files in talkgroup
+    directories older than min_age_seconds are touched; recordings the
+    watchers are still writing or saving are left alone, so it can run
+    while they are live.
+    """
+    def __init__(self, root: str, layout: str, database: Optional[str] = None,
+                 transcript_store: Optional[str] = None, batch_size: int = 500,
+                 min_age_seconds: float = 60.0) -> None:
+        self.root = os.path.abspath(root)
+        self.layout = layout
+        self.batch_size = batch_size
+        self.min_age_seconds = min_age_seconds
+        self.journal_path = os.path.join(self.root, JOURNAL_NAME)
+        self.conn: Optional[sqlite3.Connection] = None
+        if database:
+            self.conn = sqlite3.connect(database, timeout=30)
+            index_recording_paths(self.conn)
+        self.store: Optional[SegmentedStore] = SegmentedStore(transcript_store) if transcript_store else None
+
+    def pending_moves(self) -> Iterator[Move]:
+        """
+        Recordings below root that are not where the layout puts them.
+        """
+        now = time.time()
+        for directory, subdirectories, files in os.walk(self.root):
+            subdirectories.sort()
+            if directory == self.root:
+                continue
+            for filename in sorted(files):
+                if not filename.endswith(".mp3"):
+                    continue
+                source = os.path.join(directory, filename)
+                target = os.path.join(recording_directory(self.root, filename, layout=self.layout), filename)
+                if source == target:
+                    continue
+                try:
+                    # ctime also changes when a file is moved into place
+                    if now - os.stat(source).st_ctime < self.min_age_seconds:
+                        continue
+                except FileNotFoundError:
+                    continue
+                yield source, target
+
+    def run(self) -> int:
+        """
+        Finish any interrupted batch, then migrate everything else. Returns
+        the number of recordings moved.
+        """
+        moved = 0
+        unfinished, batch_number = self._read_journal()
+        for number, moves in unfinished:
+            logging.info(f"Resuming interrupted batch {number} ({len(moves)} recordings)")
+            moved += self._apply(number, moves)
+
+        batch: List[Move] = []
+        for move in self.pending_moves():
+            batch.append(move)
+            if len(batch) >= self.batch_size:
+                batch_number += 1
+                moved += self._run_batch(batch_number, batch)
+                batch = []
+        if batch:
+            batch_number += 1
+            moved += self._run_batch(batch_number, batch)
+
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        logging.info(f"Layout migration complete: {moved} recordings moved")
+        return moved
+
+    def _run_batch(self, batch_number: int, moves: List[Move]) -> int:
+        self._journal({"batch": batch_number, "moves": moves})
+        return self._apply(batch_number, moves)
+
+    def _apply(self, batch_number: int, moves: List[Move]) -> int:
+        moved: List[Move] = []
+        for source, target in moves:
+            if self._move(source, target):
+                moved.append((source, target))
+        if self.conn is not None:
+            with self.conn:
+                self.conn.executemany("UPDATE recordings SET filepath = ? WHERE filepath = ?",
+                                      [(target, source) for source, target in moves])
+        if self.store is not None:
+            for source, target in moves:
+                record = self.store.record(target)
+                if record is not None and record["path"] != target:
+                    metadata = {k: v for k, v in record.items() if k not in ("name", "path", "content", "written")}
+                    self.store.write(target, record["content"], metadata)
+        self._journal({"batch": batch_number, "done": True})
+        logging.info(f"Batch {batch_number}: moved {len(moved)} of {len(moves)} recordings")
+        return len(moved)
+
+    def _move(self, source: str, target: str) -> bool:
+        """
+        Move a recording and its sidecar. Already-moved files (a resumed
+        batch) are skipped.
+        """
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        moved = False
+        if os.path.exists(source) and not os.path.exists(target):
+            os.rename(source, target)
+            moved = True
+        if os.path.exists(sidecar_path(source)) and not os.path.exists(sidecar_path(target)):
+            os.rename(sidecar_path(source), sidecar_path(target))
+        return moved
+
+    def _journal(self, entry: Dict[str, Any]) -> None:
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_journal(self) -> Tuple[List[Tuple[int, List[Move]]], int]:
+        """
+        Batches journaled but not marked done, and the last batch number.
+        """
+        if not os.path.exists(self.journal_path):
+            return [], 0
+        batches: List[Tuple[int, List[Move]]] = []
+        done: Set[int] = set()
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from an interrupted write
+                    continue
+                if entry.get("done"):
+                    done.add(entry["batch"])
+                else:
+                    batches.append((entry["batch"], [(source, target) for source, target in entry["moves"]]))
+        last = max([number for number, _ in batches] + list(done), default=0)
+        return [(number, moves) for number, moves in batches if number not in done], last
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+        if self.store is not None:
+            self.store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move processed recordings into a new directory layout")
+    parser.add_argument("root", type=str, help="Recordings root directory")
+    parser.add_argument("--layout", type=str, default=Config.RECORDING_LAYOUT,
+                        help='Target layout, e.g. "{talkgroup}/{year}/{month}/{day}"')
+    parser.add_argument("--database", type=str, help="recordings.db whose filepath column should follow the moves")
+    parser.add_argument("--transcript-store", type=str, help="Segmented transcript store to repoint")
+    parser.add_argument("--batch-size", type=int, default=500, help="Recordings per batch/transaction")
+    parser.add_argument("--min-age", type=float, default=60.0,
+                        help="Skip recordings modified within this many seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    migration = LayoutMigration(args.root, args.layout, args.database, args.transcript_store,
+                                args.batch_size, args.min_age)
+    try:
+        print(f"Moved {migration.run()} recordings")
+    finally:
+        migration.close()
@@ -0,0 +1,151 @@
+# pyre-strict
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import metrics
+from config import Config
+from scheduler import talkgroup_priority
+from utils import extract_talkgroup_id
+
+# pyre-ignore[21]: No type hints from 3rd party library
+import faster_whisper
+
+
+class ModelSpec(NamedTuple):
+    size: str
+    compute_type: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.size}/{self.compute_type}"
+
+
+class ModelStats:
+    """
+    Running totals used to report per-model throughput.
+    """
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.audio_seconds: float = 0.0
+        self.wall_seconds: float = 0.0
+
+
+def estimate_memory_mb(spec: ModelSpec) -> int:
+    """
+    Rough resident size of a model, from MODEL_MEMORY_ESTIMATES_MB.
+    8-bit compute types take about half the memory of 16-bit ones.
+    """
+    estimate = Config.MODEL_MEMORY_ESTIMATES_MB.get(spec.size, Config.MODEL_MEMORY_ESTIMATES_MB["large-v3"])
+    if spec.compute_type.startswith("int8"):
+        estimate //= 2
+    return estimate
+
+
+def default_spec() -> ModelSpec:
+    size, compute_type = Config.MODEL_PROFILES[Config.DEFAULT_MODEL_PROFILE]
+    return ModelSpec(size, compute_type)
+
+
+def load_whisper_model(spec: ModelSpec) -> Any:
+    return faster_whisper.WhisperModel(spec.size, device=Config.DEVICE, compute_type=spec.compute_type)
+
+
+class ModelRegistry:
+    """
+    Lazily loads Whisper models per routing profile and keeps the most
+    recently used ones resident within MODEL_MEMORY_BUDGET_MB.
+
+    Evicting a model only drops the registry's reference; a transcription
+    already running on it keeps its own reference until it finishes.
+    """
+    def __init__(self, budget_mb: Optional[int] = None,
+                 loader: Callable[[ModelSpec], Any] = load_whisper_model) -> None:
+        self.budget_mb: int = budget_mb if budget_mb is not None else Config.MODEL_MEMORY_BUDGET_MB
+        self._loader = loader
+        self._models: "OrderedDict[ModelSpec, Any]" = OrderedDict()
+        self._load_locks: Dict[ModelSpec, threading.Lock] = {}
+        self._stats: Dict[ModelSpec, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def route(self, filename: str) -> ModelSpec:
+        """
+        Picks the model profile for a recording: talkgroup override first,
+        then the talkgroup's priority, then DEFAULT_MODEL_PROFILE.
+        """
+        talkgroup_id = extract_talkgroup_id(filename)
+        profile = Config.TALKGROUP_MODELS.get(talkgroup_id)
+        if profile is None:
+            profile = Config.PRIORITY_MODELS.get(talkgroup_priority(filename), Config.DEFAULT_MODEL_PROFILE)
+        size, compute_type = Config.MODEL_PROFILES[profile]
+        return ModelSpec(size, compute_type)
+
+    def loaded(self) -> Dict[str, int]:
+        """
+        Names and estimated sizes (MB) of resident models, least recent first.
+        """
+        with self._lock:
+            return {spec.name: estimate_memory_mb(spec) for spec in self._models}
+
+    def get(self, spec: ModelSpec) -> Any:
+        """
+        Returns the model for spec, loading it (and evicting least recently
+        used models to stay within budget) if necessary.
+        """
+        with self._lock:
+            if spec in self._models:
+                self._models.move_to_end(spec)
+                return self._models[spec]
+            load_lock = self._load_locks.setdefault(spec, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if spec in self._models:
+                    self._models.move_to_end(spec)
+                    return self._models[spec]
+            self._evict_for(spec)
+            logging.info(f"Loading model {spec.name}")
+            started = time.monotonic()
+            model = self._loader(spec)
+            elapsed = time.monotonic() - started
+            metrics.MODEL_LOAD_SECONDS.set(elapsed, model=spec.name)
+            logging.info(f"Loaded model {spec.name} in {elapsed:.1f}s")
+            with self._lock:
+                self._models[spec] = model
+            return model
+
+    def _evict_for(self, spec: ModelSpec) -> None:
+        needed = estimate_memory_mb(spec)
+        if needed > self.budget_mb:
+            logging.warning(f"Model {spec.name} (~{needed} MB) exceeds the memory budget of {self.budget_mb} MB")
+        with self._lock:
+            used = sum(estimate_memory_mb(s) for s in self._models)
+            while self._models and used + needed > self.budget_mb:
+                evicted, _ = self._models.popitem(last=False)
+                used -= estimate_memory_mb(evicted)
+                logging.info(f"Evicted model {evicted.name} to stay within {self.budget_mb} MB")
+
+    def record(self, spec: ModelSpec, audio_seconds: float, wall_seconds: float) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(spec, ModelStats())
+            stats.calls += 1
+            stats.audio_seconds += audio_seconds
+            stats.wall_seconds += wall_seconds
+
+    def throughput(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-model call count, audio and wall seconds, and real-time factor
+        (audio seconds transcribed per wall second).
+        """
+        with self._lock:
+            report: Dict[str, Dict[str, float]] = {}
+            for spec, stats in self._stats.items():
+                report[spec.name] = {
+                    "calls": float(stats.calls),
+                    "audio_seconds": stats.audio_seconds,
+                    "wall_seconds": stats.wall_seconds,
+                    "rtf": stats.audio_seconds / stats.wall_seconds if stats.wall_seconds else 0.0,
+                }
+            return report
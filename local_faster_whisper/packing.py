@@ -0,0 +1,58 @@
+# pyre-strict
+import bisect
+from typing import Any, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Whisper's input rate, which speech_gate.decode_samples produces
+SAMPLE_RATE: int = 16000
+
+
+def pack_clips(clips: Sequence[np.ndarray], gap_seconds: float,
+               sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """
+    Concatenate clips with gap_seconds of silence between them. Returns the
+    packed samples and each clip's (start, end) offset in seconds.
+    """
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=np.float32)
+    parts: List[np.ndarray] = []
+    offsets: List[Tuple[float, float]] = []
+    position = 0
+    for i, clip in enumerate(clips):
+        if i:
+            parts.append(gap)
+            position += len(gap)
+        parts.append(clip.astype(np.float32, copy=False))
+        offsets.append((position / sample_rate, (position + len(clip)) / sample_rate))
+        position += len(clip)
+    packed = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    return packed, offsets
+
+
+def timed_words(segments: Iterable[Any]) -> List[Tuple[float, float, str]]:
+    """
+    Flatten transcription segments into (start, end, text) pieces, using word
+    timestamps when available and whole segments otherwise.
+    """
+    pieces: List[Tuple[float, float, str]] = []
+    for segment in segments:
+        words = getattr(segment, "words", None)
+        if words:
+            pieces.extend((word.start, word.end, word.word) for word in words)
+        else:
+            pieces.append((segment.start, segment.end, segment.text))
+    return pieces
+
+
+def split_by_offsets(pieces: Sequence[Tuple[float, float, str]],
+                     offsets: Sequence[Tuple[float, float]]) -> List[str]:
+    """
+    Assign each timed piece to the clip whose span contains its midpoint
+    (clip boundaries sit halfway through the silence between clips) and
+    return the joined text per clip.
+    """
+    boundaries = [(offsets[i][1] + offsets[i + 1][0]) / 2 for i in range(len(offsets) - 1)]
+    texts: List[List[str]] = [[] for _ in offsets]
+    for start, end, text in pieces:
+        texts[bisect.bisect_right(boundaries, (start + end) / 2)].append(text)
+    return [" ".join(" ".join(parts).split()) for parts in texts]
@@ -0,0 +1,186 @@
+# pyre-strict
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional, Set
+
+import metrics
+
+CLAIM_SUFFIX: str = ".claim"
+
+
+class LeaseManager:
+    """
+    Lets several hosts drain one shared (e.g. NFS-mounted) recordings
+    directory without processing a recording twice. A host owns a recording
+    while it holds its claim file in claims_directory (default:
+    <directory>/.claims). Claims are created with O_CREAT | O_EXCL, so
+    exactly one host wins each recording, and the owner touches its claims
+    every heartbeat_seconds. A claim not touched for lease_seconds belongs
+    to a host that crashed or hung, and the next host to want the
+    recording takes it over. Hosts' clocks are assumed to be in sync (NTP).
+
+    Claims are released with release(), or, with release_moved, by the
+    heartbeat once the recording has been moved out of the directory (for
+    callers that only move a recording away when they are done with it).
+    """
+    def __init__(self, directory: str, claims_directory: Optional[str] = None, lease_seconds: float = 60.0,
+                 heartbeat_seconds: Optional[float] = None, owner: Optional[str] = None,
+                 release_moved: bool = False) -> None:
+        self.directory = os.path.abspath(directory)
+        self.claims_directory = os.path.abspath(claims_directory or os.path.join(self.directory, ".claims"))
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds or lease_seconds / 3
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.release_moved = release_moved
+        self.held: Set[str] = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        os.makedirs(self.claims_directory, exist_ok=True)
+
+    def _claim_path(self, filename: str) -> str:
+        return os.path.join(self.claims_directory, filename + CLAIM_SUFFIX)
+
+    def _owner_of(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f).get("owner")
+        except (OSError, ValueError):
+            # Gone, or created but not written yet
+            return None
+
+    def _expired(self, path: str) -> bool:
+        return time.time() - os.stat(path).st_mtime >= self.lease_seconds
+
+    def claim(self, filename: str) -> bool:
+        """
+        Try to take the recording filename. True if this host has just
+        claimed it (False if it already held it).
+        """
+        with self.lock:
+            if filename in self.held:
+                return False
+        path = self._claim_path(filename)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._take_over(path):
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({"owner": self.owner, "claimed_at": time.time()}, f)
+            with self.lock:
+                self.held.add(filename)
+            metrics.LEASES_CLAIMED.inc()
+            return True
+        return False
+
+    def _take_over(self, path: str) -> bool:
+        """
+        Remove an expired claim so it can be created again. Renaming it
+        aside first means only one of several hosts racing for it removes
+        it; if the claim turns out to have been renewed meanwhile, it is put
+        back. True if the claim is gone.
+        """
+        try:
+            if not self._expired(path):
+                return False
+            stale = f"{path}.{self.owner.replace(':', '-')}.stale"
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return True
+        try:
+            if not self._expired(stale):
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                return False
+            logging.warning(f"Taking over expired claim on {os.path.basename(path)[:-len(CLAIM_SUFFIX)]} "
+                            f"from {self._owner_of(stale)}")
+            metrics.LEASES_RECLAIMED.inc()
+            return True
+        finally:
+            os.remove(stale)
+
+    def claim_batch(self, filenames: Iterable[str], limit: int) -> List[str]:
+        """
+        Claim up to limit of filenames, in order, skipping those other hosts
+        hold.
+        """
+        claimed: List[str] = []
+        for filename in filenames:
+            if len(claimed) >= limit:
+                break
+            if self.claim(filename):
+                claimed.append(filename)
+        return claimed
+
+    def release(self, filename: str) -> None:
+        path = self._claim_path(filename)
+        with self.lock:
+            self.held.discard(filename)
+        if self._owner_of(path) == self.owner:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def is_claimed(self, filename: str) -> bool:
+        """
+        True if some host holds a live claim on filename.
+        """
+        try:
+            return not self._expired(self._claim_path(filename))
+        except FileNotFoundError:
+            return False
+
+    def heartbeat(self) -> None:
+        """
+        Renew this host's claims, dropping those another host took over
+        (and, with release_moved, those whose recordings have been moved
+        away).
+        """
+        with self.lock:
+            held = list(self.held)
+        for filename in held:
+            path = self._claim_path(filename)
+            if self.release_moved and not os.path.exists(os.path.join(self.directory, filename)):
+                self.release(filename)
+            elif self._owner_of(path) != self.owner:
+                with self.lock:
+                    self.held.discard(filename)
+                logging.warning(f"Lost the claim on {filename} (lease expired)")
+            else:
+                os.utime(path)
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except OSError as e:
+                logging.error(f"Claim heartbeat failed: {str(e)}")
+
+    def start(self) -> "LeaseManager":
+        self.thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+        self.thread.start()
+        logging.info(f"Claiming recordings in {self.directory} as {self.owner}")
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the heartbeat and hand back every claim still held.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            held = list(self.held)
+        for filename in held:
+            self.release(filename)
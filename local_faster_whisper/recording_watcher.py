@@ -0,0 +1,173 @@
+# pyre-strict
+"""
+Watcher behind the API-based scripts' --watch mode; the local_faster_whisper
+watcher has its own pipeline in handler.py. watchdog is only needed here, so
+the scripts import this module only when --watch is given.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from recording_leases import LeaseManager
+
+Signature = Tuple[int, float]
+
+
+class RecordingWatcher(FileSystemEventHandler):
+    """
+    Watches a recordings directory (not its subdirectories, where processed
+    recordings go) and calls process(filename) once for every .mp3 that has
+    finished being written. A file is finished when its writer closes it
+    (inotify close-after-write) or, where close events are not available,
+    once its size and modification time have not changed for
+    settle_seconds. process() runs on the thread that calls run(), one file
+    at a time, so callers can keep using their SQLite connections.
+
+    With leases, several hosts can watch the same shared directory: a
+    recording is only processed by the host that claims it, and the
+    directory is rescanned every lease period for recordings whose owner
+    died before finishing them.
+    """
+    def __init__(self, directory: str, process: Callable[[str], Any], settle_seconds: float = 2.0,
+                 poll_seconds: float = 0.5, leases: Optional[LeaseManager] = None) -> None:
+        super().__init__()
+        self.directory = os.path.abspath(directory)
+        self.process = process
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.leases = leases
+        # path -> (size, mtime) and when that signature was first seen
+        self.pending: Dict[str, Tuple[Optional[Signature], float]] = {}
+        self.queued: Set[str] = set()
+        self.ready: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.observer = Observer()
+        self.observer.schedule(self, self.directory, recursive=False)
+
+    def _is_recording(self, path: str) -> bool:
+        return path.endswith(".mp3") and os.path.dirname(os.path.abspath(path)) == self.directory
+
+    def _track(self, path: str) -> None:
+        if self._is_recording(path):
+            with self.lock:
+                if path not in self.queued:
+                    self.pending[path] = (None, time.monotonic())
+
+    def _finish(self, path: str) -> None:
+        with self.lock:
+            self.pending.pop(path, None)
+            if path in self.queued:
+                return
+            self.queued.add(path)
+        self.ready.put(path)
+
+    def on_created(self, event: Any) -> None:
+        if not event.is_directory:
+            self._track(os.path.abspath(event.src_path))
+
+    def on_modified(self, event: Any) -> None:
+        if not event.is_directory:
+            self._track(os.path.abspath(event.src_path))
+
+    def on_moved(self, event: Any) -> None:
+        # Recorders that write to a temporary name and rename when done
+        if not event.is_directory and self._is_recording(event.dest_path):
+            self._finish(os.path.abspath(event.dest_path))
+
+    def on_closed(self, event: Any) -> None:
+        if not event.is_directory and self._is_recording(event.src_path):
+            self._finish(os.path.abspath(event.src_path))
+
+    def _poll(self) -> None:
+        """
+        Fallback write-completion check for files that get no close event.
+        """
+        last_rescan = time.monotonic()
+        while not self.stopped.wait(self.poll_seconds):
+            now = time.monotonic()
+            if self.leases is not None and now - last_rescan >= self.leases.lease_seconds:
+                last_rescan = now
+                self._rescan()
+            with self.lock:
+                candidates = list(self.pending.items())
+            for path, (signature, since) in candidates:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    with self.lock:
+                        self.pending.pop(path, None)
+                    continue
+                current = (stat.st_size, stat.st_mtime)
+                if current != signature:
+                    with self.lock:
+                        if path in self.pending:
+                            self.pending[path] = (current, now)
+                elif now - since >= self.settle_seconds:
+                    self._finish(path)
+
+    def _rescan(self) -> None:
+        for filename in sorted(os.listdir(self.directory)):
+            self._track(os.path.join(self.directory, filename))
+
+    def start(self) -> None:
+        """
+        Start watching, and queue the recordings already in the directory
+        (anything that arrived while no watcher was running).
+        """
+        self.observer.start()
+        threading.Thread(target=self._poll, name="write-completion", daemon=True).start()
+        if self.leases is not None:
+            self.leases.start()
+        self._rescan()
+        logging.info(f"Watching {self.directory} for new recordings")
+
+    def run(self) -> None:
+        """
+        Start watching and process finished recordings on this thread until
+        stop() is called.
+        """
+        self.start()
+        while True:
+            path = self.ready.get()
+            if path is None:
+                return
+            with self.lock:
+                self.queued.discard(path)
+            filename = os.path.basename(path)
+            if self.leases is not None and not self.leases.claim(filename):
+                # Another host has it
+                continue
+            try:
+                # Checked after claiming: the previous owner may just have finished it
+                if os.path.exists(path):
+                    self.process(filename)
+            except Exception as e:
+                logging.error(f"Failed to process {path}: {str(e)}")
+            finally:
+                if self.leases is not None:
+                    self.leases.release(filename)
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.observer.stop()
+        self.observer.join()
+        if self.leases is not None:
+            self.leases.stop()
+        self.ready.put(None)
+
+    def run_forever(self) -> None:
+        """
+        run() until interrupted with CTRL-C.
+        """
+        try:
+            self.run()
+        except KeyboardInterrupt:
+            logging.info("Stopping watch mode")
+            self.stop()
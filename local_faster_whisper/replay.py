@@ -0,0 +1,313 @@
+# pyre-strict
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from scheduler import percentile
+from transcript_feed import DEFAULT_FEED_SOCKET, MAX_EVENT_BYTES
+from utils import parse_recording_timestamp
+
+# Capacity testing: re-emits historical recordings into a watched directory on
+# their original schedule (sped up) and measures how long the pipeline takes
+# to save each transcript.
+
+DEFAULT_CHUNK_BYTES: int = 16384
+
+
+def load_recordings(source: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[float, str]]:
+    """
+    (unixtime, path) of every timestamped .mp3 under source, oldest first.
+    start and end ("20231001_173000") limit the replay to a time window.
+    """
+    recordings: List[Tuple[float, str]] = []
+    for root, _, files in os.walk(source):
+        for filename in files:
+            stamp = parse_recording_timestamp(filename)
+            if not filename.endswith(".mp3") or stamp is None:
+                continue
+            if (start and filename[:15] < start) or (end and filename[:15] > end):
+                continue
+            recordings.append((time.mktime(stamp), os.path.join(root, filename)))
+    return sorted(recordings)
+
+
+def schedule(recordings: List[Tuple[float, str]], speed: float) -> List[Tuple[float, str]]:
+    """
+    (seconds after the replay starts, path) for each recording: the original
+    spacing divided by speed, or everything at once when speed is 0 (burst).
+    """
+    if not recordings:
+        return []
+    first = recordings[0][0]
+    return [((unixtime - first) / speed if speed > 0 else 0.0, path) for unixtime, path in recordings]
+
+
+def write_like_sdrtrunk(source: str, target: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                        chunk_interval: float = 0.05) -> None:
+    """
+    Copies source to target the way SDRTrunk records a call: the file is
+    created, grows chunk by chunk while the call is in progress, then closed.
+    """
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        while True:
+            chunk = src.read(chunk_bytes)
+            if not chunk:
+                break
+            dst.write(chunk)
+            dst.flush()
+            time.sleep(chunk_interval)
+
+
+class LatencyTracker:
+    """
+    When each replayed recording arrived (was closed) and when its
+    transcript was saved. A fast pipeline can save a transcript before the
+    writer has recorded the arrival, so completions are kept for any
+    filename and matched to arrivals when reading.
+    """
+    def __init__(self) -> None:
+        self.arrivals: Dict[str, float] = {}
+        self.completions: Dict[str, float] = {}
+        self.condition = threading.Condition()
+
+    def arrived(self, filename: str) -> None:
+        with self.condition:
+            self.arrivals[filename] = time.time()
+
+    def completed(self, filename: str) -> None:
+        with self.condition:
+            self.completions.setdefault(filename, time.time())
+            self.condition.notify_all()
+
+    def outstanding(self) -> List[str]:
+        with self.condition:
+            return [filename for filename in self.arrivals if filename not in self.completions]
+
+    def latencies(self) -> List[Tuple[str, float, float]]:
+        """
+        (filename, arrival, completion) of each replayed recording with a
+        saved transcript, in arrival order. A completion logged before its
+        arrival counts as arriving and completing at once.
+        """
+        with self.condition:
+            matched = [(filename, arrived, max(arrived, self.completions[filename]))
+                       for filename, arrived in self.arrivals.items() if filename in self.completions]
+        return sorted(matched, key=lambda item: item[1])
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait until every arrived recording has its transcript. False on
+        timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while any(filename not in self.completions for filename in self.arrivals):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+
+class FeedListener:
+    """
+    Detects saved transcripts from the events pipelines publish to the
+    transcript feed socket (the watcher and process_recordings.py both do),
+    by binding that socket in place of a feed server.
+    """
+    def __init__(self, tracker: LatencyTracker, socket_path: str = DEFAULT_FEED_SOCKET) -> None:
+        self.tracker = tracker
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                    listening = True
+                except OSError:
+                    listening = False
+            if listening:
+                raise RuntimeError(f"A feed server is listening on {socket_path}; stop it or use --detect sidecar")
+            os.remove(socket_path)
+        self.receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver.bind(socket_path)
+
+    def start(self) -> "FeedListener":
+        threading.Thread(target=self._receive, name="replay-feed", daemon=True).start()
+        return self
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                data = self.receiver.recv(MAX_EVENT_BYTES)
+            except OSError:
+                return
+            try:
+                filename = json.loads(data).get("filename")
+            except (ValueError, AttributeError):
+                continue
+            if filename:
+                self.tracker.completed(filename)
+
+    def stop(self) -> None:
+        self.receiver.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class SidecarScanner:
+    """
+    Detects saved transcripts by looking for <recording>.txt anywhere under
+    the target directory, for pipelines that write sidecar files but do not
+    publish to the feed (the simplified scripts).
+    """
+    def __init__(self, tracker: LatencyTracker, directory: str, poll_seconds: float = 0.25) -> None:
+        self.tracker = tracker
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self.stopped = threading.Event()
+
+    def start(self) -> "SidecarScanner":
+        threading.Thread(target=self._scan, name="replay-sidecars", daemon=True).start()
+        return self
+
+    def _scan(self) -> None:
+        while not self.stopped.wait(self.poll_seconds):
+            outstanding = {filename[:-len(".mp3")] + ".txt": filename for filename in self.tracker.outstanding()}
+            if not outstanding:
+                continue
+            for _, _, files in os.walk(self.directory):
+                for name in files:
+                    if name in outstanding:
+                        self.tracker.completed(outstanding[name])
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+def replay(plan: List[Tuple[float, str]], target: str, tracker: LatencyTracker,
+           chunk_bytes: int = DEFAULT_CHUNK_BYTES, chunk_interval: float = 0.05) -> float:
+    """
+    Emits each recording into target at its scheduled offset, overlapping
+    calls written concurrently. Returns how long emitting took.
+    """
+    started = time.monotonic()
+    writers: List[threading.Thread] = []
+
+    def emit(path: str) -> None:
+        filename = os.path.basename(path)
+        write_like_sdrtrunk(path, os.path.join(target, filename), chunk_bytes, chunk_interval)
+        tracker.arrived(filename)
+
+    for offset, path in plan:
+        delay = started + offset - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        writer = threading.Thread(target=emit, args=(path,), daemon=True)
+        writer.start()
+        writers.append(writer)
+    for writer in writers:
+        writer.join()
+    return time.monotonic() - started
+
+
+def summarize(tracker: LatencyTracker, emit_seconds: float) -> Dict[str, Any]:
+    """
+    Latency percentiles and throughput of a replay. The pipeline kept up if
+    little was left waiting when emitting ended and latency did not keep
+    growing over the run; if it did not, completed_per_minute is what it
+    can sustain.
+    """
+    with tracker.condition:
+        arrivals = sorted(tracker.arrivals.items(), key=lambda item: item[1])
+    matched = tracker.latencies()
+    latencies = [completed - arrived for _, arrived, completed in matched]
+    summary: Dict[str, Any] = {
+        "emitted": len(arrivals),
+        "completed": len(latencies),
+        "missing": len(arrivals) - len(latencies),
+        "emit_seconds": round(emit_seconds, 2),
+    }
+    if not latencies:
+        return summary
+    first_arrival = arrivals[0][1]
+    emit_end = arrivals[-1][1]
+    last_completion = max(completed for _, _, completed in matched)
+    third = max(1, len(latencies) // 3)
+    early, late = percentile(latencies[:third], 0.5), percentile(latencies[-third:], 0.5)
+    backlog = len(arrivals) - sum(1 for _, _, completed in matched if completed <= emit_end)
+    summary.update({
+        "latency_p50": round(percentile(latencies, 0.50), 3),
+        "latency_p95": round(percentile(latencies, 0.95), 3),
+        "latency_p99": round(percentile(latencies, 0.99), 3),
+        "latency_max": round(max(latencies), 3),
+        "offered_per_minute": round(60 * len(arrivals) / (emit_end - first_arrival), 1)
+        if emit_end > first_arrival else None,
+        "completed_per_minute": round(60 * len(latencies) / (last_completion - first_arrival), 1)
+        if last_completion > first_arrival else None,
+        "backlog_at_end": backlog,
+        "latency_growth": round(late / early, 2) if early > 0 else None,
+    })
+    summary["kept_up"] = (summary["missing"] == 0 and backlog <= max(2, len(arrivals) // 20)
+                          and (early <= 0 or late <= 2 * early + 1.0))
+    return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = [f"{key:>22}: {value}" for key, value in summary.items()]
+    if "kept_up" in summary:
+        lines.append("Kept up with the offered load." if summary["kept_up"] else
+                     f"Fell behind: sustainable throughput is about {summary['completed_per_minute']} recordings/minute.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Replay historical recordings into a watched directory "
+                                                 "and measure end-to-end transcription latency")
+    parser.add_argument("source", type=str, help="Directory of historical recordings (searched recursively)")
+    parser.add_argument("target", type=str, help="Recordings directory the pipeline under test watches")
+    parser.add_argument("--speed", type=str, default="1",
+                        help="Speed-up over the original timing, e.g. 1 or 10, or 'burst' for everything at once")
+    parser.add_argument("--start", type=str, help="Only recordings from this time on (20231001_170000)")
+    parser.add_argument("--end", type=str, help="Only recordings up to this time (20231001_190000)")
+    parser.add_argument("--detect", choices=["feed", "sidecar"], default="feed",
+                        help="Detect saved transcripts from feed events or from .txt files under the target")
+    parser.add_argument("--feed-socket", type=str, default=Config.FEED_SOCKET or DEFAULT_FEED_SOCKET,
+                        help="Feed socket the pipeline publishes to (TRANSCRIPT_FEED_SOCKET)")
+    parser.add_argument("--drain", type=float, default=300.0,
+                        help="Seconds to wait for outstanding transcripts after the last recording")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES, help="Bytes per write")
+    parser.add_argument("--chunk-interval", type=float, default=0.05, help="Seconds between writes")
+    parser.add_argument("--json", type=str, help="Also write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    speed = 0.0 if args.speed == "burst" else float(args.speed)
+    plan = schedule(load_recordings(args.source, args.start, args.end), speed)
+    if not plan:
+        parser.error(f"no timestamped recordings in {args.source}")
+    os.makedirs(args.target, exist_ok=True)
+
+    latency_tracker = LatencyTracker()
+    detector = (FeedListener(latency_tracker, args.feed_socket) if args.detect == "feed"
+                else SidecarScanner(latency_tracker, args.target)).start()
+    logging.info(f"Replaying {len(plan)} recordings over {plan[-1][0]:.0f}s into {args.target}")
+    try:
+        emitted_in = replay(plan, args.target, latency_tracker, args.chunk_bytes, args.chunk_interval)
+        if not latency_tracker.wait(args.drain):
+            logging.warning(f"{len(latency_tracker.outstanding())} transcripts still missing after {args.drain}s")
+    finally:
+        detector.stop()
+
+    replay_summary = summarize(latency_tracker, emitted_in)
+    print(format_summary(replay_summary))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as out:
+            json.dump(replay_summary, out, indent=2)
@@ -0,0 +1,188 @@
+# pyre-strict
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from config import Config
+from utils import extract_talkgroup_id
+
+
+def talkgroup_priority(filename: str) -> int:
+    """
+    Returns the configured priority for the talkgroup in the filename.
+    Lower numbers are served first.
+    """
+    talkgroup_id = extract_talkgroup_id(filename)
+    return Config.TALKGROUP_PRIORITIES.get(talkgroup_id, Config.DEFAULT_PRIORITY)
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of the given samples (0.0 if empty).
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Job:
+    """
+    A queued unit of work with the bookkeeping needed for latency stats.
+    """
+    def __init__(self, func: Callable[..., Any], args: Tuple[Any, ...], priority: int, duration: float,
+                 pack_key: Optional[Hashable] = None) -> None:
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.duration = duration
+        self.pack_key = pack_key
+        self.enqueued_at: float = time.monotonic()
+
+
+class PriorityScheduler:
+    """
+    Worker pool that serves jobs by talkgroup priority, shortest job first
+    within a priority, with linear aging so low-priority work cannot starve.
+
+    A job's score is priority * PRIORITY_STEP_SECONDS + duration and drops by
+    AGING_RATE for every second it waits. Since all pending jobs age at the
+    same rate, ordering by score + AGING_RATE * enqueue_time is stable and a
+    plain heap is enough.
+
+    With a batch_func and PACKING_ENABLED, a worker taking a job that has a
+    pack_key also takes other queued jobs with the same key (up to
+    PACK_MAX_CLIPS / PACK_MAX_SECONDS) and hands all their args to
+    batch_func in one call. Packing therefore only happens under backlog.
+    """
+    def __init__(self, max_workers: int,
+                 batch_func: Optional[Callable[[List[Tuple[Any, ...]]], None]] = None) -> None:
+        self._batch_func = batch_func
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._wait_times: Dict[int, Deque[float]] = {}
+        self._latencies: Dict[int, Deque[float]] = {}
+        self._workers: List[threading.Thread] = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker, name=f"transcription-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, func: Callable[..., Any], *args: Any, priority: int, duration: float,
+               pack_key: Optional[Hashable] = None) -> None:
+        """
+        Queue func(*args) with the given priority and expected audio duration.
+        Jobs sharing a pack_key may be run together through batch_func.
+        """
+        job = Job(func, args, priority, duration, pack_key)
+        key = priority * Config.PRIORITY_STEP_SECONDS + duration + Config.AGING_RATE * job.enqueued_at
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            heapq.heappush(self._heap, (key, next(self._counter), job))
+            self._condition.notify()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def pending_by_priority(self) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        with self._condition:
+            for _, _, job in self._heap:
+                counts[job.priority] = counts.get(job.priority, 0) + 1
+        return counts
+
+    def _next_jobs(self) -> List[Job]:
+        with self._condition:
+            while not self._heap and not self._shutdown:
+                self._condition.wait()
+            if not self._heap:
+                return []
+            head = heapq.heappop(self._heap)[2]
+            if self._batch_func is None or head.pack_key is None or not Config.PACKING_ENABLED:
+                return [head]
+            return [head] + self._take_packable(head)
+
+    def _take_packable(self, head: Job) -> List[Job]:
+        """
+        Remove and return queued jobs that can share a call with head, in
+        queue order. Caller holds the condition.
+        """
+        taken: List[Job] = []
+        total = head.duration
+        for entry in sorted(self._heap):
+            job = entry[2]
+            if len(taken) + 1 >= Config.PACK_MAX_CLIPS:
+                break
+            if job.pack_key == head.pack_key and total + job.duration <= Config.PACK_MAX_SECONDS:
+                taken.append(job)
+                total += job.duration
+        if taken:
+            ids = {id(job) for job in taken}
+            self._heap = [entry for entry in self._heap if id(entry[2]) not in ids]
+            heapq.heapify(self._heap)
+        return taken
+
+    def _worker(self) -> None:
+        while True:
+            jobs = self._next_jobs()
+            if not jobs:
+                return
+            started = time.monotonic()
+            try:
+                if len(jobs) == 1:
+                    jobs[0].func(*jobs[0].args)
+                else:
+                    self._batch_func([job.args for job in jobs])  # pyre-ignore[29]
+            except Exception as e:
+                logging.error(f"Scheduled job failed: {str(e)}")
+            finished = time.monotonic()
+            for job in jobs:
+                self._record(job.priority, started - job.enqueued_at, finished - job.enqueued_at)
+
+    def _record(self, priority: int, wait: float, latency: float) -> None:
+        with self._condition:
+            if priority not in self._latencies:
+                self._wait_times[priority] = deque(maxlen=Config.LATENCY_SAMPLE_SIZE)
+                self._latencies[priority] = deque(maxlen=Config.LATENCY_SAMPLE_SIZE)
+            self._wait_times[priority].append(wait)
+            self._latencies[priority].append(latency)
+
+    def latency_percentiles(self) -> Dict[int, Dict[str, float]]:
+        """
+        Queue wait and end-to-end latency percentiles (seconds) per priority,
+        over the most recent LATENCY_SAMPLE_SIZE jobs.
+        """
+        with self._condition:
+            snapshot = {p: (list(self._wait_times[p]), list(self._latencies[p])) for p in self._latencies}
+        stats: Dict[int, Dict[str, float]] = {}
+        for priority, (waits, latencies) in sorted(snapshot.items()):
+            stats[priority] = {
+                "count": float(len(latencies)),
+                "wait_p50": percentile(waits, 0.50),
+                "wait_p95": percentile(waits, 0.95),
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+            }
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting work. Workers drain the remaining queue before exiting.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
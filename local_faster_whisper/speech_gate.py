@@ -0,0 +1,65 @@
+# pyre-strict
+from typing import Tuple
+
+import numpy as np
+
+from config import Config
+
+# pyre-ignore[21]: No type hints from 3rd party library
+import faster_whisper
+
+SAMPLE_RATE: int = 16000
+
+
+def decode_samples(path: str) -> np.ndarray:
+    """
+    Decode an audio file to 16 kHz mono float32 samples.
+    """
+    return faster_whisper.decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+
+def frame_features(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split samples into frames and compute per-frame level (dBFS), spectral
+    flatness and tonality (share of band energy held by the strongest bins).
+    Only the radio voice band (SPEECH_BAND_HZ) is considered for the spectral
+    features.
+    """
+    frame_length = int(sample_rate * Config.SPEECH_FRAME_MS / 1000)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    level_db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_length), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(frame_length, d=1.0 / sample_rate)
+    low, high = Config.SPEECH_BAND_HZ
+    band = spectrum[:, (freqs >= low) & (freqs <= high)] + 1e-12
+
+    flatness = np.exp(np.mean(np.log(band), axis=1)) / np.mean(band, axis=1)
+    peak_bins = min(Config.SPEECH_TONE_BINS, band.shape[1])
+    strongest = np.sort(band, axis=1)[:, -peak_bins:]
+    tonality = np.sum(strongest, axis=1) / np.sum(band, axis=1)
+    return level_db, flatness, tonality
+
+
+def speech_fraction(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> float:
+    """
+    Estimate the fraction of frames that look like speech. A frame counts as
+    speech when it is loud enough, not noise-like (low spectral flatness) and
+    not a steady tone (energy not concentrated in a few bins).
+    """
+    level_db, flatness, tonality = frame_features(samples, sample_rate)
+    if len(level_db) == 0:
+        return 0.0
+    speech = (
+        (level_db > Config.SPEECH_MIN_LEVEL_DB)
+        & (flatness < Config.SPEECH_MAX_FLATNESS)
+        & (tonality < Config.SPEECH_MAX_TONALITY)
+    )
+    return float(np.mean(speech))
+
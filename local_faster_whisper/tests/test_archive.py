@@ -0,0 +1,62 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+from archive import INDEX_SUFFIX, Archiver, read_member, read_recording, split_reference
+
+OLD = ["20200101_080000Name__TO_41003_FROM_1.mp3", "20200101_093000Name__TO_41003_FROM_2.mp3",
+       "20200102_080000Name__TO_41003_FROM_3.mp3"]
+NEW = "29990101_080000Name__TO_41003_FROM_4.mp3"
+
+@pytest.fixture
+def recordings(tmp_path):
+    talkgroup = tmp_path / "41003"
+    talkgroup.mkdir()
+    database = str(tmp_path / "recordings.db")
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE TABLE recordings (filename TEXT, filepath TEXT)")
+    for i, name in enumerate(OLD + [NEW]):
+        path = talkgroup / name
+        path.write_bytes(bytes([i]) * 5000)
+        path.with_suffix(".txt").write_text(f"transcript {i} " * 50)
+        conn.execute("INSERT INTO recordings VALUES (?, ?)", (name, str(path)))
+    conn.commit()
+    conn.close()
+    return tmp_path, database
+
+def test_archives_old_recordings_per_day(recordings):
+    root, database = recordings
+    archiver = Archiver(str(root), older_than_days=30, database=database)
+    assert archiver.run() == 3
+    archiver.close()
+    bundle = root / "archive" / "41003" / "41003-20200101.zip"
+    assert bundle.exists() and (root / "archive" / "41003" / ("41003-20200101.zip" + INDEX_SUFFIX)).exists()
+    assert not (root / "41003" / OLD[0]).exists()
+    assert (root / "41003" / NEW).exists()
+    with sqlite3.connect(database) as conn:
+        paths = dict(conn.execute("SELECT filename, filepath FROM recordings"))
+    assert paths[OLD[1]] == f"{bundle}#{OLD[1]}"
+    assert read_recording(paths[OLD[1]]) == bytes([1]) * 5000
+    assert read_recording(paths[NEW]) == bytes([3]) * 5000
+    assert read_member(str(bundle), OLD[0].replace(".mp3", ".txt")) == ("transcript 0 " * 50).encode()
+
+def test_reader_does_not_parse_the_zip(recordings):
+    root, _ = recordings
+    Archiver(str(root), older_than_days=30).run()
+    with patch("zipfile.ZipFile", side_effect=AssertionError("central directory read")):
+        assert read_recording(f"{root}/archive/41003/41003-20200102.zip#{OLD[2]}") == bytes([2]) * 5000
+
+def test_rerun_after_interruption_is_idempotent(recordings):
+    root, database = recordings
+    archiver = Archiver(str(root), older_than_days=30, database=database)
+    # Bundle written but the loose files were never removed
+    with patch("os.remove"):
+        archiver.run()
+    assert (root / "41003" / OLD[0]).exists()
+    assert archiver.run() == 3
+    assert not (root / "41003" / OLD[0]).exists()
+    assert read_member(str(root / "archive" / "41003" / "41003-20200101.zip"), OLD[0]) == bytes([0]) * 5000
+
+def test_split_reference():
+    assert split_reference("/a/b.zip#c.mp3") == ("/a/b.zip", "c.mp3")
+    assert split_reference("/a/b/c.mp3") == ("/a/b/c.mp3", None)
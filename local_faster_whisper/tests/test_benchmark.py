@@ -0,0 +1,31 @@
+from unittest.mock import MagicMock, patch
+
+from benchmark import format_table, load_dataset, run_preset, word_error_rate
+
+def test_word_error_rate():
+    assert word_error_rate("Unit 12 is 10-8", "unit 12, is 10-8.") == 0.0
+    assert word_error_rate("unit twelve en route", "unit twelve in route") == 0.25
+    assert word_error_rate("copy", "") == 1.0
+    assert word_error_rate("", "") == 0.0
+
+def test_load_dataset_skips_missing_references(tmp_path):
+    (tmp_path / "a.mp3").write_bytes(b"")
+    (tmp_path / "a.ref.txt").write_text("engine one responding\n")
+    (tmp_path / "b.mp3").write_bytes(b"")
+    assert load_dataset(str(tmp_path), ".ref.txt") == [(str(tmp_path / "a.mp3"), "engine one responding")]
+
+def test_run_preset_reports_measurements():
+    info = MagicMock(duration=10.0)
+    # run_preset reconfigures Config for its own process; restore it afterwards
+    with patch("faster_whisper.WhisperModel") as mock_model, \
+            patch.multiple("config.Config", DEVICE="cuda", MODEL_PROFILES={}, DEFAULT_MODEL_PROFILE="default",
+                           TALKGROUP_MODELS={}, PRIORITY_MODELS={}):
+        mock_model.return_value.transcribe.return_value = ([MagicMock(text="engine one"), MagicMock(text="responding")], info)
+        result = run_preset("fast", [("/fake/a.mp3", "engine one responding")], "tiny", "cpu", "int8")
+        assert mock_model.return_value.transcribe.call_args.kwargs["beam_size"] == 1
+    assert result["files"] == 1
+    assert result["wer"] == 0.0
+    assert result["audio_seconds"] == 10.0
+    assert result["rtf"] > 0.0
+    assert result["peak_rss_mb"] > 0.0
+    assert "fast" in format_table([result])
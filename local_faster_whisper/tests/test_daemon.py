@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from daemon import TranscriptionDaemon
+from daemon_client import DaemonError, TranscriptionClient
+from transcriber import RemoteTranscriber
+
+@pytest.fixture
+def daemon():
+    # Unix socket paths are length-limited, so avoid pytest's long tmp_path
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "transcriber.sock")
+    transcriber = MagicMock()
+    transcriber.transcribe_file.side_effect = lambda path: json.dumps({"text": f"heard {os.path.basename(path)}"})
+    transcriber.throughput.return_value = {}
+    transcriber.registry.loaded.return_value = {}
+    server = TranscriptionDaemon(socket_path, transcriber=transcriber, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown_daemon()
+    os.rmdir(socket_dir)
+
+def test_transcribe_through_daemon(daemon, tmp_path):
+    recording = tmp_path / "20231001_173024Name__TO_41003_FROM_1612266.mp3"
+    recording.write_bytes(b"not really audio")
+    client = TranscriptionClient(daemon.socket_path)
+    assert client.available()
+    assert client.transcribe(str(recording)) == f"heard {recording.name}"
+    assert client.status()["pending"] == 0
+
+def test_daemon_reports_errors(daemon, tmp_path):
+    client = TranscriptionClient(daemon.socket_path)
+    with pytest.raises(DaemonError):
+        client.transcribe(str(tmp_path / "missing.mp3"))
+    with pytest.raises(DaemonError):
+        client.request({"op": "bogus"})
+
+def test_client_without_daemon(tmp_path):
+    assert not TranscriptionClient(str(tmp_path / "none.sock")).available()
+
+def test_remote_transcriber_saves_like_the_local_one(daemon, tmp_path):
+    recording = tmp_path / "20231001_173024Name__TO_41003_FROM_1612266.mp3"
+    recording.write_bytes(b"not really audio")
+    remote = RemoteTranscriber(daemon.socket_path, feed=MagicMock())
+    [text] = remote.transcribe_batch([str(recording)])
+    remote.save_transcription(str(recording), text)
+    assert (tmp_path / "41003" / recording.name).exists()
+    assert (tmp_path / "41003" / recording.with_suffix(".txt").name).read_text() == f"heard {recording.name}"
+    assert remote.feed.publish.call_args[0][0]["text"] == f"heard {recording.name}"
+    assert remote.throughput() == {}
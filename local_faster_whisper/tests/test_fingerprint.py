@@ -0,0 +1,38 @@
+import numpy as np
+from fingerprint import FingerprintIndex, fingerprint
+
+def bursts(seed, seconds=6, sample_rate=16000):
+    """
+    Syllable-like harmonic bursts, distinct per seed.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(sample_rate * seconds) / sample_rate
+    samples = np.zeros_like(t)
+    for _ in range(25):
+        start, pitch, length = rng.uniform(0, seconds - 0.3), rng.uniform(100, 250), rng.uniform(0.1, 0.3)
+        mask = (t >= start) & (t < start + length)
+        phase = 2 * np.pi * pitch * (t[mask] - start)
+        for harmonic in range(1, 15):
+            samples[mask] += np.sin(harmonic * phase) * rng.uniform(0.02, 0.1)
+    return samples.astype(np.float32)
+
+def test_silence_has_no_fingerprint():
+    assert fingerprint(np.zeros(16000 * 3, dtype=np.float32), 16000) == []
+
+def test_match_survives_noise_offset_and_sample_rate():
+    audio = bursts(1)
+    index = FingerprintIndex(window_seconds=10.0, min_matches=20)
+    index.add("original", fingerprint(audio, 16000), timestamp=100.0)
+    delayed = np.concatenate([np.zeros(1600, dtype=np.float32), 0.5 * audio])
+    assert index.match(fingerprint(delayed, 16000), timestamp=103.0).key == "original"
+    assert index.match(fingerprint(audio[::2], 8000), timestamp=103.0).key == "original"
+    assert index.match(fingerprint(bursts(2), 16000), timestamp=103.0) is None
+
+def test_entries_expire_outside_window():
+    prints = fingerprint(bursts(1), 16000)
+    index = FingerprintIndex(window_seconds=10.0, min_matches=20)
+    index.add("original", prints, timestamp=100.0)
+    index.set_value("original", "text")
+    assert index.match(prints, timestamp=111.0) is None
+    assert len(index) == 0
+    assert index.value("original") is None
@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock, patch
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from handler import MP3Handler
+from tests.test_fingerprint import bursts
+
+@pytest.fixture
+def handler(tmp_path):
+    with patch("handler.Transcriber") as mock_transcriber:
+        mock_transcriber.return_value = MagicMock()
+        instance = MP3Handler(str(tmp_path / "recordings"), str(tmp_path / "too_short"))
+        yield instance
+        instance.duration_pool.shutdown(wait=True)
+        instance.transcription_queue.shutdown(wait=True)
+
+def test_submit_probe_deduplicates_event_and_rescan(handler):
+    with patch.object(handler, "process_file") as process_file:
+        path = f"{handler.base_directory}/a_TO_1.mp3"
+        assert handler.submit_probe(path)
+        assert not handler.submit_probe(path)
+        handler.duration_pool.shutdown(wait=True)
+    process_file.assert_called_once_with(path)
+
+def test_readiness_milestones(handler):
+    assert handler.readiness() == {"intake_started": None, "model_ready": None, "first_transcription": None}
+    handler._on_model_ready()
+    assert handler.readiness()["model_ready"] >= 0.0
+
+def test_probe_queues_while_model_loads(handler, tmp_path):
+    recording = tmp_path / "recordings" / "20231001_173024Name__TO_41003_FROM_1.mp3"
+    recording.parent.mkdir(exist_ok=True)
+    recording.write_bytes(b"audio")
+    with patch("handler.MP3") as mp3, patch("handler.decode_samples", return_value=np.zeros(16000)), \
+            patch.object(handler, "_has_speech", return_value=True), \
+            patch.object(handler, "_is_duplicate", return_value=False), \
+            patch.object(handler.transcription_queue, "submit") as submit:
+        mp3.return_value.info.length = 12.0
+        handler.process_file(str(recording))
+    submit.assert_called_once()
+    assert submit.call_args.kwargs["duration"] == 12.0
+    handler.transcriber.transcribe_file.assert_not_called()
+
+def write_recordings(handler, *names):
+    paths = []
+    os.makedirs(handler.base_directory, exist_ok=True)
+    for name in names:
+        path = f"{handler.base_directory}/{name}"
+        with open(path, "wb") as f:
+            f.write(b"audio")
+        paths.append(path)
+    return paths
+
+def test_simulcast_duplicate_reuses_transcription(handler):
+    original, simulcast, other = write_recordings(
+        handler, "20231001_173024Name__TO_41003_FROM_1.mp3", "20231001_173025Name__TO_41007_FROM_1.mp3",
+        "20231001_173026Name__TO_41003_FROM_2.mp3")
+    audio = bursts(1)
+    noisy = 0.6 * audio + np.random.default_rng(0).normal(0, 0.01, len(audio)).astype(np.float32)
+    with patch.object(handler, "_enqueue") as enqueue:
+        assert not handler._is_duplicate(original, audio)
+        assert handler._is_duplicate(simulcast, noisy)
+        assert not handler._is_duplicate(other, bursts(2))
+    enqueue.assert_not_called()
+    handler._save(original, json.dumps({"text": "Engine 4 responding"}))
+    saved = {call.args[0]: json.loads(call.args[1]) for call in handler.transcriber.save_transcription.call_args_list}
+    assert saved[simulcast] == {"text": "Engine 4 responding", "duplicate_of": "20231001_173024Name__TO_41003_FROM_1.mp3"}
+
+def test_duplicate_is_queued_when_original_fails(handler):
+    original, simulcast = write_recordings(
+        handler, "20231001_173024Name__TO_41003_FROM_1.mp3", "20231001_173025Name__TO_41007_FROM_1.mp3")
+    audio = bursts(3)
+    handler.transcriber.transcribe_file.side_effect = RuntimeError("model failed")
+    with patch.object(handler, "_enqueue") as enqueue:
+        handler._is_duplicate(original, audio)
+        handler._is_duplicate(simulcast, audio)
+        handler.transcribe_and_move(original)
+    enqueue.assert_called_once_with(simulcast, 6.0)
+
+def test_duplicate_is_queued_when_batched_original_is_gone(handler):
+    original, simulcast, other = write_recordings(
+        handler, "20231001_173024Name__TO_41003_FROM_1.mp3", "20231001_173025Name__TO_41007_FROM_1.mp3",
+        "20231001_173026Name__TO_41003_FROM_2.mp3")
+    audio = bursts(3)
+    handler.transcriber.transcribe_batch.return_value = [json.dumps({"text": "Engine 4 responding"})]
+    with patch.object(handler, "_enqueue") as enqueue:
+        handler._is_duplicate(original, audio)
+        handler._is_duplicate(simulcast, audio)
+        os.remove(original)
+        handler.transcribe_and_move_batch([(original,), (other,)])
+    enqueue.assert_called_once_with(simulcast, 6.0)
+    handler.transcriber.transcribe_batch.assert_called_once_with([other])
+
+def test_batch_skips_recordings_moved_while_waiting_for_their_lock(handler):
+    first, second = write_recordings(
+        handler, "20231001_173024Name__TO_41003_FROM_1.mp3", "20231001_173026Name__TO_41003_FROM_2.mp3")
+    handler.transcriber.transcribe_batch.side_effect = lambda paths: [json.dumps({"text": "Copy"})] * len(paths)
+    lock = handler.file_locks.setdefault(first, threading.Lock())
+    lock.acquire()
+    batch = threading.Thread(target=handler.transcribe_and_move_batch, args=([(first,), (second,)],))
+    batch.start()
+    # transcribe_and_move finishes the recording while the batch waits for it
+    time.sleep(0.1)
+    handler.transcriber.transcribe_batch.assert_not_called()
+    os.remove(first)
+    lock.release()
+    batch.join(5)
+    handler.transcriber.transcribe_batch.assert_called_once_with([second])
+    assert handler.file_locks == {}
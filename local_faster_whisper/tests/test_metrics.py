@@ -0,0 +1,52 @@
+import urllib.request
+
+import pytest
+from metrics import Metric, MetricsRegistry, start_metrics_server
+
+def test_counter_and_gauge_render():
+    registry = MetricsRegistry()
+    rejected = registry.counter("files_rejected_total", "Rejected files")
+    rejected.inc(reason="no_speech")
+    rejected.inc(2, reason="too_short")
+    depth = registry.gauge("queue_depth", "Queue depth")
+    depth.set_function(lambda: 7.0)
+    text = registry.render()
+    assert "# TYPE files_rejected_total counter" in text
+    assert 'files_rejected_total{reason="no_speech"} 1.0' in text
+    assert 'files_rejected_total{reason="too_short"} 2.0' in text
+    assert "queue_depth 7.0" in text
+
+def test_labelled_gauge_callback():
+    registry = MetricsRegistry()
+    rtf = registry.gauge("real_time_factor", "RTF")
+    rtf.set_function(lambda: [({"model": "large-v3/default"}, 12.5)])
+    assert 'real_time_factor{model="large-v3/default"} 12.5' in registry.render()
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("decode_seconds", "Decode time", buckets=(1.0, 5.0))
+    for value in (0.5, 1.0, 3.0, 10.0):
+        histogram.observe(value)
+    text = registry.render()
+    assert 'decode_seconds_bucket{le="1.0"} 2' in text
+    assert 'decode_seconds_bucket{le="5.0"} 3' in text
+    assert 'decode_seconds_bucket{le="+Inf"} 4' in text
+    assert "decode_seconds_sum 14.5" in text
+    assert histogram.count() == 4
+
+def test_metrics_endpoint():
+    server = start_metrics_server(0)
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+        assert "sdrtrunk_files_detected_total" in body
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_metric_types_must_render_samples():
+    class Summary(Metric):
+        kind = "summary"
+
+    with pytest.raises(TypeError):
+        Summary("latency", "Latency")
@@ -0,0 +1,65 @@
+import json
+import os
+import sqlite3
+
+from migrate_layout import JOURNAL_NAME, LayoutMigration
+from transcript_store import SegmentedStore
+
+SHARDED = "{talkgroup}/{year}/{month}/{day}"
+NAMES = ["20231001_173024Name__TO_41003_FROM_1.mp3", "20231002_080000Name__TO_41003_FROM_2.mp3",
+         "20231002_090000Name__TO_52198_FROM_3.mp3"]
+
+def make_tree(root):
+    database = str(root / "recordings.db")
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE TABLE recordings (filename TEXT, filepath TEXT)")
+    for name in NAMES:
+        talkgroup = name.split("TO_")[1].split("_")[0]
+        (root / talkgroup).mkdir(exist_ok=True)
+        path = root / talkgroup / name
+        path.write_bytes(b"audio")
+        path.with_suffix(".txt").write_text("text")
+        conn.execute("INSERT INTO recordings VALUES (?, ?)", (name, str(path)))
+    conn.commit()
+    conn.close()
+    return database
+
+def filepaths(database):
+    with sqlite3.connect(database) as conn:
+        return dict(conn.execute("SELECT filename, filepath FROM recordings"))
+
+def test_migrates_files_sidecars_and_database(tmp_path):
+    database = make_tree(tmp_path)
+    store = SegmentedStore(str(tmp_path / "transcripts"))
+    store.write(str(tmp_path / "41003" / NAMES[0]), "text", {"duplicate_of": "x.mp3"})
+    store.close()
+    migration = LayoutMigration(str(tmp_path), SHARDED, database, str(tmp_path / "transcripts"),
+                                batch_size=2, min_age_seconds=0)
+    assert migration.run() == 3
+    migration.close()
+    target = tmp_path / "41003" / "2023" / "10" / "01" / NAMES[0]
+    assert target.exists() and target.with_suffix(".txt").exists()
+    assert not (tmp_path / "41003" / NAMES[0]).exists()
+    assert filepaths(database)[NAMES[2]] == str(tmp_path / "52198" / "2023" / "10" / "02" / NAMES[2])
+    record = SegmentedStore(str(tmp_path / "transcripts")).record(NAMES[0])
+    assert record["path"] == str(target) and record["duplicate_of"] == "x.mp3"
+    assert not (tmp_path / JOURNAL_NAME).exists()
+    # Running again is a no-op
+    assert LayoutMigration(str(tmp_path), SHARDED, database, min_age_seconds=0).run() == 0
+
+def test_resumes_interrupted_batch(tmp_path):
+    database = make_tree(tmp_path)
+    source = str(tmp_path / "41003" / NAMES[0])
+    target = str(tmp_path / "41003" / "2023" / "10" / "01" / NAMES[0])
+    # Simulate a crash after the file moved but before the database update
+    os.makedirs(os.path.dirname(target))
+    os.rename(source, target)
+    with open(tmp_path / JOURNAL_NAME, "w") as f:
+        f.write(json.dumps({"batch": 1, "moves": [[source, target]]}) + "\n")
+    LayoutMigration(str(tmp_path), SHARDED, database, min_age_seconds=0).run()
+    assert filepaths(database)[NAMES[0]] == target
+    assert os.path.exists(target.replace(".mp3", ".txt"))
+
+def test_skips_recently_moved_files(tmp_path):
+    make_tree(tmp_path)
+    assert list(LayoutMigration(str(tmp_path), SHARDED, min_age_seconds=60).pending_moves()) == []
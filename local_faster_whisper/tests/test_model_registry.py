@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+from model_registry import ModelRegistry, ModelSpec, estimate_memory_mb
+
+PROFILES = {"default": ("large-v3", "float16"), "small": ("small", "int8")}
+
+def test_route_by_talkgroup_and_priority():
+    registry = ModelRegistry(loader=lambda spec: object())
+    with patch.dict("config.Config.MODEL_PROFILES", PROFILES), \
+            patch.dict("config.Config.TALKGROUP_MODELS", {"41003": "small"}), \
+            patch.dict("config.Config.PRIORITY_MODELS", {2: "small"}), \
+            patch.dict("config.Config.TALKGROUP_PRIORITIES", {"52376": 2}):
+        assert registry.route("x_TO_41003_FROM_1.mp3") == ModelSpec("small", "int8")
+        assert registry.route("x_TO_52376_FROM_1.mp3") == ModelSpec("small", "int8")
+        assert registry.route("x_TO_52209_FROM_1.mp3") == ModelSpec("large-v3", "float16")
+
+def test_lazy_load_and_reuse():
+    loads = []
+    registry = ModelRegistry(budget_mb=10000, loader=lambda spec: loads.append(spec) or spec.name)
+    spec = ModelSpec("small", "int8")
+    assert registry.get(spec) == "small/int8"
+    assert registry.get(spec) == "small/int8"
+    assert loads == [spec]
+
+def test_lru_eviction_within_budget():
+    large = ModelSpec("large-v3", "float16")
+    small = ModelSpec("small", "float16")
+    base = ModelSpec("base", "float16")
+    budget = estimate_memory_mb(large) + estimate_memory_mb(small)
+    registry = ModelRegistry(budget_mb=budget, loader=lambda spec: spec.name)
+    registry.get(large)
+    registry.get(small)
+    registry.get(large)  # small is now least recently used
+    registry.get(base)
+    assert list(registry.loaded()) == ["large-v3/float16", "base/float16"]
+
+def test_int8_halves_estimate():
+    assert estimate_memory_mb(ModelSpec("small", "int8")) * 2 == estimate_memory_mb(ModelSpec("small", "float16"))
+
+def test_throughput():
+    registry = ModelRegistry(loader=lambda spec: None)
+    spec = ModelSpec("base", "int8")
+    registry.record(spec, 10.0, 2.0)
+    registry.record(spec, 20.0, 4.0)
+    report = registry.throughput()["base/int8"]
+    assert report["calls"] == 2.0
+    assert report["rtf"] == 5.0
@@ -0,0 +1,41 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from packing import pack_clips, split_by_offsets, timed_words
+from transcriber import Transcriber
+
+def word(start, end, text):
+    return MagicMock(start=start, end=end, word=text)
+
+def test_pack_clips_offsets():
+    clips = [np.ones(16000, dtype=np.float32), np.ones(8000, dtype=np.float32)]
+    packed, offsets = pack_clips(clips, gap_seconds=1.0)
+    assert len(packed) == 16000 + 16000 + 8000
+    assert offsets == [(0.0, 1.0), (2.0, 2.5)]
+    assert not packed[16000:32000].any()
+
+def test_split_by_offsets_uses_midpoints():
+    offsets = [(0.0, 3.0), (4.5, 8.0), (9.5, 12.0)]
+    pieces = [(0.2, 0.6, " Engine"), (0.7, 1.0, " 4"), (3.4, 3.8, " responding."),
+              (4.6, 5.0, " Copy"), (10.0, 10.4, " 10-4")]
+    assert split_by_offsets(pieces, offsets) == ["Engine 4 responding.", "Copy", "10-4"]
+
+def test_timed_words_falls_back_to_segments():
+    with_words = MagicMock(words=[word(0.0, 0.5, " Copy"), word(0.5, 0.9, " that")])
+    without_words = MagicMock(words=None, start=2.0, end=3.0, text=" Stand by")
+    assert timed_words([with_words, without_words]) == [(0.0, 0.5, " Copy"), (0.5, 0.9, " that"), (2.0, 3.0, " Stand by")]
+
+def test_transcribe_batch_splits_per_recording():
+    segments = [MagicMock(words=[word(0.1, 0.4, " Medic"), word(0.4, 0.8, " 2")]),
+                MagicMock(words=[word(2.6, 2.9, " Clear")])]
+    with patch("faster_whisper.WhisperModel") as mock_model, \
+            patch("transcriber.decode_samples", return_value=np.zeros(16000, dtype=np.float32)), \
+            patch("config.Config.PACK_GAP_SECONDS", 1.5):
+        mock_model.return_value.transcribe.return_value = (segments, MagicMock())
+        texts = Transcriber().transcribe_batch(["/a/x_TO_1_FROM_2.mp3", "/a/y_TO_1_FROM_3.mp3"])
+        kwargs = mock_model.return_value.transcribe.call_args.kwargs
+        assert mock_model.return_value.transcribe.call_count == 1
+    assert kwargs["word_timestamps"] is True
+    assert kwargs["condition_on_previous_text"] is False
+    assert [json.loads(t)["text"] for t in texts] == ["Medic 2", "Clear"]
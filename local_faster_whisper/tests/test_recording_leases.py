@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from recording_leases import LeaseManager
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One host draining the directory: claim a batch, "transcribe" and move each recording, release
+WORKER = """
+import os, sys, time
+sys.path.insert(0, {package!r})
+from recording_leases import LeaseManager
+
+directory, log, crash = sys.argv[1], sys.argv[2], sys.argv[3] == "crash"
+leases = LeaseManager(directory, lease_seconds=float(sys.argv[4])).start()
+while True:
+    batch = leases.claim_batch(sorted(f for f in os.listdir(directory) if f.endswith(".mp3")), 3)
+    if not batch:
+        break
+    if crash:
+        os._exit(1)
+    for name in batch:
+        if os.path.exists(os.path.join(directory, name)):
+            time.sleep(0.02)
+            with open(log, "a") as f:
+                f.write(f"{{os.getpid()}} {{name}}\\n")
+            os.rename(os.path.join(directory, name), os.path.join(directory, "done", name))
+        leases.release(name)
+leases.stop()
+""".format(package=PACKAGE_DIRECTORY)
+
+
+def recordings(tmp_path, count):
+    (tmp_path / "done").mkdir()
+    for i in range(count):
+        (tmp_path / f"20231001_1730{i:02d}Fire__TO_41001.mp3").write_bytes(b"call audio")
+
+
+def run_hosts(tmp_path, hosts, mode="work", lease_seconds=30.0):
+    log = tmp_path / "processed.log"
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, str(tmp_path), str(log), mode, str(lease_seconds)])
+               for _ in range(hosts)]
+    assert [worker.wait(30) for worker in workers] == [0 if mode == "work" else 1] * hosts
+    return [line.split() for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def test_hosts_share_the_directory_without_double_processing(tmp_path):
+    recordings(tmp_path, 60)
+    processed = run_hosts(tmp_path, 4)
+    counts = Counter(name for _, name in processed)
+    assert len(counts) == 60 and set(counts.values()) == {1}
+    assert len({pid for pid, _ in processed}) > 1
+    assert os.listdir(tmp_path / ".claims") == []
+    assert len(os.listdir(tmp_path / "done")) == 60
+
+
+def test_claims_of_a_crashed_host_are_taken_over(tmp_path):
+    recordings(tmp_path, 5)
+    run_hosts(tmp_path, 1, mode="crash", lease_seconds=2.0)
+    assert len(os.listdir(tmp_path / ".claims")) == 3
+
+    survivor = LeaseManager(str(tmp_path), lease_seconds=2.0)
+    names = sorted(f for f in os.listdir(tmp_path) if f.endswith(".mp3"))
+    assert survivor.claim_batch(names, 5) == names[3:]
+    time.sleep(2.1)
+    assert survivor.claim_batch(names, 5) == names[:3]
+    assert survivor.held == set(names)
+
+
+def test_heartbeat_keeps_claims_and_notices_losing_them(tmp_path):
+    recordings(tmp_path, 2)
+    first, second = sorted(f for f in os.listdir(tmp_path) if f.endswith(".mp3"))
+    host = LeaseManager(str(tmp_path), lease_seconds=0.3, release_moved=True)
+    other = LeaseManager(str(tmp_path), lease_seconds=0.3)
+    assert host.claim(first) and host.claim(second)
+    assert not other.claim(first) and other.is_claimed(first)
+
+    time.sleep(0.2)
+    host.heartbeat()
+    time.sleep(0.2)
+    assert not other.claim(first)
+
+    # Missed heartbeats: the other host takes the claim over and this one lets go of it
+    time.sleep(0.35)
+    assert other.claim(first)
+    os.rename(tmp_path / second, tmp_path / "done" / second)
+    host.heartbeat()
+    assert host.held == set()
+    assert sorted(os.listdir(tmp_path / ".claims")) == [first + ".claim"]
+    host.stop()
+    assert other.is_claimed(first)
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+import pytest
+from recording_leases import LeaseManager
+from recording_watcher import RecordingWatcher
+
+@pytest.fixture
+def watched(tmp_path):
+    recordings = tmp_path / "recordings"
+    (recordings / "41001").mkdir(parents=True)
+    processed = []
+
+    def process(filename):
+        # Like the scripts, move the recording out of the watched directory
+        processed.append(filename)
+        os.rename(recordings / filename, recordings / "41001" / filename)
+
+    def start(**options):
+        watcher = RecordingWatcher(str(recordings), process, poll_seconds=0.05, **options)
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        started.append((watcher, thread))
+        # Events before the inotify watch is set up would be missed
+        assert wait_for(watcher.observer.is_alive)
+        return watcher
+
+    started = []
+    yield recordings, processed, start
+    for watcher, thread in started:
+        watcher.stop()
+        thread.join(5)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def test_recordings_are_processed_once_written(watched):
+    recordings, processed, start = watched
+    (recordings / "existing.mp3").write_bytes(b"old call")
+    start(settle_seconds=0.5)
+    assert wait_for(lambda: processed == ["existing.mp3"])
+
+    with open(recordings / "new.mp3", "wb") as f:
+        f.write(b"first half")
+        f.flush()
+        time.sleep(0.2)
+        f.write(b"second half")
+        f.flush()
+        time.sleep(0.2)
+        assert processed == ["existing.mp3"]
+    (recordings / "notes.txt").write_text("not a recording")
+    (recordings / "41001" / "moved.mp3").write_bytes(b"already processed")
+    assert wait_for(lambda: processed == ["existing.mp3", "new.mp3"])
+    time.sleep(0.7)
+    assert processed == ["existing.mp3", "new.mp3"]
+
+def test_unchanged_files_settle_without_a_close_event(watched):
+    recordings, processed, start = watched
+    start(settle_seconds=0.3)
+    f = open(recordings / "held-open.mp3", "wb")
+    try:
+        f.write(b"call audio")
+        f.flush()
+        assert wait_for(lambda: processed == ["held-open.mp3"])
+    finally:
+        f.close()
+    time.sleep(0.3)
+    assert processed == ["held-open.mp3"]
+
+def test_renamed_into_place(watched):
+    recordings, processed, start = watched
+    start(settle_seconds=30)
+    (recordings / "renamed.mp3.partial").write_bytes(b"call audio")
+    os.rename(recordings / "renamed.mp3.partial", recordings / "renamed.mp3")
+    assert wait_for(lambda: processed == ["renamed.mp3"])
+
+def test_watchers_sharing_a_directory_process_each_recording_once(watched):
+    recordings, processed, start = watched
+    for i in range(10):
+        (recordings / f"call{i}.mp3").write_bytes(b"call audio")
+    for _ in range(2):
+        start(settle_seconds=0.1, leases=LeaseManager(str(recordings), lease_seconds=5))
+    assert wait_for(lambda: len(processed) >= 10)
+    time.sleep(0.3)
+    assert sorted(processed) == [f"call{i}.mp3" for i in range(10)]
+    assert os.listdir(recordings / ".claims") == []
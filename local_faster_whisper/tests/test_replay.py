@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+
+import pytest
+from recording_watcher import RecordingWatcher
+from replay import (FeedListener, LatencyTracker, SidecarScanner, load_recordings, replay, schedule, summarize,
+                    write_like_sdrtrunk)
+from transcript_feed import FeedPublisher, transcript_event
+
+NAMES = [
+    "20231001_173000Fire_Dispatch__TO_41001_FROM_1610092.mp3",
+    "20231001_173002Fire_Dispatch__TO_41001_FROM_1610051.mp3",
+    "20231001_173003EMS__TO_41003.mp3",
+    "20231001_173010EMS__TO_41003_FROM_1612266.mp3",
+]
+
+
+@pytest.fixture
+def history(tmp_path):
+    source = tmp_path / "history"
+    for i, name in enumerate(NAMES):
+        talkgroup = source / name.split("TO_")[1][:5]
+        talkgroup.mkdir(parents=True, exist_ok=True)
+        (talkgroup / name).write_bytes(bytes([i]) * 5000)
+    (source / "notes.mp3").write_bytes(b"no timestamp")
+    target = tmp_path / "recordings"
+    target.mkdir()
+    return source, target
+
+
+def test_schedule_follows_the_recording_times(history):
+    source, _ = history
+    recordings = load_recordings(str(source))
+    assert [os.path.basename(path) for _, path in recordings] == NAMES
+    assert [offset for offset, _ in schedule(recordings, 10)] == [0.0, 0.2, 0.3, 1.0]
+    assert [offset for offset, _ in schedule(recordings, 0)] == [0.0] * 4
+    window = load_recordings(str(source), start="20231001_173002", end="20231001_173003")
+    assert [os.path.basename(path) for _, path in window] == NAMES[1:3]
+
+
+def test_recordings_are_written_incrementally(history, tmp_path):
+    source, _ = history
+    recording = str(source / "41001" / NAMES[0])
+    sizes = []
+    target = tmp_path / "copy.mp3"
+    writer = threading.Thread(target=write_like_sdrtrunk,
+                              args=(recording, str(target), 1000, 0.05))
+    writer.start()
+    while writer.is_alive():
+        if target.exists():
+            sizes.append(target.stat().st_size)
+        time.sleep(0.01)
+    assert sizes == sorted(sizes) and len({size for size in sizes if size < 5000}) >= 3
+    assert target.read_bytes() == open(recording, "rb").read()
+
+
+def test_replay_measures_a_watcher_pipeline(history):
+    source, target = history
+    tracker = LatencyTracker()
+    scanner = SidecarScanner(tracker, str(target), poll_seconds=0.02).start()
+
+    def process(filename):
+        # A pipeline that needs 0.1s per recording, moving it and writing a sidecar like the scripts
+        time.sleep(0.1)
+        directory = target / filename.split("TO_")[1][:5]
+        directory.mkdir(exist_ok=True)
+        os.rename(target / filename, directory / filename)
+        (directory / filename.replace(".mp3", ".txt")).write_text(str({"text": "Engine 4 responding"}))
+
+    watcher = RecordingWatcher(str(target), process, settle_seconds=5, poll_seconds=0.05)
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        emitted = replay(schedule(load_recordings(str(source)), 10), str(target), tracker, 2000, 0.01)
+        assert tracker.wait(5)
+    finally:
+        watcher.stop()
+        thread.join(5)
+        scanner.stop()
+    summary = summarize(tracker, emitted)
+    assert 1.0 <= emitted < 2.0
+    assert summary["emitted"] == summary["completed"] == 4 and summary["missing"] == 0
+    assert 0.1 <= summary["latency_p50"] < 1.0
+    assert summary["kept_up"]
+
+
+def test_feed_events_complete_recordings(tmp_path):
+    socket_path = str(tmp_path / "feed.sock")
+    tracker = LatencyTracker()
+    listener = FeedListener(tracker, socket_path).start()
+    # A second listener on a live socket would steal the pipeline's events
+    with pytest.raises(RuntimeError):
+        FeedListener(LatencyTracker(), socket_path)
+    publisher = FeedPublisher(socket_path)
+    try:
+        for name in NAMES:
+            tracker.arrived(name)
+        # Events for recordings that were not replayed are ignored
+        for name in NAMES[:3] + ["20231001_090000Other__TO_1.mp3"]:
+            assert publisher.publish(transcript_event(f"/recordings/41001/{name}", "text"))
+        assert not tracker.wait(0.5)
+        assert tracker.outstanding() == [NAMES[3]]
+    finally:
+        publisher.close()
+        listener.stop()
+
+    summary = summarize(tracker, 0.0)
+    assert summary["completed"] == 3 and summary["missing"] == 1 and not summary["kept_up"]
+
+
+def test_transcripts_saved_before_the_arrival_is_logged_still_count():
+    tracker = LatencyTracker()
+    # The pipeline picked the first recording up on close_write, before the writer thread logged it
+    tracker.completed(NAMES[0])
+    assert tracker.wait(0)
+    tracker.arrived(NAMES[0])
+    tracker.arrived(NAMES[1])
+    assert tracker.outstanding() == [NAMES[1]]
+    tracker.completed(NAMES[1])
+    assert tracker.wait(1)
+    summary = summarize(tracker, 1.0)
+    assert summary["completed"] == 2 and summary["missing"] == 0
+    assert summary["latency_max"] < 0.5 and summary["kept_up"]
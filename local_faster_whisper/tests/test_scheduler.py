@@ -0,0 +1,74 @@
+import threading
+import time
+from unittest.mock import patch
+
+from scheduler import PriorityScheduler, percentile, talkgroup_priority
+
+def run_blocked(jobs):
+    """
+    Submits jobs while the single worker is busy, then records execution order.
+    """
+    scheduler = PriorityScheduler(max_workers=1)
+    gate = threading.Event()
+    order = []
+    scheduler.submit(gate.wait, priority=0, duration=0.0)
+    for name, priority, duration in jobs:
+        scheduler.submit(order.append, name, priority=priority, duration=duration)
+    gate.set()
+    scheduler.shutdown(wait=True)
+    return order, scheduler
+
+def test_priority_then_shortest_job_first():
+    order, _ = run_blocked([
+        ("tactical-long", 2, 30.0),
+        ("dispatch-long", 0, 40.0),
+        ("tactical-short", 2, 5.0),
+        ("dispatch-short", 0, 8.0),
+    ])
+    assert order == ["dispatch-short", "dispatch-long", "tactical-short", "tactical-long"]
+
+def test_aging_prevents_starvation():
+    scheduler = PriorityScheduler(max_workers=1)
+    gate = threading.Event()
+    order = []
+    scheduler.submit(gate.wait, priority=0, duration=0.0)
+    with patch("config.Config.AGING_RATE", 1e6):
+        scheduler.submit(order.append, "old-low-priority", priority=2, duration=10.0)
+        time.sleep(0.01)
+        scheduler.submit(order.append, "new-dispatch", priority=0, duration=10.0)
+    gate.set()
+    scheduler.shutdown(wait=True)
+    assert order == ["old-low-priority", "new-dispatch"]
+
+def test_latency_percentiles_per_priority():
+    _, scheduler = run_blocked([("a", 0, 1.0), ("b", 1, 1.0), ("c", 1, 2.0)])
+    stats = scheduler.latency_percentiles()
+    assert stats[0]["count"] == 2.0  # includes the blocking job
+    assert stats[1]["count"] == 2.0
+    assert stats[1]["p95"] >= stats[1]["p50"] >= 0.0
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 0.5) == 2.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 0.95) == 4.0
+
+def test_talkgroup_priority():
+    with patch.dict("config.Config.TALKGROUP_PRIORITIES", {"52198": 0}):
+        assert talkgroup_priority("20230928_171201Name__TO_52198_FROM_1.mp3") == 0
+        assert talkgroup_priority("20230928_171201Name__TO_41003.mp3") == 1
+
+def test_packing_groups_jobs_with_same_key():
+    batches = []
+    scheduler = PriorityScheduler(max_workers=1, batch_func=lambda batch: batches.append([args[0] for args in batch]))
+    gate = threading.Event()
+    singles = []
+    scheduler.submit(gate.wait, priority=0, duration=0.0)
+    with patch("config.Config.PACKING_ENABLED", True):
+        scheduler.submit(singles.append, "a1", priority=1, duration=5.0, pack_key="tg:1")
+        scheduler.submit(singles.append, "b1", priority=1, duration=6.0, pack_key="tg:2")
+        scheduler.submit(singles.append, "a2", priority=1, duration=7.0, pack_key="tg:1")
+        scheduler.submit(singles.append, "long", priority=1, duration=60.0)
+        gate.set()
+        scheduler.shutdown(wait=True)
+    assert batches == [["a1", "a2"]]
+    assert singles == ["b1", "long"]
@@ -0,0 +1,40 @@
+import json
+import os
+
+import numpy as np
+from speech_gate import SAMPLE_RATE, speech_fraction
+from utils import record_rejection
+
+t = np.arange(SAMPLE_RATE * 5) / SAMPLE_RATE
+rng = np.random.default_rng(0)
+
+def speech_like():
+    # Harmonic signal with a wandering pitch, gated by a syllable-rate envelope
+    f0 = 130 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) * (1.0 if 3 <= k <= 15 else 0.3) for k in range(1, 25))
+    envelope = np.clip(np.sin(2 * np.pi * 3 * t), 0, None)
+    return (0.05 * voiced * envelope + 0.001 * rng.standard_normal(len(t))).astype(np.float32)
+
+def test_speech_fraction_detects_speech():
+    assert speech_fraction(speech_like()) > 0.3
+
+def test_speech_fraction_rejects_non_speech():
+    silence = np.zeros(len(t), dtype=np.float32)
+    noise = (0.1 * rng.standard_normal(len(t))).astype(np.float32)
+    tone = (0.3 * np.sin(2 * np.pi * 1000 * t)).astype(np.float32)
+    dual_tone = (0.2 * np.sin(2 * np.pi * 697 * t) + 0.2 * np.sin(2 * np.pi * 1209 * t)).astype(np.float32)
+    for samples in (silence, noise, tone, dual_tone):
+        assert speech_fraction(samples) < 0.05
+
+def test_speech_fraction_empty():
+    assert speech_fraction(np.zeros(10, dtype=np.float32)) == 0.0
+
+def test_record_rejection(tmp_path):
+    record_rejection(str(tmp_path), "a.mp3", "no_speech", "speech_fraction=0.010")
+    record_rejection(str(tmp_path), "b.mp3", "decode_error")
+    with open(os.path.join(str(tmp_path), "rejections.jsonl")) as f:
+        entries = [json.loads(line) for line in f]
+    assert [e["reason"] for e in entries] == ["no_speech", "decode_error"]
+    assert entries[0]["detail"] == "speech_fraction=0.010"
+    assert "detail" not in entries[1]
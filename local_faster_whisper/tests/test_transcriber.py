@@ -37,4 +37,14 @@ def test_save_transcription(tmp_path, transcriber):
         assert open(txt_file).read() == "Transcribed content"
 
         mp3_file = os.path.join(talkgroup_dir, "example_TO_1234.mp3")
-        assert os.path.exists(mp3_file)
\ No newline at end of file
+        assert os.path.exists(mp3_file)
+
+def test_save_transcription_publishes_to_feed(tmp_path, transcriber):
+    transcriber.feed = MagicMock()
+    test_path = os.path.join(str(tmp_path), "20231001_173024Fire__TO_41001_FROM_1610092.mp3")
+    with open(test_path, "w") as f:
+        f.write("fake data")
+    transcriber.save_transcription(test_path, json.dumps({"text": "Engine 4", "duplicate_of": "other.mp3"}))
+    event = transcriber.feed.publish.call_args[0][0]
+    assert event["path"] == os.path.join(str(tmp_path), "41001", os.path.basename(test_path))
+    assert (event["text"], event["talkgroup_id"], event["duplicate_of"]) == ("Engine 4", "41001", "other.mp3")
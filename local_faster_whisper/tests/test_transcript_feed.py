@@ -0,0 +1,59 @@
+import http.client
+import json
+import os
+import time
+
+from transcript_feed import FeedPublisher, FeedServer, TranscriptFeed, transcript_event
+
+NAME = "20231001_173024Fire_Dispatch__TO_41001_FROM_1610092.mp3"
+
+def test_transcript_event_parses_the_recording_name():
+    event = transcript_event(f"/recordings/41001/{NAME}", "Engine 4 responding", {"duplicate_of": "x.mp3"})
+    assert event["talkgroup_id"] == "41001" and event["radio_id"] == "1610092"
+    assert event["unixtime"] == int(time.mktime((2023, 10, 1, 17, 30, 24, 0, 0, -1)))
+    assert event["text"] == "Engine 4 responding" and event["duplicate_of"] == "x.mp3"
+
+def test_filters_replay_and_slow_clients_are_dropped():
+    feed = TranscriptFeed(history_size=10)
+    everything = feed.subscribe(buffer_size=2)
+    fire = feed.subscribe({"41001"}, buffer_size=10)
+    assert feed.publish({"talkgroup_id": "41001"}) == 2
+    assert feed.publish({"talkgroup_id": "52198"}) == 1
+    # The third event overflows the unfiltered client's buffer: it is dropped, the feed carries on
+    assert feed.publish({"talkgroup_id": "41001"}) == 1
+    assert everything.dropped and feed.subscriber_count() == 1
+    assert [fire.next(0)["id"], fire.next(0)["id"], fire.next(0)] == [1, 3, None]
+
+    # A reconnecting client gets what it missed since Last-Event-ID
+    again = feed.subscribe({"41001"}, last_event_id=1)
+    assert again.next(0)["id"] == 3
+
+def test_publisher_without_a_server_does_not_block(tmp_path):
+    publisher = FeedPublisher(str(tmp_path / "nobody.sock"))
+    assert publisher.publish({"filename": NAME}) is False
+    publisher.close()
+
+def test_server_streams_published_transcripts(tmp_path):
+    socket_path = str(tmp_path / "feed.sock")
+    server = FeedServer(TranscriptFeed(), socket_path, 0).start()
+    publisher = FeedPublisher(socket_path)
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("GET", "/events?talkgroup=41001")
+        response = connection.getresponse()
+        assert response.getheader("Content-Type") == "text/event-stream"
+        assert response.readline() == b"retry: 3000\n"
+        deadline = time.monotonic() + 5
+        while server.feed.subscriber_count() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert publisher.publish(transcript_event(NAME.replace("41001", "52198"), "other talkgroup"))
+        assert publisher.publish(transcript_event(NAME, "Engine 4 responding"))
+        lines = [response.readline() for _ in range(4)]
+        assert lines[1:3] == [b"id: 2\n", b"event: transcript\n"]
+        assert json.loads(lines[3][len(b"data: "):])["text"] == "Engine 4 responding"
+        connection.close()
+    finally:
+        publisher.close()
+        server.stop()
+    assert not os.path.exists(socket_path)
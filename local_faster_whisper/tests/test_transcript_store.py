@@ -0,0 +1,51 @@
+import json
+import os
+
+import pytest
+from transcript_store import SegmentedStore, SidecarStore, TranscriptStore, open_store
+
+def test_segmented_store_appends_per_day(tmp_path):
+    store = SegmentedStore(str(tmp_path / "transcripts"))
+    store.write("/rec/41003/20231001_173024Name__TO_41003_FROM_1.mp3", "Engine 4 responding")
+    store.write("/rec/41003/20231002_080000Name__TO_41003_FROM_2.mp3", "Copy", {"duplicate_of": "x.mp3"})
+    segments = sorted(name for name in os.listdir(tmp_path / "transcripts") if name.endswith(".jsonl"))
+    assert segments == ["transcripts-20231001.jsonl", "transcripts-20231002.jsonl"]
+    # Lookups work by path or bare name
+    assert store.read("20231001_173024Name__TO_41003_FROM_1.mp3") == "Engine 4 responding"
+    assert store.record("/elsewhere/20231002_080000Name__TO_41003_FROM_2.mp3")["duplicate_of"] == "x.mp3"
+    assert store.read("20231003_000000Name__TO_1_FROM_2.mp3") is None
+
+def test_rewrite_points_index_at_latest(tmp_path):
+    store = SegmentedStore(str(tmp_path))
+    store.write("/rec/20231001_173024_TO_1.mp3", "first")
+    store.write("/rec/20231001_173024_TO_1.mp3", "second")
+    assert store.read("/rec/20231001_173024_TO_1.mp3") == "second"
+    assert [record["content"] for record in store.records()] == ["second"]
+    store.close()
+    # Index survives reopening
+    assert SegmentedStore(str(tmp_path)).contains("20231001_173024_TO_1.mp3")
+
+def test_export_regenerates_sidecars(tmp_path):
+    recordings = tmp_path / "41003"
+    recordings.mkdir()
+    recording = str(recordings / "20231001_173024_TO_41003.mp3")
+    store = SegmentedStore(str(tmp_path / "transcripts"))
+    store.write(recording, json.dumps({"1610092": "10-4"}))
+    assert not SidecarStore().contains(recording)
+    assert store.export_sidecars() == 1
+    assert SidecarStore().read(recording) == json.dumps({"1610092": "10-4"})
+    assert store.export_sidecars(str(tmp_path / "out")) == 1
+    assert (tmp_path / "out" / "20231001_173024_TO_41003.txt").exists()
+
+def test_sidecars_optional(tmp_path):
+    recording = str(tmp_path / "20231001_173024_TO_41003.mp3")
+    open_store("segmented", str(tmp_path / "transcripts"), sidecars=True).write(recording, "text")
+    assert open(str(tmp_path / "20231001_173024_TO_41003.txt")).read() == "text"
+
+def test_stores_must_implement_read_and_write():
+    class WriteOnlyStore(TranscriptStore):
+        def write(self, recording_path, content, metadata=None):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnlyStore()
@@ -0,0 +1,379 @@
+import array
+import io
+import json
+import sys
+import threading
+import time
+import types
+import wave
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from transcription_backends import (AzureBackend, BackendError, BackendRouter, GoogleBackend, OpenAIBackend,
+                                    TranscriptionBackend, phrase_hints_from_file)
+
+
+class FakeBackend(TranscriptionBackend):
+    def __init__(self, name, seconds=0.0, fail=False, concurrency=1):
+        self.name = name
+        self.seconds = seconds
+        self.fail = fail
+        self.concurrency = concurrency
+        self.calls = []
+
+    def transcribe(self, path, talkgroup_id=None):
+        self.calls.append(path)
+        time.sleep(self.seconds)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return f"{self.name}: {path}"
+
+
+def test_jobs_go_to_the_fastest_backend_until_it_is_busy():
+    slow, fast = FakeBackend("slow", 0.05), FakeBackend("fast", 0.01)
+    router = BackendRouter([slow, fast])
+    # Untried backends are tried first, then the measured latencies decide
+    for i in range(6):
+        router.transcribe(f"{i}.mp3")
+    assert len(slow.calls) == 1 and len(fast.calls) == 5
+
+    # Jobs already queued on the fast backend make the slow one quicker
+    router.stats["fast"].in_flight = 5
+    assert router.choose() is slow
+    fast.concurrency = 4
+    assert router.choose() is fast
+
+
+def test_failing_backend_is_skipped_then_retried_after_cooldown():
+    broken, working = FakeBackend("broken", fail=True), FakeBackend("working", 0.01)
+    router = BackendRouter([broken, working], cooldown_seconds=0.2)
+    assert router.transcribe("a.mp3") == "working: a.mp3"
+    # Still untried-fast on paper, so it gets a second chance, fails again, and sits out
+    router.stats["working"].latency = 1.0
+    assert router.transcribe("b.mp3") == "working: b.mp3"
+    assert len(broken.calls) == 2 and not router.status()["broken"]["healthy"]
+    router.transcribe("c.mp3")
+    assert len(broken.calls) == 2
+
+    time.sleep(0.25)
+    broken.fail = False
+    assert router.transcribe("d.mp3") == "broken: d.mp3"
+    assert router.status()["broken"]["healthy"]
+
+
+def test_error_when_every_backend_fails():
+    router = BackendRouter([FakeBackend("a", fail=True), FakeBackend("b", fail=True)])
+    with pytest.raises(BackendError, match="a is down; b: b is down"):
+        router.transcribe("x.mp3")
+
+
+def test_backends_must_implement_transcribe():
+    class Unfinished(TranscriptionBackend):
+        name = "unfinished"
+
+    with pytest.raises(TypeError):
+        Unfinished()
+
+
+def test_priority_talkgroups_are_hedged():
+    stalled, spare = FakeBackend("stalled", 0.5), FakeBackend("spare", 0.02)
+    router = BackendRouter([stalled, spare], hedge_talkgroups=["41001"], hedge_delay=0.05)
+    router.stats["stalled"].latency = 0.01
+    router.stats["spare"].latency = 0.5
+    try:
+        started = time.monotonic()
+        assert router.transcribe("fire.mp3", "41001") == "spare: fire.mp3"
+        assert time.monotonic() - started < 0.3
+        assert stalled.calls == ["fire.mp3"]
+
+        # Other talkgroups wait for the first choice
+        assert router.transcribe("other.mp3", 52198) == "stalled: other.mp3"
+        assert spare.calls == ["fire.mp3"]
+    finally:
+        router.close()
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body)
+        form = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                for part in message.iter_parts()}
+        self.requests.append((self.headers["Authorization"], form["model"], form.get("prompt"), form["file"]))
+        status, reply = (200, {"text": "Engine 4 responding"}) if form["model"] == b"whisper-1" \
+            else (400, {"error": {"message": "invalid model"}})
+        if form.get("response_format") == b"verbose_json":
+            reply = self.words_per_burst(form["file"])
+        body = json.dumps(reply).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def words_per_burst(upload):
+        # One word per stretch of sound in the uploaded WAV, e.g. "41001-1" for the first, "41001-2" for the next
+        with wave.open(io.BytesIO(upload)) as f:
+            rate = f.getframerate()
+            samples = array.array("h", f.readframes(f.getnframes()))
+        words, start = [], None
+        for i, sample in enumerate(list(samples) + [0]):
+            if sample and start is None:
+                start = i
+            elif not sample and start is not None:
+                words.append({"word": f"41001-{len(words) + 1}", "start": start / rate, "end": i / rate})
+                start = None
+        return {"text": " ".join(word["word"] for word in words), "words": words}
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_openai_backend(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/audio/transcriptions"
+    recording = tmp_path / "call.mp3"
+    recording.write_bytes(b"call audio")
+    try:
+        backend = OpenAIBackend("sk-test", prompt="Radio dispatch", url=url)
+        assert backend.transcribe(str(recording)) == "Engine 4 responding"
+        assert FakeOpenAI.requests[-1] == ("Bearer sk-test", b"whisper-1", b"Radio dispatch", b"call audio")
+        with pytest.raises(BackendError, match="HTTP 400"):
+            OpenAIBackend("sk-test", model="nonexistent", url=url).transcribe(str(recording))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def write_wav(path, seconds, rate=8000, channels=2, level=1):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(level.to_bytes(2, "little") * channels * int(rate * seconds))
+
+
+def test_openai_backend_packs_recordings_into_one_request(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/audio/transcriptions"
+    recordings = [tmp_path / f"call{i}.wav" for i in range(3)]
+    for i, recording in enumerate(recordings):
+        write_wav(recording, 1 + i, level=1000)
+    try:
+        backend = OpenAIBackend("sk-test", url=url)
+        sent = len(FakeOpenAI.requests)
+        texts = BackendRouter([backend]).transcribe_batch([str(r) for r in recordings], "41001")
+        assert texts == ["41001-1", "41001-2", "41001-3"]
+        assert len(FakeOpenAI.requests) == sent + 1
+        with wave.open(io.BytesIO(FakeOpenAI.requests[-1][3])) as packed:
+            # Resampling to 16 kHz may drop the last frame of each clip
+            assert 16000 * (1 + 2 + 3 + 2 * 1.5) - packed.getnframes() <= 3
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeSpeechSDK:
+    """
+    Stands in for azure.cognitiveservices.speech: a recognizer reports one
+    utterance per second of pushed audio, then the end of the stream.
+    """
+    def __init__(self):
+        self.configs = []
+        self.active = 0
+        self.most_active = 0
+        self.lock = threading.Lock()
+        self.error = None
+        sdk = self
+
+        class Signal:
+            def __init__(self):
+                self.callbacks = []
+
+            def connect(self, callback):
+                self.callbacks.append(callback)
+
+            def fire(self, event):
+                for callback in self.callbacks:
+                    callback(event)
+
+        class PushAudioInputStream:
+            def __init__(self, stream_format):
+                assert stream_format == ("format", 16000, 16, 1)
+                self.chunks = []
+                self.closed = threading.Event()
+
+            def write(self, data):
+                self.chunks.append(data)
+
+            def close(self):
+                self.closed.set()
+
+        class SpeechRecognizer:
+            def __init__(self, speech_config, audio_config):
+                self.stream = audio_config.stream
+                self.recognized, self.canceled, self.session_stopped = Signal(), Signal(), Signal()
+
+            def start_continuous_recognition(self):
+                with sdk.lock:
+                    sdk.active += 1
+                    sdk.most_active = max(sdk.most_active, sdk.active)
+                threading.Thread(target=self.recognize).start()
+
+            def recognize(self):
+                self.stream.closed.wait()
+                time.sleep(0.05)
+                seconds = len(b"".join(self.stream.chunks)) // 32000
+                for i in range(seconds):
+                    result = types.SimpleNamespace(reason="RecognizedSpeech", text=f"utterance {i + 1}.")
+                    self.recognized.fire(types.SimpleNamespace(result=result))
+                details = types.SimpleNamespace(reason="Error" if sdk.error else "EndOfStream", error_details=sdk.error)
+                self.canceled.fire(types.SimpleNamespace(cancellation_details=details))
+                self.session_stopped.fire(None)
+
+            def stop_continuous_recognition(self):
+                with sdk.lock:
+                    sdk.active -= 1
+
+        self.module = types.ModuleType("azure.cognitiveservices.speech")
+        self.module.SpeechConfig = lambda subscription, region: self.configs.append((subscription, region)) or "config"
+        self.module.SpeechRecognizer = SpeechRecognizer
+        self.module.ResultReason = types.SimpleNamespace(RecognizedSpeech="RecognizedSpeech", NoMatch="NoMatch")
+        self.module.CancellationReason = types.SimpleNamespace(Error="Error", EndOfStream="EndOfStream")
+        self.module.audio = types.SimpleNamespace(
+            AudioStreamFormat=lambda samples_per_second, bits_per_sample, channels:
+                ("format", samples_per_second, bits_per_sample, channels),
+            PushAudioInputStream=PushAudioInputStream,
+            AudioConfig=lambda stream: types.SimpleNamespace(stream=stream),
+        )
+
+
+@pytest.fixture
+def speechsdk(monkeypatch):
+    sdk = FakeSpeechSDK()
+    azure = types.ModuleType("azure")
+    azure.cognitiveservices = types.ModuleType("azure.cognitiveservices")
+    azure.cognitiveservices.speech = sdk.module
+    monkeypatch.setitem(sys.modules, "azure", azure)
+    monkeypatch.setitem(sys.modules, "azure.cognitiveservices", azure.cognitiveservices)
+    monkeypatch.setitem(sys.modules, "azure.cognitiveservices.speech", sdk.module)
+    return sdk
+
+
+def test_azure_backend_streams_whole_calls_concurrently(speechsdk, tmp_path):
+    paths = []
+    for i in range(4):
+        paths.append(str(tmp_path / f"call{i}.wav"))
+        write_wav(paths[-1], 2.5 + i)
+    backend = AzureBackend("key", "eastus", concurrency=2)
+    results = {}
+    threads = [threading.Thread(target=lambda p=p: results.update({p: backend.transcribe(p)})) for p in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    # 8 kHz stereo resampled to 16 kHz mono: one fake utterance per second, all of them kept
+    assert results[paths[0]] == "utterance 1. utterance 2."
+    assert results[paths[3]].endswith("utterance 5.")
+    assert speechsdk.configs == [("key", "eastus")] and speechsdk.most_active == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f"call{i}.wav" for i in range(4)]
+
+    speechsdk.error = "401 Unauthorized"
+    with pytest.raises(BackendError, match="401 Unauthorized"):
+        backend.transcribe(paths[0])
+
+
+class FakeGoogleSpeech:
+    """
+    Stands in for google.cloud.speech_v1p1beta1: a stream answers with an
+    interim and a final result per second of audio received.
+    """
+    def __init__(self):
+        self.clients = []
+        self.streams = []
+        self.active = 0
+        self.most_active = 0
+        self.lock = threading.Lock()
+        speech = self
+
+        class SpeechClient:
+            @classmethod
+            def from_service_account_json(cls, key_file):
+                client = cls()
+                speech.clients.append((key_file, client))
+                return client
+
+            def streaming_recognize(self, config, requests, timeout=None):
+                with speech.lock:
+                    speech.active += 1
+                    speech.most_active = max(speech.most_active, speech.active)
+                chunks = [request.audio_content for request in requests]
+                time.sleep(0.05)
+                speech.streams.append((self, config, chunks))
+                with speech.lock:
+                    speech.active -= 1
+                for second in range(len(b"".join(chunks)) // 32000):
+                    yield types.SimpleNamespace(results=[
+                        types.SimpleNamespace(is_final=False, alternatives=[types.SimpleNamespace(transcript="partial")]),
+                        types.SimpleNamespace(is_final=True,
+                                              alternatives=[types.SimpleNamespace(transcript=f" second {second + 1}.")]),
+                    ])
+
+        self.module = types.ModuleType("google.cloud.speech_v1p1beta1")
+        self.module.SpeechClient = SpeechClient
+        self.module.RecognitionConfig = lambda **fields: fields
+        self.module.RecognitionConfig.AudioEncoding = types.SimpleNamespace(LINEAR16="LINEAR16")
+        self.module.SpeechContext = lambda phrases: phrases
+        self.module.StreamingRecognitionConfig = lambda config: config
+        self.module.StreamingRecognizeRequest = lambda audio_content: types.SimpleNamespace(audio_content=audio_content)
+
+
+@pytest.fixture
+def google_speech(monkeypatch):
+    speech = FakeGoogleSpeech()
+    google = types.ModuleType("google")
+    google.cloud = types.ModuleType("google.cloud")
+    google.cloud.speech_v1p1beta1 = speech.module
+    monkeypatch.setitem(sys.modules, "google", google)
+    monkeypatch.setitem(sys.modules, "google.cloud", google.cloud)
+    monkeypatch.setitem(sys.modules, "google.cloud.speech_v1p1beta1", speech.module)
+    return speech
+
+
+def test_google_backend_streams_local_files_with_talkgroup_hints(google_speech, tmp_path):
+    hints_file = tmp_path / "hints.json"
+    hints_file.write_text(json.dumps({"default": ["10-4", "Medic 12"], "52198": ["Troop C", "x" * 150]}))
+    paths = [str(tmp_path / f"call{i}.wav") for i in range(6)]
+    for path in paths:
+        write_wav(path, 2.2)
+    backend = GoogleBackend("key.json", phrase_hints_from_file(str(hints_file)), channels=2, concurrency=3)
+    results = {}
+    threads = [threading.Thread(target=lambda p=p, i=i: results.update({p: backend.transcribe(p, "52198" if i else None)}))
+               for i, p in enumerate(paths)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results[paths[0]] == "second 1. second 2."
+    assert [key for key, _ in google_speech.clients] == ["key.json", "key.json"]
+    assert google_speech.most_active == 3
+    # Both pooled clients carry streams
+    assert {id(client) for client, _, _ in google_speech.streams} == {id(c) for _, c in google_speech.clients}
+
+    configs = {len(config["speech_contexts"][0]): config for _, config, _ in google_speech.streams}
+    assert configs[2]["speech_contexts"] == [["10-4", "Medic 12"]]
+    assert configs[4]["speech_contexts"][0][2:] == ["Troop C", "x" * 100]
+    assert configs[2]["sample_rate_hertz"] == 16000 and configs[2]["encoding"] == "LINEAR16"
+    # 2.2 s of 16 kHz 16-bit mono in 100 ms requests
+    chunks = google_speech.streams[0][2]
+    assert len(chunks) == 22 and {len(chunk) for chunk in chunks[:-1]} == {3200}
@@ -1,6 +1,6 @@
 import os
 from unittest.mock import patch
-from utils import extract_talkgroup_id, move_file
+from utils import extract_talkgroup_id, move_file, parse_recording_timestamp, recording_directory
 
 def test_extract_talkgroup_id():
     assert extract_talkgroup_id("somefile_TO_12345.mp3") == "12345"
@@ -15,4 +15,11 @@ def test_move_file(mock_makedirs, mock_move, tmp_path):
     dst = tmp_path / "destination" / "test.mp3"
     move_file(str(src), str(dst))
     mock_makedirs.assert_called_once()
-    mock_move.assert_called_once_with(str(src), str(dst))
\ No newline at end of file
+    mock_move.assert_called_once_with(str(src), str(dst))
+
+def test_recording_directory_layouts():
+    name = "20231001_173024Name__TO_41003_FROM_1.mp3"
+    assert recording_directory("/rec", name, layout="{talkgroup}") == "/rec/41003"
+    assert recording_directory("/rec", name, layout="{talkgroup}/{year}/{month}/{day}") == "/rec/41003/2023/10/01"
+    assert recording_directory("/rec", name, talkgroup_id="52198", layout="{talkgroup}/{year}") == "/rec/52198/2023"
+    assert parse_recording_timestamp("no_timestamp_TO_1.mp3") is None
@@ -2,50 +2,196 @@
 import json
 import logging
 import os
-from typing import List, Any
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Any, Optional
 
+import metrics
 from config import Config
-from utils import extract_talkgroup_id
+from daemon_client import TranscriptionClient
+from model_registry import ModelRegistry, ModelSpec, default_spec
+from packing import pack_clips, split_by_offsets, timed_words
+from speech_gate import SAMPLE_RATE, decode_samples
+from transcript_feed import FeedPublisher, transcript_event
+from transcript_store import SidecarStore, TranscriptStore
+from utils import recording_directory
 
 # pyre-ignore[21]: No type hints from 3rd party library
-import faster_whisper
+from faster_whisper.vad import VadOptions
 
-class Transcriber:
+def transcription_options(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    Handles transcription using the faster_whisper model.
+    Keyword arguments for WhisperModel.transcribe built from Config, with
+    optional overrides (e.g. a benchmark preset). VAD parameters the
+    installed faster_whisper does not know about are dropped.
     """
-    def __init__(self) -> None:
-        self.model = faster_whisper.WhisperModel(
-            Config.MODEL_SIZE, device="cuda"
-        )
+    vad_parameters = {
+        "threshold": Config.THRESHOLD,
+        "min_silence_duration_ms": Config.MIN_SILENCE_DURATION_MS,
+        "window_size_samples": Config.WINDOW_SIZE_SAMPLES,
+    }
+    supported_vad = set(getattr(VadOptions, "__dataclass_fields__", vad_parameters))
+    options: Dict[str, Any] = {
+        "beam_size": Config.BEAM_SIZE,
+        "patience": Config.PATIENCE,
+        "best_of": Config.BEST_OF,
+        "no_speech_threshold": Config.NO_SPEECH_THRESHOLD,
+        "log_prob_threshold": Config.LOG_PROB_THRESHOLD,
+        "compression_ratio_threshold": Config.COMPRESSION_RATIO_THRESHOLD,
+        "repetition_penalty": Config.REPETITION_PENALTY,
+        "condition_on_previous_text": Config.CONDITION_ON_PREVIOUS_TEXT,
+        "prompt_reset_on_temperature": Config.PROMPT_RESET_ON_TEMPERATURE,
+        "initial_prompt": "",
+        "temperature": Config.TEMPERATURE,
+        "vad_filter": True,
+        "vad_parameters": {k: v for k, v in vad_parameters.items() if k in supported_vad},
+        "language": Config.LANGUAGE,
+    }
+    options.update(overrides or {})
+    return options
+
+class BaseTranscriber(ABC):
+    """
+    What the handler needs from a transcriber: transcribing recordings, and
+    saving the results. Transcriptions are written to a TranscriptStore
+    (.txt sidecars by default) and, with a feed publisher, announced on the
+    live transcript feed.
+    """
+    def __init__(self, store: Optional[TranscriptStore] = None, feed: Optional[FeedPublisher] = None) -> None:
+        self.store: TranscriptStore = store or SidecarStore()
+        self.feed: Optional[FeedPublisher] = feed
+
+    @abstractmethod
+    def transcribe_file(self, path: str) -> str:
+        """
+        Transcribe the given mp3 file and return the transcription as JSON
+        with a 'text' field. Raises an exception on failure.
+        """
+
+    def transcribe_batch(self, paths: List[str]) -> List[str]:
+        """
+        Transcribe several recordings, returning JSON transcriptions in the
+        order of paths.
+        """
+        return [self.transcribe_file(path) for path in paths]
+
+    @abstractmethod
+    def warm_up(self, on_ready: Callable[[], None]) -> None:
+        """
+        Get ready to transcribe without blocking, and call on_ready once
+        ready.
+        """
+
+    def throughput(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-model throughput measured in this process, if any.
+        """
+        return {}
+
+    def save_transcription(self, path: str, transcription_text: str) -> None:
+        """
+        Saves the transcription text to the transcript store and moves the
+        MP3 into its talkgroup directory (see Config.RECORDING_LAYOUT).
+        """
+        final_directory = recording_directory(os.path.dirname(path), os.path.basename(path))
+        os.makedirs(final_directory, exist_ok=True)
+        final_mp3_path = os.path.join(final_directory, os.path.basename(path))
+
+        # Load JSON to extract the final text from the 'text' field; other
+        # fields (e.g. duplicate_of) are kept as metadata
+        metadata = json.loads(transcription_text)
+        text_data = metadata.pop('text')
+        self.store.write(final_mp3_path, text_data, metadata)
+
+        # Move the MP3 file into the same directory
+        os.replace(path, final_mp3_path)
+        logging.info(f"Transcribed and moved {path} to {final_directory}")
+        if self.feed is not None:
+            self.feed.publish(transcript_event(final_mp3_path, text_data, metadata))
+
+
+class Transcriber(BaseTranscriber):
+    """
+    Handles transcription using faster_whisper models, routed per talkgroup
+    through a ModelRegistry.
+    """
+    def __init__(self, registry: Optional[ModelRegistry] = None,
+                 options: Optional[Dict[str, Any]] = None,
+                 store: Optional[TranscriptStore] = None,
+                 feed: Optional[FeedPublisher] = None) -> None:
+        super().__init__(store, feed)
+        self.registry: ModelRegistry = registry or ModelRegistry()
+        self.options: Dict[str, Any] = transcription_options(options)
 
     def transcribe_file(self, path: str) -> str:
         """
         Transcribe the given mp3 file and return the transcribed text.
         Raises an exception on failure.
         """
-        segments, info = self.model.transcribe(
-            path,
-            beam_size=Config.BEAM_SIZE,
-            patience=Config.PATIENCE,
-            best_of=Config.BEST_OF,
-            no_speech_threshold=Config.NO_SPEECH_THRESHOLD,
-            log_prob_threshold=Config.LOG_PROB_THRESHOLD,
-            compression_ratio_threshold=Config.COMPRESSION_RATIO_THRESHOLD,
-            repetition_penalty=Config.REPETITION_PENALTY,
-            condition_on_previous_text=Config.CONDITION_ON_PREVIOUS_TEXT,
-            prompt_reset_on_temperature=Config.PROMPT_RESET_ON_TEMPERATURE,
-            initial_prompt="",
-            temperature=Config.TEMPERATURE,
-            vad_filter=True,
-            vad_parameters={
-                "threshold": Config.THRESHOLD,
-                "min_silence_duration_ms": Config.MIN_SILENCE_DURATION_MS,
-                "window_size_samples": Config.WINDOW_SIZE_SAMPLES,
-            },
-            language=Config.LANGUAGE
-        )
-        return self._format_segments(segments)
+        spec = self.registry.route(os.path.basename(path))
+        model = self.registry.get(spec)
+        started = time.monotonic()
+        segments, info = model.transcribe(path, **self.options)
+        text = self._format_segments(segments)
+        elapsed = time.monotonic() - started
+        audio_seconds = getattr(info, "duration", 0.0)
+        self.registry.record(spec, audio_seconds, elapsed)
+        metrics.TRANSCRIPTION_SECONDS.observe(elapsed, model=spec.name)
+        metrics.AUDIO_SECONDS.inc(audio_seconds, model=spec.name)
+        return text
+
+    def transcribe_batch(self, paths: List[str]) -> List[str]:
+        """
+        Transcribe several short recordings with one model call per routed
+        model: the clips are packed with PACK_GAP_SECONDS of silence between
+        them and the words are split back per recording by their offsets.
+        Returns JSON transcriptions in the order of paths.
+        """
+        groups: Dict[ModelSpec, List[str]] = {}
+        for path in paths:
+            groups.setdefault(self.registry.route(os.path.basename(path)), []).append(path)
+
+        results: Dict[str, str] = {}
+        for spec, group in groups.items():
+            if len(group) == 1:
+                results[group[0]] = self.transcribe_file(group[0])
+                continue
+            model = self.registry.get(spec)
+            clips = [decode_samples(path) for path in group]
+            audio, offsets = pack_clips(clips, Config.PACK_GAP_SECONDS)
+            # Word timestamps drive the split; no prompt carry-over between clips
+            options = dict(self.options, word_timestamps=True, condition_on_previous_text=False)
+            started = time.monotonic()
+            segments, _ = model.transcribe(audio, **options)
+            texts = split_by_offsets(timed_words(segments), offsets)
+            elapsed = time.monotonic() - started
+            audio_seconds = sum(len(clip) for clip in clips) / SAMPLE_RATE
+            self.registry.record(spec, audio_seconds, elapsed)
+            metrics.TRANSCRIPTION_SECONDS.observe(elapsed, model=spec.name)
+            metrics.AUDIO_SECONDS.inc(audio_seconds, model=spec.name)
+            metrics.PACKED_CLIPS.inc(len(group))
+            metrics.PACK_CALLS_SAVED.inc(len(group) - 1)
+            for path, text in zip(group, texts):
+                results[path] = json.dumps({"text": text})
+        return [results[path] for path in paths]
+
+    def warm_up(self, on_ready: Callable[[], None]) -> None:
+        """
+        Load the default model on a background thread and call on_ready once
+        it is resident, so callers can start intake without waiting for it.
+        """
+        def load() -> None:
+            try:
+                self.registry.get(default_spec())
+                on_ready()
+            except Exception as e:
+                logging.error(f"Failed to preload model: {str(e)}")
+
+        threading.Thread(target=load, name="model-warm-up", daemon=True).start()
+
+    def throughput(self) -> Dict[str, Dict[str, float]]:
+        return self.registry.throughput()
 
     def _format_segments(self, segments: List[Any]) -> str:
         formatted_segments = [{"text": segment.text} for segment in segments]
@@ -53,24 +199,23 @@ class Transcriber:
         # Return JSON with a 'text' field
         return json.dumps({"text": formatted_text})
 
-    def save_transcription(self, path: str, transcription_text: str) -> None:
-        """
-        Saves the transcription text into a corresponding .txt file
-        in a directory based on the talkgroup ID extracted from filename.
-        """
-        talkgroup_id = extract_talkgroup_id(os.path.basename(path))
-        final_directory = os.path.join(os.path.dirname(path), talkgroup_id)
-        os.makedirs(final_directory, exist_ok=True)
 
-        base_filename = os.path.splitext(os.path.basename(path))[0]
-        transcription_path = os.path.join(final_directory, base_filename + ".txt")
+class RemoteTranscriber(BaseTranscriber):
+    """
+    Sends transcription jobs to the shared transcription daemon instead of
+    loading models in this process.
+    """
+    def __init__(self, socket_path: str, store: Optional[TranscriptStore] = None,
+                 feed: Optional[FeedPublisher] = None) -> None:
+        super().__init__(store, feed)
+        self.client = TranscriptionClient(socket_path)
 
-        # Load JSON to extract the final text from the 'text' field
-        text_data = json.loads(transcription_text)['text']
-        with open(transcription_path, 'w', encoding='utf-8') as f:
-            f.write(text_data)
+    def transcribe_file(self, path: str) -> str:
+        return json.dumps({"text": self.client.transcribe(path)})
 
-        # Move the MP3 file into the same directory
-        final_mp3_path = os.path.join(final_directory, os.path.basename(path))
-        os.replace(path, final_mp3_path)
-        logging.info(f"Transcribed and moved {path} to {final_directory}")
\ No newline at end of file
+    def warm_up(self, on_ready: Callable[[], None]) -> None:
+        # The daemon keeps its models loaded; it only has to be reachable
+        if self.client.available():
+            on_ready()
+        else:
+            logging.warning(f"Transcription daemon not reachable at {self.client.socket_path}")
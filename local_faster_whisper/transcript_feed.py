@@ -0,0 +1,255 @@
+# pyre-strict
+import argparse
+import collections
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+from utils import extract_talkgroup_id, parse_recording_timestamp
+
+DEFAULT_FEED_SOCKET: str = os.environ.get("TRANSCRIPT_FEED_SOCKET", "/tmp/sdrtrunk-transcriber-feed.sock")
+KEEPALIVE_SECONDS: float = 15.0
+# Largest datagram the server reads; longer events are dropped by the publisher
+MAX_EVENT_BYTES: int = 65536
+
+
+def transcript_event(path: str, text: str, metadata: Optional[Dict[str, Any]] = None,
+                     source: str = "watcher") -> Dict[str, Any]:
+    """
+    The feed event for a saved transcript: recording details parsed from
+    the SDRTrunk file name, the text and any extra metadata.
+    """
+    filename = os.path.basename(path)
+    stamp = parse_recording_timestamp(filename)
+    radio = re.search(r"FROM_(\d+)", filename)
+    event: Dict[str, Any] = {
+        "filename": filename,
+        "path": path,
+        "talkgroup_id": extract_talkgroup_id(filename),
+        "radio_id": radio.group(1) if radio else None,
+        "unixtime": int(time.mktime(stamp)) if stamp else None,
+        "text": text,
+        "source": source,
+    }
+    event.update(metadata or {})
+    return event
+
+
+class FeedPublisher:
+    """
+    Sends events to a feed server as Unix datagrams. Sends never block: if
+    no server is listening or its socket buffer is full, the event is
+    dropped, so publishing can never stall transcription.
+    """
+    def __init__(self, socket_path: str = DEFAULT_FEED_SOCKET) -> None:
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    def publish(self, event: Dict[str, Any]) -> bool:
+        data = json.dumps(event).encode("utf-8")
+        if len(data) > MAX_EVENT_BYTES:
+            logging.warning(f"Feed event for {event.get('filename')} too large ({len(data)} bytes), not published")
+            return False
+        try:
+            self._sock.sendto(data, self.socket_path)
+            return True
+        except OSError as e:
+            logging.debug(f"Feed event for {event.get('filename')} not published: {e}")
+            return False
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+class Subscription:
+    """
+    One client's bounded event buffer. A client that lets it fill up is
+    marked dropped and disconnected rather than slowing the feed down.
+    """
+    def __init__(self, talkgroups: Optional[Set[str]], buffer_size: int) -> None:
+        self.talkgroups = talkgroups
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return self.talkgroups is None or str(event.get("talkgroup_id")) in self.talkgroups
+
+    def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TranscriptFeed:
+    """
+    Fans published events out to subscriptions. Each event gets an
+    increasing id, and the last history_size events are kept so a client
+    reconnecting with Last-Event-ID picks up what it missed.
+    """
+    def __init__(self, history_size: int = 100) -> None:
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._history: Deque[Dict[str, Any]] = collections.deque(maxlen=history_size)
+        self._next_id = 1
+
+    def subscribe(self, talkgroups: Optional[Set[str]] = None, buffer_size: int = 100,
+                  last_event_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(talkgroups, buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [e for e in self._history if e["id"] > last_event_id and subscription.wants(e)]
+                for event in missed[-buffer_size:]:
+                    subscription.events.put_nowait(event)
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        """
+        Queue an event for every interested subscriber. Returns how many
+        received it.
+        """
+        delivered = 0
+        with self._lock:
+            event = dict(event, id=self._next_id)
+            self._next_id += 1
+            self._history.append(event)
+            for subscription in list(self._subscriptions):
+                if not subscription.wants(event):
+                    continue
+                try:
+                    subscription.events.put_nowait(event)
+                    delivered += 1
+                except queue.Full:
+                    subscription.dropped = True
+                    self._subscriptions.remove(subscription)
+                    metrics.FEED_CLIENTS_DROPPED.inc()
+                    logging.warning("Dropped a feed client that fell behind")
+        metrics.FEED_EVENTS.inc()
+        return delivered
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /events?talkgroup=41001,41002 streams matching transcripts as
+    Server-Sent Events (all talkgroups without a filter).
+    """
+    feed: TranscriptFeed
+    buffer_size: int = 100
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/events":
+            self.send_error(404)
+            return
+        values = [v for value in parse_qs(url.query).get("talkgroup", []) for v in value.split(",") if v]
+        last_event_id = self.headers.get("Last-Event-ID")
+        subscription = self.feed.subscribe(set(values) or None, self.buffer_size,
+                                           int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(b"retry: 3000\n\n")
+            self.wfile.flush()
+            while not subscription.dropped:
+                event = subscription.next(KEEPALIVE_SECONDS)
+                if event is None:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(f"id: {event['id']}\nevent: transcript\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.feed.unsubscribe(subscription)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(f"Feed request: {format % args}")
+
+
+class FeedServer:
+    """
+    Receives published events on a Unix datagram socket and serves them
+    over HTTP as Server-Sent Events.
+    """
+    def __init__(self, feed: TranscriptFeed, socket_path: str, port: int, host: str = "127.0.0.1",
+                 buffer_size: int = 100) -> None:
+        self.feed = feed
+        self.socket_path = socket_path
+        handler = type("BoundFeedRequestHandler", (FeedRequestHandler,), {"feed": feed, "buffer_size": buffer_size})
+        self.http = ThreadingHTTPServer((host, port), handler)
+        self.http.daemon_threads = True
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver.bind(socket_path)
+
+    @property
+    def port(self) -> int:
+        return self.http.server_address[1]
+
+    def start(self) -> "FeedServer":
+        threading.Thread(target=self._receive, name="feed-receiver", daemon=True).start()
+        threading.Thread(target=self.http.serve_forever, name="feed-server", daemon=True).start()
+        logging.info(f"Transcript feed at http://{self.http.server_address[0]}:{self.port}/events "
+                     f"(publishing socket {self.socket_path})")
+        return self
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                data = self.receiver.recv(MAX_EVENT_BYTES)
+            except OSError:
+                return
+            try:
+                self.feed.publish(json.loads(data))
+            except ValueError:
+                logging.warning("Ignoring malformed feed event")
+
+    def stop(self) -> None:
+        self.http.shutdown()
+        self.http.server_close()
+        self.receiver.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+if __name__ == "__main__":
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Serve saved transcripts as a live Server-Sent Events feed")
+    parser.add_argument("--socket", type=str, default=Config.FEED_SOCKET or DEFAULT_FEED_SOCKET,
+                        help="Unix datagram socket publishers send to")
+    parser.add_argument("--host", type=str, default=Config.FEED_HOST, help="Address to bind")
+    parser.add_argument("--port", type=int, default=Config.FEED_PORT or 8766, help="HTTP port")
+    parser.add_argument("--buffer", type=int, default=Config.FEED_CLIENT_BUFFER,
+                        help="Events a client may fall behind before it is dropped")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FeedServer(TranscriptFeed(), args.socket, args.port, args.host, args.buffer).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
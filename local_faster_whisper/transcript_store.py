@@ -0,0 +1,207 @@
+# pyre-strict
+import argparse
+import fcntl
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional
+
+
+def sidecar_path(recording_path: str) -> str:
+    return os.path.splitext(recording_path)[0] + ".txt"
+
+
+def recording_day(filename: str) -> str:
+    """
+    YYYYMMDD from a SDRTrunk recording name (20231001_173024...), or today's
+    date for names without a timestamp.
+    """
+    match = re.match(r"(\d{8})_", filename)
+    return match.group(1) if match else time.strftime("%Y%m%d")
+
+
+class TranscriptStore(ABC):
+    """
+    Where transcriptions end up. Content is what the .txt sidecar would hold;
+    metadata is extra fields kept alongside it where the store supports it.
+    """
+    @abstractmethod
+    def write(self, recording_path: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, recording_path: str) -> Optional[str]:
+        ...
+
+    def contains(self, recording_path: str) -> bool:
+        return self.read(recording_path) is not None
+
+    def close(self) -> None:
+        pass
+
+
+class SidecarStore(TranscriptStore):
+    """
+    One .txt next to every recording (the original layout).
+    """
+    def write(self, recording_path: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        with open(sidecar_path(recording_path), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def read(self, recording_path: str) -> Optional[str]:
+        if not os.path.exists(sidecar_path(recording_path)):
+            return None
+        with open(sidecar_path(recording_path), encoding="utf-8") as f:
+            return f.read()
+
+    def contains(self, recording_path: str) -> bool:
+        return os.path.exists(sidecar_path(recording_path))
+
+
+class SegmentedStore(TranscriptStore):
+    """
+    Append-only JSONL segments, one per recording day, with a SQLite index
+    of (segment, offset, length) per recording name so a lookup is one
+    index probe and one seek. Appends are serialized with flock, so the
+    watcher and the batch scripts can share a store. Rewriting a recording
+    appends a new line and repoints the index. With sidecars=True the .txt
+    files are still written as well.
+    """
+    INDEX_NAME = "index.sqlite3"
+
+    def __init__(self, directory: str, sidecars: bool = False) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sidecars = sidecars
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, self.INDEX_NAME), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "name TEXT PRIMARY KEY, segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def write(self, recording_path: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        name = os.path.basename(recording_path)
+        record = {"name": name, "path": recording_path, "content": content, "written": int(time.time())}
+        record.update(metadata or {})
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        segment = f"transcripts-{recording_day(name)}.jsonl"
+        with self._lock:
+            with open(os.path.join(self.directory, segment), "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(line)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?)",
+                                   (name, segment, offset, len(line)))
+        if self.sidecars:
+            SidecarStore().write(recording_path, content)
+
+    def record(self, recording_path: str) -> Optional[Dict[str, Any]]:
+        """
+        The stored record (name, path, content, written and any metadata).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT segment, offset, length FROM transcripts WHERE name = ?",
+                                     (os.path.basename(recording_path),)).fetchone()
+        if row is None:
+            return None
+        segment, offset, length = row
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def read(self, recording_path: str) -> Optional[str]:
+        record = self.record(recording_path)
+        return record["content"] if record else None
+
+    def contains(self, recording_path: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM transcripts WHERE name = ?",
+                                      (os.path.basename(recording_path),)).fetchone() is not None
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Current records in segment order, reading each segment sequentially.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT segment, offset, length FROM transcripts ORDER BY segment, offset").fetchall()
+        current_segment: Optional[str] = None
+        f = None
+        try:
+            for segment, offset, length in rows:
+                if segment != current_segment:
+                    if f is not None:
+                        f.close()
+                    f = open(os.path.join(self.directory, segment), "rb")
+                    current_segment = segment
+                f.seek(offset)
+                yield json.loads(f.read(length))
+        finally:
+            if f is not None:
+                f.close()
+
+    def export_sidecars(self, output_directory: Optional[str] = None) -> int:
+        """
+        Regenerate .txt sidecars, next to each recording's stored path or
+        flat in output_directory. Returns the number written.
+        """
+        sidecars = SidecarStore()
+        count = 0
+        for record in self.records():
+            path = record["path"]
+            if output_directory:
+                os.makedirs(output_directory, exist_ok=True)
+                path = os.path.join(output_directory, record["name"])
+            elif not os.path.isdir(os.path.dirname(path)):
+                logging.warning(f"Directory for {path} no longer exists, skipping")
+                continue
+            sidecars.write(path, record["content"])
+            count += 1
+        return count
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def open_store(kind: str, directory: str, sidecars: bool = False) -> TranscriptStore:
+    """
+    Build the store named by kind ("sidecar" or "segmented").
+    """
+    if kind == "sidecar":
+        return SidecarStore()
+    if kind == "segmented":
+        return SegmentedStore(directory, sidecars)
+    raise ValueError(f"Unknown transcript store: {kind}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a segmented transcript store")
+    parser.add_argument("store", type=str, help="Transcript store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Regenerate .txt sidecars from the store")
+    export.add_argument("--output", type=str, help="Write all sidecars into this directory instead")
+    show = commands.add_parser("show", help="Print the stored record for a recording")
+    show.add_argument("recording", type=str, help="Recording file name or path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = SegmentedStore(args.store)
+    if args.command == "export":
+        print(f"Wrote {store.export_sidecars(args.output)} sidecars")
+    else:
+        found = store.record(args.recording)
+        if found is None:
+            parser.exit(1, f"No transcript for {args.recording}\n")
+        print(json.dumps(found, indent=2))
+    store.close()
@@ -0,0 +1,527 @@
+# pyre-strict
+import io
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from daemon_client import DEFAULT_SOCKET_PATH, TranscriptionClient
+
+OPENAI_TRANSCRIPTIONS_URL: str = "https://api.openai.com/v1/audio/transcriptions"
+# Recordings are decoded to 16-bit mono PCM at this rate for the cloud speech APIs
+PCM_SAMPLE_RATE: int = 16000
+# One second of audio per write to an Azure push stream
+AZURE_CHUNK_BYTES: int = PCM_SAMPLE_RATE * 2
+# 100 ms of audio per Google streaming request, as Google recommends
+GOOGLE_CHUNK_BYTES: int = PCM_SAMPLE_RATE * 2 // 10
+# Google's limits on phrase hints per request and characters per phrase
+MAX_PHRASE_HINTS: int = 5000
+MAX_PHRASE_LENGTH: int = 100
+# Silence between clips packed into one OpenAI request, and the API's upload limit
+PACK_GAP_SECONDS: float = 1.5
+OPENAI_MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024
+
+
+def decode_pcm(path: str, sample_rate: int = PCM_SAMPLE_RATE) -> bytes:
+    """
+    Decodes a recording in memory to 16-bit mono little-endian PCM at
+    sample_rate.
+    """
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(path)
+    return audio.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2).raw_data
+
+
+class BackendError(Exception):
+    """
+    Raised when a backend fails to transcribe a recording, or when the
+    router has no backend left to try.
+    """
+
+
+class TranscriptionBackend(ABC):
+    """
+    One way of turning a recording into text. transcribe() returns the
+    plain transcription and raises on failure; it may be called from
+    several threads at once. concurrency is how many jobs the backend
+    handles in parallel without slowing down, which the router uses to
+    turn queue depth into expected waiting time.
+    """
+    name: str = "backend"
+    concurrency: int = 1
+
+    @abstractmethod
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        ...
+
+    def transcribe_batch(self, paths: Sequence[str], talkgroup_id: Optional[str] = None) -> List[str]:
+        """
+        Transcribes several recordings of one talkgroup, in order. Backends
+        with a fixed per-request cost override this to pack them into one
+        request.
+        """
+        return [self.transcribe(path, talkgroup_id) for path in paths]
+
+    def close(self) -> None:
+        pass
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """
+    OpenAI's hosted Whisper (the request the API scripts have always made),
+    over one pooled HTTP session.
+    """
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "whisper-1", prompt: Optional[str] = None,
+                 url: str = OPENAI_TRANSCRIPTIONS_URL, timeout: float = 120.0, concurrency: int = 8) -> None:
+        import requests
+
+        self.url = url
+        self.model = model
+        self.prompt = prompt
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _post(self, file: Any, response_format: str, **fields: Any) -> Dict[str, Any]:
+        data = {"model": self.model, "response_format": response_format, "temperature": "0", "language": "en"}
+        if self.prompt:
+            data["prompt"] = self.prompt
+        data.update(fields)
+        response = self.session.post(self.url, files={"file": file}, data=data, timeout=self.timeout)
+        try:
+            reply = response.json()
+        except ValueError:
+            raise BackendError(f"OpenAI returned HTTP {response.status_code}: {response.text[:200]}")
+        if response.status_code != 200 or "text" not in reply:
+            raise BackendError(f"OpenAI returned HTTP {response.status_code}: {reply}")
+        return reply
+
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        with open(path, "rb") as file:
+            return self._post(file, "json")["text"]
+
+    def transcribe_batch(self, paths: Sequence[str], talkgroup_id: Optional[str] = None) -> List[str]:
+        """
+        Packs the recordings into one WAV upload with PACK_GAP_SECONDS of
+        silence between them (packing.pack_clips) and splits the reply back
+        per recording by its word timestamps (packing.split_by_offsets).
+        """
+        if len(paths) < 2:
+            return [self.transcribe(path, talkgroup_id) for path in paths]
+        import numpy as np
+        from packing import pack_clips, split_by_offsets
+
+        clips = [np.frombuffer(decode_pcm(path), dtype=np.int16).astype(np.float32) / 32768.0 for path in paths]
+        audio, offsets = pack_clips(clips, PACK_GAP_SECONDS, PCM_SAMPLE_RATE)
+        if len(audio) * 2 > OPENAI_MAX_UPLOAD_BYTES:
+            raise BackendError(f"{len(paths)} packed recordings exceed OpenAI's upload limit")
+        upload = io.BytesIO()
+        with wave.open(upload, "wb") as packed:
+            packed.setnchannels(1)
+            packed.setsampwidth(2)
+            packed.setframerate(PCM_SAMPLE_RATE)
+            packed.writeframes(np.round(np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+        upload.seek(0)
+        reply = self._post(("packed.wav", upload, "audio/wav"), "verbose_json",
+                           **{"timestamp_granularities[]": ["word", "segment"]})
+        # Whole segments if the reply has no word timestamps
+        pieces = ([(word["start"], word["end"], word["word"]) for word in reply.get("words") or []]
+                  or [(segment["start"], segment["end"], segment["text"]) for segment in reply.get("segments") or []])
+        return split_by_offsets(pieces, offsets)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper through the shared transcription daemon (daemon.py),
+    which keeps the models loaded and batches requests itself.
+    """
+    name = "local"
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, concurrency: int = 1) -> None:
+        self.client = TranscriptionClient(socket_path)
+        self.concurrency = concurrency
+
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        return self.client.transcribe(path)
+
+
+class TranscriberBackend(TranscriptionBackend):
+    """
+    An in-process local_faster_whisper Transcriber, for callers that have
+    already loaded the models.
+    """
+    name = "faster-whisper"
+
+    def __init__(self, transcriber: Any) -> None:
+        self.transcriber = transcriber
+
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        return json.loads(self.transcriber.transcribe_file(path))["text"]
+
+
+class AzureBackend(TranscriptionBackend):
+    """
+    Azure Speech. Each recording is decoded in memory and pushed through a
+    PushAudioInputStream to a continuous recognizer, so every utterance of
+    a multi-utterance call is transcribed (recognize_once stops after the
+    first). The SpeechConfig is built once; up to concurrency recognizers
+    run at the same time.
+    """
+    name = "azure"
+
+    def __init__(self, subscription_key: str, region: str, concurrency: int = 4, timeout: float = 300.0) -> None:
+        import azure.cognitiveservices.speech as speechsdk
+
+        self.speechsdk = speechsdk
+        self.speech_config = speechsdk.SpeechConfig(subscription=subscription_key, region=region)
+        self.stream_format = speechsdk.audio.AudioStreamFormat(
+            samples_per_second=PCM_SAMPLE_RATE, bits_per_sample=16, channels=1)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(concurrency)
+
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        speechsdk = self.speechsdk
+        pcm = decode_pcm(path)
+        with self.slots:
+            stream = speechsdk.audio.PushAudioInputStream(stream_format=self.stream_format)
+            recognizer = speechsdk.SpeechRecognizer(speech_config=self.speech_config,
+                                                    audio_config=speechsdk.audio.AudioConfig(stream=stream))
+            utterances: List[str] = []
+            errors: List[str] = []
+            stopped = threading.Event()
+
+            def recognized(event: Any) -> None:
+                if event.result.reason == speechsdk.ResultReason.RecognizedSpeech and event.result.text:
+                    utterances.append(event.result.text)
+
+            def canceled(event: Any) -> None:
+                # The end of the pushed audio also arrives as a cancellation
+                if event.cancellation_details.reason == speechsdk.CancellationReason.Error:
+                    errors.append(f"{event.cancellation_details.reason}. {event.cancellation_details.error_details}")
+                stopped.set()
+
+            recognizer.recognized.connect(recognized)
+            recognizer.canceled.connect(canceled)
+            recognizer.session_stopped.connect(lambda event: stopped.set())
+            recognizer.start_continuous_recognition()
+            try:
+                for offset in range(0, len(pcm), AZURE_CHUNK_BYTES):
+                    stream.write(pcm[offset:offset + AZURE_CHUNK_BYTES])
+                stream.close()
+                finished = stopped.wait(self.timeout)
+            finally:
+                recognizer.stop_continuous_recognition()
+        if errors:
+            raise BackendError(f"Azure recognition canceled: {errors[0]}")
+        if not finished:
+            raise BackendError(f"Azure recognition of {path} did not finish within {self.timeout}s")
+        return " ".join(utterances)
+
+
+class GoogleBackend(TranscriptionBackend):
+    """
+    Google Cloud Speech-to-Text for local recordings: each one is decoded
+    in memory to 16 kHz mono LINEAR16 and sent through streaming recognize
+    in GOOGLE_CHUNK_BYTES requests. Clients (one gRPC channel each) are
+    created once and shared round-robin, and at most concurrency streams
+    are open at a time. hints(talkgroup_id) returns the phrase hints for a
+    recording's talkgroup.
+    """
+    name = "google"
+
+    def __init__(self, key_file: str, hints: Optional[Callable[[Optional[str]], Sequence[str]]] = None,
+                 channels: int = 2, concurrency: int = 8, timeout: float = 300.0) -> None:
+        from google.cloud import speech_v1p1beta1 as speech
+
+        self.speech = speech
+        self.clients = [speech.SpeechClient.from_service_account_json(key_file) for _ in range(channels)]
+        self.next_client = itertools.cycle(self.clients)
+        self.hints = hints
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+
+    def phrases(self, talkgroup_id: Optional[str]) -> List[str]:
+        if self.hints is None:
+            return []
+        return [phrase[:MAX_PHRASE_LENGTH] for phrase in self.hints(talkgroup_id)][:MAX_PHRASE_HINTS]
+
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        speech = self.speech
+        pcm = decode_pcm(path)
+        config = speech.StreamingRecognitionConfig(config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=PCM_SAMPLE_RATE,
+            language_code="en-US",
+            speech_contexts=[speech.SpeechContext(phrases=self.phrases(talkgroup_id))],
+        ))
+        chunks = (speech.StreamingRecognizeRequest(audio_content=pcm[offset:offset + GOOGLE_CHUNK_BYTES])
+                    for offset in range(0, len(pcm), GOOGLE_CHUNK_BYTES))
+        with self.lock:
+            client = next(self.next_client)
+        with self.slots:
+            responses = client.streaming_recognize(config, chunks, timeout=self.timeout)
+            return " ".join(result.alternatives[0].transcript.strip()
+                            for response in responses for result in response.results
+                            if result.is_final and result.alternatives)
+
+
+def phrase_hints_from_file(path: str) -> Callable[[Optional[str]], List[str]]:
+    """
+    Phrase hints from a JSON file such as {"default": ["10-4", "Medic 12"],
+    "52198": ["Troop C"]}: the "default" phrases plus those listed under
+    the recording's talkgroup.
+    """
+    with open(path, "r") as f:
+        table = json.load(f)
+
+    def hints(talkgroup_id: Optional[str]) -> List[str]:
+        return table.get("default", []) + table.get(str(talkgroup_id), [])
+
+    return hints
+
+
+class BackendStats:
+    """
+    Rolling view of one backend: exponentially weighted latency and error
+    rate, jobs currently in flight, and when it may be tried again after
+    being marked unhealthy.
+    """
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.unhealthy_until = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "error_rate": round(self.error_rate, 3),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "healthy": time.monotonic() >= self.unhealthy_until,
+        }
+
+
+class BackendRouter:
+    """
+    Sends each job to the backend expected to finish it first: rolling
+    latency scaled by how many jobs are already queued on it. A backend
+    whose error rate reaches max_error_rate sits out cooldown_seconds, and
+    a failed job is retried on the next best backend. Jobs for
+    hedge_talkgroups are also sent to the runner-up if the first backend
+    has not answered within hedge_delay seconds; the first answer wins.
+    """
+    def __init__(self, backends: Sequence[TranscriptionBackend], hedge_talkgroups: Sequence[str] = (),
+                 hedge_delay: float = 2.0, alpha: float = 0.3, max_error_rate: float = 0.5,
+                 cooldown_seconds: float = 30.0, hedge_workers: int = 8) -> None:
+        if not backends:
+            raise ValueError("BackendRouter needs at least one backend")
+        self.backends = list(backends)
+        self.hedge_talkgroups: Set[str] = {str(t) for t in hedge_talkgroups}
+        self.hedge_delay = hedge_delay
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.stats: Dict[str, BackendStats] = {backend.name: BackendStats() for backend in self.backends}
+        self.lock = threading.Lock()
+        self.hedge_workers = hedge_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def expected_seconds(self, backend: TranscriptionBackend) -> float:
+        """
+        How long a job sent to backend now should take. Backends with no
+        measurements yet score zero, so each gets tried early on.
+        """
+        stats = self.stats[backend.name]
+        if stats.latency is None:
+            return 0.0
+        return stats.latency * (1 + stats.in_flight // max(1, backend.concurrency))
+
+    def choose(self, exclude: Sequence[TranscriptionBackend] = ()) -> Optional[TranscriptionBackend]:
+        """
+        The healthy backend with the lowest expected time, or, if every
+        remaining backend is cooling down, the one that recovers first.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = [backend for backend in self.backends if backend not in exclude]
+            if not candidates:
+                return None
+            healthy = [backend for backend in candidates if self.stats[backend.name].unhealthy_until <= now]
+            if not healthy:
+                return min(candidates, key=lambda backend: self.stats[backend.name].unhealthy_until)
+            return min(healthy, key=self.expected_seconds)
+
+    def _attempt(self, backend: TranscriptionBackend, path: str, talkgroup_id: Optional[str]) -> str:
+        return self._measure(backend, path, 1, lambda: backend.transcribe(path, talkgroup_id))
+
+    def _measure(self, backend: TranscriptionBackend, description: str, jobs: int, call: Callable[[], Any]) -> Any:
+        """
+        Runs call on backend, updating its stats. A call covering several
+        jobs counts its time per job.
+        """
+        stats = self.stats[backend.name]
+        with self.lock:
+            stats.in_flight += 1
+        started = time.monotonic()
+        try:
+            text = call()
+        except Exception as e:
+            with self.lock:
+                stats.in_flight -= 1
+                stats.failed += 1
+                stats.error_rate += self.alpha * (1.0 - stats.error_rate)
+                if stats.error_rate >= self.max_error_rate:
+                    stats.unhealthy_until = time.monotonic() + self.cooldown_seconds
+                    logging.warning(f"Backend {backend.name} marked unhealthy for {self.cooldown_seconds}s "
+                                    f"(error rate {stats.error_rate:.2f})")
+            logging.error(f"Backend {backend.name} failed on {description}: {str(e)}")
+            raise
+        elapsed = (time.monotonic() - started) / jobs
+        with self.lock:
+            stats.in_flight -= 1
+            stats.completed += 1
+            stats.error_rate -= self.alpha * stats.error_rate
+            stats.latency = elapsed if stats.latency is None else stats.latency + self.alpha * (elapsed - stats.latency)
+        return text
+
+    def transcribe(self, path: str, talkgroup_id: Optional[str] = None) -> str:
+        """
+        Transcribes path on the best backend, falling back to the others
+        in turn. Raises BackendError if every backend fails.
+        """
+        if talkgroup_id is not None and str(talkgroup_id) in self.hedge_talkgroups and len(self.backends) > 1:
+            return self._transcribe_hedged(path, str(talkgroup_id))
+        tried: List[TranscriptionBackend] = []
+        errors: List[str] = []
+        while True:
+            backend = self.choose(tried)
+            if backend is None:
+                raise BackendError(f"All transcription backends failed for {path}: {'; '.join(errors)}")
+            tried.append(backend)
+            try:
+                return self._attempt(backend, path, talkgroup_id)
+            except Exception as e:
+                errors.append(f"{backend.name}: {str(e)}")
+
+    def transcribe_batch(self, paths: Sequence[str], talkgroup_id: Optional[str] = None) -> List[str]:
+        """
+        Transcribes several recordings of one talkgroup in a single call on
+        the best backend (packed, for backends that support it), returning
+        their texts in order. Raises BackendError if that call fails; the
+        caller then transcribes them one by one.
+        """
+        backend = self.choose()
+        if backend is None:
+            raise BackendError("No transcription backend available")
+        description = f"{len(paths)} packed recordings"
+        try:
+            return self._measure(backend, description, len(paths),
+                                 lambda: backend.transcribe_batch(paths, talkgroup_id))
+        except Exception as e:
+            raise BackendError(f"{backend.name} failed on {description}: {str(e)}")
+
+    def _transcribe_hedged(self, path: str, talkgroup_id: str) -> str:
+        with self.lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                    thread_name_prefix="hedged-transcription")
+            executor = self._executor
+        tried: List[TranscriptionBackend] = []
+        errors: List[str] = []
+        running: Dict["Future[str]", TranscriptionBackend] = {}
+        pending: Set["Future[str]"] = set()
+        hedged = False
+        while True:
+            if not pending:
+                backend = self.choose(tried)
+                if backend is None:
+                    raise BackendError(f"All transcription backends failed for {path}: {'; '.join(errors)}")
+                tried.append(backend)
+                future = executor.submit(self._attempt, backend, path, talkgroup_id)
+                running[future] = backend
+                pending.add(future)
+            done, pending = wait(pending, timeout=None if hedged else self.hedge_delay,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    # A slower duplicate still finishes in the background and counts towards its stats
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{running[future].name}: {str(e)}")
+            if not done and not hedged:
+                hedged = True
+                backend = self.choose(tried)
+                if backend is not None:
+                    logging.info(f"Hedging {os.path.basename(path)} on {backend.name}")
+                    tried.append(backend)
+                    future = executor.submit(self._attempt, backend, path, talkgroup_id)
+                    running[future] = backend
+                    pending.add(future)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for backend in self.backends:
+            backend.close()
+
+
+def build_backend(name: str, openai_prompt: Optional[str] = None,
+                  phrase_hints: Optional[Callable[[Optional[str]], Sequence[str]]] = None) -> TranscriptionBackend:
+    """
+    Creates a backend by name from its environment settings. phrase_hints
+    overrides the Google phrase hints file (GOOGLE_PHRASE_HINTS).
+    """
+    if name == "openai":
+        return OpenAIBackend(os.environ.get("OPENAI_API_KEY", "YOUR_KEY_HERE"), prompt=openai_prompt)
+    if name == "local":
+        return LocalWhisperBackend(os.environ.get("TRANSCRIBE_SOCKET") or DEFAULT_SOCKET_PATH)
+    if name == "azure":
+        return AzureBackend(os.environ.get("AZURE_SUBSCRIPTION_KEY", "YOUR_AZURE_SUBSCRIPTION_KEY"),
+                            os.environ.get("AZURE_REGION", "YOUR_AZURE_REGION"))
+    if name == "google":
+        hints_file = os.environ.get("GOOGLE_PHRASE_HINTS")
+        if phrase_hints is None and hints_file:
+            phrase_hints = phrase_hints_from_file(hints_file)
+        return GoogleBackend(os.environ.get("GOOGLE_CLOUD_CREDENTIALS", "path_to_your_google_cloud_credentials.json"),
+                             phrase_hints)
+    raise ValueError(f"Unknown transcription backend: {name}")
+
+
+def router_from_environment(openai_prompt: Optional[str] = None,
+                            phrase_hints: Optional[Callable[[Optional[str]], Sequence[str]]] = None) -> BackendRouter:
+    """
+    The router the scripts use. TRANSCRIPTION_BACKENDS lists the backends
+    to route between (e.g. "local,openai"); without it, the local daemon
+    is used when TRANSCRIBE_SOCKET is set and OpenAI otherwise.
+    HEDGE_TALKGROUPS lists talkgroups whose jobs are hedged after
+    HEDGE_DELAY_SECONDS.
+    """
+    default = "local" if os.environ.get("TRANSCRIBE_SOCKET") else "openai"
+    names = [n.strip() for n in os.environ.get("TRANSCRIPTION_BACKENDS", default).split(",") if n.strip()]
+    hedge_talkgroups = [t.strip() for t in os.environ.get("HEDGE_TALKGROUPS", "").split(",") if t.strip()]
+    return BackendRouter([build_backend(name, openai_prompt, phrase_hints) for name in names], hedge_talkgroups,
+                         float(os.environ.get("HEDGE_DELAY_SECONDS", "2.0")))
@@ -1,10 +1,15 @@
 # pyre-strict
+import json
 import os
 import re
 import shutil
+import sqlite3
 import subprocess
+import time
 from typing import Optional
 
+from config import Config
+
 def extract_talkgroup_id(filename: str) -> str:
     """
     Extracts the talkgroup ID from a filename using a regex pattern.
@@ -29,4 +34,55 @@ def move_file(src: str, dst: str) -> None:
     Moves a file from src to dst, creating directories if needed.
     """
     os.makedirs(os.path.dirname(dst), exist_ok=True)
-    shutil.move(src, dst)
\ No newline at end of file
+    shutil.move(src, dst)
+
+def record_rejection(directory: str, filename: str, reason: str, detail: Optional[str] = None) -> None:
+    """
+    Appends a JSON line describing why a recording was rejected to the
+    rejection log kept in the given directory.
+    """
+    entry = {"time": time.time(), "file": filename, "reason": reason}
+    if detail is not None:
+        entry["detail"] = detail
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, Config.REJECTION_LOG), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+
+def parse_recording_timestamp(filename: str) -> Optional[time.struct_time]:
+    """
+    Parses the local start time from a SDRTrunk recording name
+    (20231001_173024...). Returns None if the name has no timestamp.
+    """
+    match = re.match(r"(\d{8})_(\d{6})", filename)
+    if not match:
+        return None
+    try:
+        return time.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+def recording_directory(root: str, filename: str, talkgroup_id: Optional[str] = None,
+                        layout: Optional[str] = None) -> str:
+    """
+    Directory a processed recording belongs in under root, following
+    layout (Config.RECORDING_LAYOUT by default), e.g. "{talkgroup}" or
+    "{talkgroup}/{year}/{month}/{day}". Dates come from the filename
+    timestamp, or today for names without one.
+    """
+    stamp = parse_recording_timestamp(filename) or time.localtime()
+    relative = (layout or Config.RECORDING_LAYOUT).format(
+        talkgroup=talkgroup_id or extract_talkgroup_id(filename),
+        year=f"{stamp.tm_year:04d}", month=f"{stamp.tm_mon:02d}", day=f"{stamp.tm_mday:02d}",
+    )
+    return os.path.join(root, *relative.split("/"))
+
+def index_recording_paths(conn: sqlite3.Connection) -> None:
+    """
+    Makes UPDATEs by filepath on the recordings table use an index instead
+    of scanning it. Migrated (v2) databases, where recordings is a view,
+    already index the path.
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'recordings'").fetchone()
+    if row is not None and row[0] == "table":
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_recordings_filepath ON recordings(filepath)")
+        conn.commit()
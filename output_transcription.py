@@ -1,41 +1,176 @@
-import requests
+import argparse
+import glob
+import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_faster_whisper"))
+from transcription_backends import router_from_environment
+from utils import extract_talkgroup_id
 
-def curl_transcribe_audio(file_path):
-    # Define the endpoint and your API key
-    url = "https://api.openai.com/v1/audio/transcriptions"
-    api_key = os.environ.get("OPENAI_API_KEY", "YOUR_KEY_HERE")
+PROMPT = "Transcribe the radio dispatch audio. The speaker is usually a dispatcher, police officer, or EMS responder. There are often callsigns, ten-codes, and addresses said."
 
-    # Setup headers
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-    }
 
-    # Open the file and setup files and data to be sent
-    with open(file_path, "rb") as file:
-        files = {
-            "file": file,
-        }
-        data = {
-            "model": "whisper-1",
-            "prompt": "Transcribe the radio dispatch audio. The speaker is usually a dispatcher, police officer, or EMS responder. There are often callsigns, ten-codes, and addresses said.",
-            "response_format": "json",
-            "temperature": "0",
-            "language": "en",
-        }
+def expand_paths(arguments, file_list=None):
+    """
+    Turns the command line into the list of recordings to transcribe.
 
-        # Make the POST request
-        response = requests.post(url, headers=headers, files=files, data=data)
+    Args:
+        arguments (list): Paths or glob patterns (quoted so the shell leaves them alone).
+        file_list (str): Optional file with one path per line, "-" for stdin.
 
-    # Print the response or handle as needed
-    return str(response.json())
+    Returns:
+        list: The paths, in order, without duplicates.
+    """
+    entries = list(arguments)
+    if file_list:
+        with (sys.stdin if file_list == "-" else open(file_list, "r")) as f:
+            entries += [line.strip() for line in f if line.strip()]
+    paths = []
+    seen = set()
+    for entry in entries:
+        for path in sorted(glob.glob(entry, recursive=True)) if glob.has_magic(entry) else [entry]:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def completed_paths(output_path):
+    """
+    Paths already transcribed successfully in an earlier run's output, for --resume.
+
+    Args:
+        output_path (str): The JSONL output file.
+
+    Returns:
+        set: Absolute paths.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A line cut short when the last run was interrupted
+                continue
+            if "text" in result:
+                done.add(os.path.abspath(result["path"]))
+    return done
+
+
+def pack_groups(paths, size):
+    """
+    Splits paths into jobs of up to size recordings of the same talkgroup, for --pack. Recordings
+    without a talkgroup in their name are never packed.
+
+    Args:
+        paths (list): The recordings.
+        size (int): Most recordings per job.
+
+    Returns:
+        list: Lists of paths, in the order their first recording appears.
+    """
+    open_groups = {}
+    jobs = []
+    for path in paths:
+        talkgroup_id = extract_talkgroup_id(os.path.basename(path))
+        group = open_groups.get(talkgroup_id)
+        if group is None or len(group) >= size or talkgroup_id == "unknown":
+            group = open_groups[talkgroup_id] = []
+            jobs.append(group)
+        group.append(path)
+    return jobs
+
+
+def transcribe_all(paths, router, output, workers=4, pack=1):
+    """
+    Transcribes paths on up to workers threads sharing one router (and its HTTP session), writing
+    one JSON object per line to output as each result comes in.
+
+    Args:
+        paths (list): The recordings.
+        router (BackendRouter): Where to send them.
+        output (file): Open text file for the results.
+        workers (int): Requests in flight at once.
+        pack (int): Send up to this many recordings of one talkgroup in a single request (see
+            BackendRouter.transcribe_batch); if a packed request fails they are sent one by one.
+
+    Returns:
+        int: How many failed.
+    """
+    def transcribe_one(path):
+        try:
+            return {"path": path, "text": router.transcribe(path, extract_talkgroup_id(os.path.basename(path)))}
+        except Exception as e:
+            return {"path": path, "error": str(e)}
+
+    def transcribe(job):
+        if len(job) > 1:
+            try:
+                texts = router.transcribe_batch(job, extract_talkgroup_id(os.path.basename(job[0])))
+                return [{"path": path, "text": text} for path, text in zip(job, texts)]
+            except Exception as e:
+                print(f"Packed request for {len(job)} recordings failed, sending them one by one: {e}",
+                      file=sys.stderr)
+        return [transcribe_one(path) for path in job]
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(transcribe, job) for job in pack_groups(paths, pack)]):
+            for result in future.result():
+                failed += "error" in result
+                output.write(json.dumps(result) + "\n")
+            output.flush()
+    return failed
 
 
 def main():
-    file = sys.argv[1]
-    print(curl_transcribe_audio(file))
+    parser = argparse.ArgumentParser(
+        description="Transcribe recordings and print one JSON object per line: {\"path\": ..., \"text\": ...}"
+    )
+    parser.add_argument("paths", nargs="*", help="Recordings or glob patterns, e.g. '/recordings/41003/20231001_17*.mp3'")
+    parser.add_argument("--from-file", help="File listing one recording per line (- for stdin)")
+    parser.add_argument("--workers", type=int, default=4, help="Requests to send at once")
+    parser.add_argument("--pack", type=int, default=1,
+                        help="Pack up to this many recordings of the same talkgroup into one request")
+    parser.add_argument("--output", help="Write results to this JSONL file instead of stdout")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip recordings already transcribed in --output and append the rest")
+    args = parser.parse_args()
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+
+    paths = expand_paths(args.paths, args.from_file)
+    if args.resume:
+        done = completed_paths(args.output)
+        paths = [path for path in paths if os.path.abspath(path) not in done]
+    if not paths:
+        if not args.resume:
+            parser.error("no recordings to transcribe")
+        return
+
+    # OpenAI unless TRANSCRIPTION_BACKENDS / TRANSCRIBE_SOCKET say otherwise (see transcription_backends.py)
+    router = router_from_environment(openai_prompt=PROMPT)
+    output = open(args.output, "a" if args.resume else "w") if args.output else sys.stdout
+    if args.resume and output.tell() > 0:
+        with open(args.output, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read() != b"\n":
+                # Start after the line the interrupted run was writing
+                output.write("\n")
+    try:
+        failed = transcribe_all(paths, router, output, args.workers, args.pack)
+    finally:
+        router.close()
+        if output is not sys.stdout:
+            output.close()
+    if failed:
+        print(f"{failed} of {len(paths)} recordings failed", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
+import argparse
 import openai
 import logging
-import requests
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_faster_whisper"))
+from transcription_backends import BackendError, router_from_environment
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -15,6 +19,8 @@ logger = logging.getLogger()
 # Configurations
 RECORDINGS_DIR = os.environ.get("RECORDINGS_DIR", "/home/YOUR_USER/SDRTrunk/recordings")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "YOUR_KEY_HERE")
+# OpenAI unless TRANSCRIPTION_BACKENDS / TRANSCRIBE_SOCKET say otherwise (see transcription_backends.py)
+ROUTER = router_from_environment()
 
 
 def pyapi_transcribe_audio(file_path):
@@ -24,35 +30,6 @@ def pyapi_transcribe_audio(file_path):
     return transcript.text
 
 
-def curl_transcribe_audio(file_path):
-    # Define the endpoint and your API key
-    url = "https://api.openai.com/v1/audio/transcriptions"
-    api_key = OPENAI_API_KEY
-
-    # Setup headers
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-    }
-
-    # Open the file and setup files and data to be sent
-    with open(file_path, "rb") as file:
-        files = {
-            "file": file,
-        }
-        data = {
-            "model": "whisper-1",
-            "response_format": "json",
-            "temperature": "0",
-            "language": "en",
-        }
-
-        # Make the POST request
-        response = requests.post(url, headers=headers, files=files, data=data)
-
-    # Print the response or handle as needed
-    return str(response.json())
-
-
 def process_file(file):
     logger.info(f"Processing file: {file}")
     if not file.endswith(".mp3"):
@@ -69,7 +46,11 @@ def process_file(file):
     os.rename(full_path, new_path)
 
     # Transcribe the audio
-    transcription = curl_transcribe_audio(new_path)
+    try:
+        transcription = str({"text": ROUTER.transcribe(new_path, talkgroup_id)})
+    except BackendError as e:
+        logger.error(f"Error while transcribing {file}: {str(e)}")
+        return
     logger.info(f"Transcribed text for {file}: {transcription}")
 
     # Write transcription to a text file
@@ -86,5 +67,17 @@ def main():
         process_file(file)
 
 
+def watch():
+    from recording_watcher import RecordingWatcher
+
+    RecordingWatcher(RECORDINGS_DIR, process_file).run_forever()
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Transcribe SDRTrunk recordings with the OpenAI API")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and transcribe each recording as soon as it is written")
+    if parser.parse_args().watch:
+        watch()
+    else:
+        main()
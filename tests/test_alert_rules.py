@@ -0,0 +1,67 @@
+import json
+import random
+import time
+
+import pytest
+from alert_rules import VOCABULARY, RuleEngine, Subscriber, load_rules, parse_hours, random_rule
+
+NIGHT = time.mktime((2023, 10, 1, 23, 15, 0, 0, 0, -1))
+DAY = time.mktime((2023, 10, 1, 11, 15, 0, 0, 0, -1))
+
+def engine(*rule_lists):
+    return RuleEngine([Subscriber.from_dict({"name": f"s{i}", "email": f"s{i}@example.com", "rules": rules})
+                       for i, rules in enumerate(rule_lists)])
+
+def names(subscribers):
+    return [subscriber.name for subscriber in subscribers]
+
+def test_conditions_combine():
+    rules = engine(
+        [{"keywords": ["structure fire", "mayday"]}],
+        [{"keywords": ["fire"], "talkgroups": [41001]}],
+        [{"ten_codes": ["10-50"], "hours": "22-6"}],
+        [{"radios": [1610092]}, {"talkgroups": ["41002"]}],
+        [{}],
+    )
+    assert names(rules.match("Engine 4, structure fire on Main", 41001, None, DAY)) == ["s0", "s1", "s4"]
+    assert names(rules.match("Fire alarm, Mayday!", "41002", "Unknown ID", DAY)) == ["s0", "s3", "s4"]
+    # "structure" and "fire" apart are not the phrase
+    assert names(rules.match("structure is on fire", 41009, None, DAY)) == ["s4"]
+    # Ten codes match with or without the hyphen, but not inside longer numbers
+    assert names(rules.match("unit 12 is 1050", 41009, 1610092, NIGHT)) == ["s2", "s3", "s4"]
+    assert names(rules.match("unit 12 is 10-50", 41009, None, DAY)) == ["s4"]
+    assert names(rules.match("call 10-500", 41009, None, NIGHT)) == ["s4"]
+
+def test_parse_hours_wraps_midnight():
+    assert parse_hours("22-6") == {22, 23, 0, 1, 2, 3, 4, 5}
+    assert parse_hours("9-17") == set(range(9, 17))
+
+def test_compiled_engine_agrees_with_rule_by_rule_evaluation():
+    rng = random.Random(7)
+    vocabulary = VOCABULARY[:40]
+    rules = RuleEngine([Subscriber.from_dict({"name": f"s{i}", "email": f"s{i}@example.com",
+                                               "rules": [random_rule(rng, vocabulary) for _ in range(2)]})
+                        for i in range(300)])
+    matched = 0
+    for _ in range(300):
+        text = " ".join(rng.choice(vocabulary + ["10-7", "1050", "10-4"]) for _ in range(rng.randint(0, 30)))
+        call = (text, rng.randint(40000, 44999), rng.choice([rng.randint(1610000, 1620000), "Unknown ID"]),
+                rng.choice([DAY, NIGHT]))
+        assert names(rules.match(*call)) == names(rules.match_naive(*call))
+        matched += len(rules.match(*call))
+    assert matched > 300
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"subscribers": [
+        {"name": "chief", "email": "chief@example.com", "rules": [{"keywords": ["working fire"]}]},
+        {"name": "ems", "email": "ems@example.com", "rules": [{"talkgroups": [41003]}]},
+    ]}))
+    matched = load_rules(str(path)).match("Command has a working fire", 41003)
+    assert [subscriber.email for subscriber in matched] == ["chief@example.com", "ems@example.com"]
+
+def test_subscribers_need_an_email_address(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"subscribers": [{"name": "chief", "rules": [{"keywords": ["working fire"]}]}]}))
+    with pytest.raises(ValueError, match="chief"):
+        load_rules(str(path))
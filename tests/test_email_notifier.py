@@ -0,0 +1,121 @@
+import smtplib
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+from email.message import EmailMessage
+
+import pytest
+from email_notifier import DigestNotifier, SMTPConnection
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP to accept mail from smtplib: records each connection and message, and can
+    defer or drop on request.
+    """
+
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 stand-in ready")
+        while True:
+            line = self.rfile.readline().decode("ascii").strip()
+            command = line.split(" ")[0].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command == "EHLO":
+                self.reply("250-stand-in\r\n250 AUTH PLAIN")
+            elif command == "AUTH" and server.reject_logins:
+                server.reject_logins -= 1
+                self.reply("535 authentication failed")
+            elif command == "AUTH":
+                server.logins += 1
+                self.reply("235 ok")
+            elif command == "MAIL" and server.defer:
+                server.defer -= 1
+                self.reply("421 slow down")
+            elif command == "MAIL" and server.drop:
+                server.drop -= 1
+                return
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while not data.endswith(b"\r\n.\r\n"):
+                    data += self.rfile.readline()
+                server.messages.append(message_from_bytes(data[:-5].replace(b"\r\n", b"\n")))
+                self.reply("250 queued")
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StandInSMTPHandler)
+    server.daemon_threads = True
+    server.connections = server.logins = server.defer = server.drop = server.reject_logins = 0
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def connection_to(server):
+    return SMTPConnection("127.0.0.1", server.server_address[1], "sender@example.com", "secret",
+                          use_ssl=False, backoff_seconds=0)
+
+def test_digests_batch_per_talkgroup_over_one_connection(smtp_server):
+    notifier = DigestNotifier(connection_to(smtp_server), "sender@example.com", "user@example.com", window_seconds=0.3)
+    notifier.start()
+    notifier.notify("41001", "a.mp3", "Engine 4 responding")
+    notifier.notify("41002", "b.mp3", "Medic 7 on scene")
+    notifier.notify("41001", "c.mp3", "Engine 4 on scene")
+    time.sleep(0.6)
+    notifier.notify("41001", "d.mp3", "Engine 4 clear")
+    notifier.stop(timeout=5)
+
+    subjects = [m["Subject"] for m in smtp_server.messages]
+    assert subjects == ["Transcriptions for 41001 (2 calls)", "Transcription for 41002", "Transcription for 41001"]
+    assert "a.mp3\nEngine 4 responding\n\nc.mp3\nEngine 4 on scene" in smtp_server.messages[0].get_payload()
+    assert smtp_server.connections == 1 and smtp_server.logins == 1
+
+def test_full_digest_is_sent_before_the_window_ends(smtp_server):
+    notifier = DigestNotifier(connection_to(smtp_server), "s@example.com", "u@example.com", window_seconds=60,
+                              max_items=2)
+    notifier.start()
+    notifier.notify("41001", "a.mp3", "one")
+    notifier.notify("41001", "b.mp3", "two")
+    deadline = time.monotonic() + 5
+    while not smtp_server.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert smtp_server.messages[0]["Subject"] == "Transcriptions for 41001 (2 calls)"
+    notifier.stop(timeout=5)
+
+def test_reconnects_and_retries(smtp_server):
+    connection = connection_to(smtp_server)
+    notifier = DigestNotifier(connection, "s@example.com", "u@example.com", window_seconds=0)
+    notifier.start()
+    notifier.notify("41001", "a.mp3", "first")
+    smtp_server.drop, smtp_server.defer = 1, 1
+    notifier.notify("41001", "b.mp3", "second")
+    notifier.stop(timeout=5)
+    assert [m.get_payload().strip() for m in smtp_server.messages] == ["first", "second"]
+    assert smtp_server.connections == 3
+
+def test_failed_login_is_retried_on_the_next_send(smtp_server):
+    connection = connection_to(smtp_server)
+    message = EmailMessage()
+    message["From"], message["To"] = "sender@example.com", "user@example.com"
+    message.set_content("after the password was fixed")
+    smtp_server.reject_logins = 1
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        connection.send(message)
+    assert connection.server is None
+    connection.send(message)
+    connection.close()
+    assert smtp_server.logins == 1 and smtp_server.connections == 2
+    assert smtp_server.messages[0].get_payload().strip() == "after the password was fixed"
@@ -0,0 +1,39 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from alert_rules import load_rules
+
+
+class FakeRouter:
+    def __init__(self, text):
+        self.text = text
+
+    def transcribe(self, path, talkgroup_id=None):
+        return self.text
+
+
+@pytest.fixture
+def script(tmp_path, monkeypatch):
+    # Imported here so its logging.basicConfig finds pytest's handlers and does not create script_log.log
+    import email_simplified_process
+
+    monkeypatch.setattr(email_simplified_process, "RECORDINGS_DIR", str(tmp_path))
+    return email_simplified_process
+
+
+def test_rules_match_the_first_and_last_words(script, tmp_path, monkeypatch):
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps({"subscribers": [
+        {"name": "chief", "email": "chief@example.com", "rules": [{"keywords": ["mayday"]}]},
+        {"name": "ems", "email": "ems@example.com", "rules": [{"keywords": ["respond"]}]},
+    ]}))
+    name = "20231001_173024Fire__TO_41001_FROM_1610092.mp3"
+    (tmp_path / name).write_bytes(b"call audio")
+    monkeypatch.setattr(script, "ROUTER", FakeRouter("Mayday Engine 4 mayday"))
+    notifier = MagicMock()
+    script.process_file(name, notifier, load_rules(str(rules_file)))
+
+    transcription = str({"text": "Mayday Engine 4 mayday"})
+    notifier.notify.assert_called_once_with("41001", name, transcription, "chief@example.com")
+    assert (tmp_path / "41001" / name.replace(".mp3", ".txt")).read_text() == transcription
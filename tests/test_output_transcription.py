@@ -0,0 +1,81 @@
+import io
+import json
+import sys
+import threading
+import time
+
+from output_transcription import completed_paths, expand_paths, pack_groups, transcribe_all
+
+
+class FakeRouter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.most_active = 0
+        self.calls = []
+
+    def transcribe(self, path, talkgroup_id=None):
+        with self.lock:
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+            self.calls.append((path, talkgroup_id))
+        # Later files finish first
+        time.sleep(0.1 if path.endswith("0.mp3") else 0.02)
+        with self.lock:
+            self.active -= 1
+        if "bad" in path:
+            raise RuntimeError("429 Too Many Requests")
+        return f"text of {path}"
+
+    def transcribe_batch(self, paths, talkgroup_id=None):
+        self.calls.append((tuple(paths), talkgroup_id))
+        if any("bad" in path for path in paths):
+            raise RuntimeError("packed request failed")
+        return [f"packed text of {path}" for path in paths]
+
+
+def test_expand_paths(tmp_path, monkeypatch):
+    for name in ["b.mp3", "a.mp3", "c.wav"]:
+        (tmp_path / name).write_bytes(b"")
+    listing = tmp_path / "list.txt"
+    listing.write_text(f"{tmp_path / 'c.wav'}\n\n{tmp_path / 'a.mp3'}\n")
+    assert expand_paths([str(tmp_path / "*.mp3")], str(listing)) == [
+        str(tmp_path / "a.mp3"), str(tmp_path / "b.mp3"), str(tmp_path / "c.wav")]
+    monkeypatch.setattr(sys, "stdin", io.StringIO("x.mp3\n"))
+    assert expand_paths(["x.mp3", "y.mp3"], "-") == ["x.mp3", "y.mp3"]
+
+
+def test_results_stream_as_they_complete_and_resume_skips_them(tmp_path):
+    paths = ["/rec/20231001_173024Fire__TO_41001_FROM_1610092_0.mp3"] + [f"/rec/call{i}.mp3" for i in range(1, 6)]
+    paths.append("/rec/bad.mp3")
+    router = FakeRouter()
+    output = io.StringIO()
+    assert transcribe_all(paths, router, output, workers=3) == 1
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert router.most_active == 3 and len(results) == 7
+    assert results[-1] == {"path": paths[0], "text": f"text of {paths[0]}"}
+    assert {"path": "/rec/bad.mp3", "error": "429 Too Many Requests"} in results
+    assert ("/rec/20231001_173024Fire__TO_41001_FROM_1610092_0.mp3", "41001") in router.calls
+
+    saved = tmp_path / "out.jsonl"
+    saved.write_text(output.getvalue() + '{"path": "/rec/cut sho')
+    done = completed_paths(str(saved))
+    assert len(done) == 6 and "/rec/bad.mp3" not in done
+    assert completed_paths(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_recordings_of_a_talkgroup_are_packed(tmp_path):
+    fire = [f"/rec/20231001_1730{i:02d}Fire__TO_41001.mp3" for i in range(5)]
+    ems = ["/rec/20231001_173003EMS__TO_41003.mp3", "/rec/20231001_173004EMS__TO_41003_bad.mp3"]
+    paths = fire[:2] + ems[:1] + fire[2:] + ems[1:] + ["/rec/a.mp3", "/rec/b.mp3"]
+    assert pack_groups(paths, 3) == [fire[:3], ems, fire[3:], ["/rec/a.mp3"], ["/rec/b.mp3"]]
+
+    router = FakeRouter()
+    output = io.StringIO()
+    assert transcribe_all(paths, router, output, workers=2, pack=3) == 1
+    results = {result["path"]: result for result in map(json.loads, output.getvalue().splitlines())}
+    assert len(results) == len(paths)
+    assert results[fire[4]]["text"] == f"packed text of {fire[4]}"
+    # The failed packed request is retried one recording at a time
+    assert (tuple(ems), "41003") in router.calls
+    assert results[ems[0]]["text"] == f"text of {ems[0]}" and "error" in results[ems[1]]